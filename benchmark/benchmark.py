@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+分词流程基准测试.
+
+用法: python benchmark/benchmark.py [--data_dir data] [--corpus_size 100000]
+          [--oov_ratio 0.0 0.3] [--repeat 3] [--output result.json]
+          [--baseline baseline.json] [--threshold 0.1]
+
+测试内容:
+    1. 启动: Vocabulary.load / load_snapshot、HMM 模型加载、WordSegmenter.load,
+       每项在独立子进程中测量耗时和峰值内存 (RSS).
+    2. 吞吐: 对 core/testdata/document.dat 以及按指定规模和未登录字比例生成的
+       语料, 分别测量 WordSegmenter、MaxProbSegmenter、HMMSegmenter 的
+       chars/s, 以及各阶段耗时: 字符类别预切分 (scan)、词图生成
+       (gen_edges)、动态规划 (dp) 和未登录词识别 (hmm_fallback).
+
+结果以 JSON 输出. 指定 --baseline 时与基线结果比较, 耗时、内存增加或吞吐
+下降超过 --threshold 的指标视为性能回退, 此时返回码为 1.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'core'))
+
+from core import hmm
+from core.hmm_segmenter import HMMSegmenter
+from core.max_prob_segmenter import MaxProbSegmenter
+from core.vocabulary import Vocabulary
+from word_segmenter import WordSegmenter
+
+STARTUP_TARGETS = ['vocabulary_load', 'vocabulary_load_snapshot',
+        'hmm_load', 'word_segmenter_load']
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def measure_startup(target, data_dir):
+    """
+    在当前进程中执行一项加载, 返回耗时和峰值内存增量.
+    """
+    vocabulary_file = os.path.join(data_dir, WordSegmenter.VOCABULARY_FILENAME)
+    snapshot_file = os.path.join(data_dir,
+            WordSegmenter.VOCABULARY_SNAPSHOT_FILENAME)
+    custom_words_dir = os.path.join(data_dir, WordSegmenter.CUSTOM_WORDS_DIR)
+    if not os.path.isdir(custom_words_dir):
+        custom_words_dir = None
+
+    rss = peak_rss_kb()
+    start = time.time()
+    if target == 'vocabulary_load':
+        Vocabulary().load(vocabulary_file, custom_words_dir)
+    elif target == 'vocabulary_load_snapshot':
+        if not os.path.exists(snapshot_file):
+            return None
+        Vocabulary().load_snapshot(snapshot_file)
+    elif target == 'hmm_load':
+        HMMSegmenter().load(os.path.join(data_dir,
+            WordSegmenter.HMM_SEGMENT_MODEL_DIR))
+    elif target == 'word_segmenter_load':
+        WordSegmenter().load(data_dir)
+    return {'seconds': time.time() - start,
+            'peak_rss_kb': peak_rss_kb() - rss}
+
+def run_startup(data_dir):
+    """
+    每项加载在独立子进程中执行, 互不影响.
+    """
+    results = {}
+    for target in STARTUP_TARGETS:
+        output = subprocess.check_output([sys.executable,
+            os.path.abspath(__file__), '--data_dir', data_dir,
+            '--startup', target])
+        result = json.loads(output)
+        if result is not None:
+            results[target] = result
+    return results
+
+def generate_corpus(vocabulary, size, oov_ratio, seed = 0):
+    """
+    生成约 size 个字的语料: 以 1 - oov_ratio 的概率取词典中的词, 否则取
+    不在词典中的汉字, 每 10 到 30 个字插入一个标点.
+    """
+    rand = random.Random(seed)
+    words = sorted(word for word in vocabulary.words if len(word) <= 4)
+    oov_chars = [unichr(code) for code in xrange(0x4E00, 0x9FA6)
+            if unichr(code) not in vocabulary.words]
+    punctuations = [u'，', u'。', u'、', u'！', u' ']
+
+    lines = []
+    line = []
+    length = 0
+    next_punctuation = rand.randint(10, 30)
+    while length < size:
+        if rand.random() < oov_ratio:
+            line.append(rand.choice(oov_chars))
+        else:
+            line.append(rand.choice(words))
+        length += len(line[-1])
+        if length >= next_punctuation:
+            line.append(rand.choice(punctuations))
+            next_punctuation = length + rand.randint(10, 30)
+            if rand.random() < 0.2:
+                lines.append(u''.join(line))
+                line = []
+    lines.append(u''.join(line))
+    return lines
+
+def best_time(func, repeat):
+    """
+    执行 repeat 次, 返回最短耗时. 同 timeit, 计时期间关闭垃圾回收.
+    """
+    best = None
+    for i in xrange(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.time()
+            func()
+            elapsed = time.time() - start
+        finally:
+            gc.enable()
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def consume(iterable):
+    for item in iterable:
+        pass
+
+def run_corpus(word_segmenter, texts, repeat):
+    """
+    测量各分词器的吞吐和最大概率分词各阶段耗时.
+    """
+    max_prob_segmenter = word_segmenter.max_prob_segmenter
+    hmm_segmenter = word_segmenter.hmm_segmenter
+    vocabulary = word_segmenter.vocabulary
+    num_chars = sum(len(text) for text in texts)
+
+    result = {'chars': num_chars}
+    for name, segment in (
+            ('word_segmenter', word_segmenter.segment),
+            ('max_prob_segmenter', max_prob_segmenter.segment),
+            ('hmm_segmenter', hmm_segmenter.segment)):
+        seconds = best_time(lambda: [consume(segment(text))
+            for text in texts], repeat)
+        result[name] = {'seconds': seconds,
+                'chars_per_sec': num_chars / seconds}
+
+    # 各阶段分别计时, dp = _cut_block - gen_edges
+    scanner = max_prob_segmenter.scanner
+    blocks = [text[begin : end] for text in texts
+            for char_class, begin, end in scanner.scan(text)
+            if char_class == max_prob_segmenter.CHINESE]
+    bufs = [word for block in blocks
+            for word, is_oov in max_prob_segmenter._cut_block(block)
+            if is_oov]
+    scan = best_time(lambda: [list(scanner.scan(text))
+        for text in texts], repeat)
+    gen_edges = best_time(lambda: [vocabulary.gen_edges(block)
+        for block in blocks], repeat)
+    cut_block = best_time(lambda: [consume(max_prob_segmenter._cut_block(block))
+        for block in blocks], repeat)
+    hmm_fallback = best_time(lambda: [consume(hmm_segmenter.segment(buf))
+        for buf in bufs], repeat)
+    result['stages'] = {
+            'scan': {'seconds': scan},
+            'gen_edges': {'seconds': gen_edges},
+            'dp': {'seconds': max(cut_block - gen_edges, 0.0)},
+            'hmm_fallback': {'seconds': hmm_fallback}}
+    result['oov_buffers'] = len(bufs)
+    result['oov_chars'] = sum(len(buf) for buf in bufs)
+    return result
+
+def run(args):
+    results = {
+            'environment': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'numpy': hmm.numpy is not None},
+            'startup': run_startup(args.data_dir),
+            'corpora': {}}
+
+    word_segmenter = WordSegmenter()
+    word_segmenter.load(args.data_dir)
+    fp = open(args.document, 'rb')
+    texts = [line.strip().decode('utf-8') for line in fp.readlines()]
+    fp.close()
+    results['corpora']['document'] = run_corpus(word_segmenter, texts,
+            args.repeat)
+    for oov_ratio in args.oov_ratio:
+        texts = generate_corpus(word_segmenter.vocabulary, args.corpus_size,
+                oov_ratio)
+        results['corpora']['generated_oov_%.2f' % oov_ratio] = run_corpus(
+                word_segmenter, texts, args.repeat)
+    results['peak_rss_kb'] = peak_rss_kb()
+    return results
+
+def flatten(results, prefix = ''):
+    metrics = {}
+    for key, value in results.iteritems():
+        name = prefix + key
+        if isinstance(value, dict):
+            metrics.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = value
+    return metrics
+
+def compare(results, baseline, threshold):
+    """
+    与基线比较, 返回性能回退的指标列表 (指标, 基线值, 当前值, 变化比例).
+    """
+    regressions = []
+    current = flatten(results)
+    for name, base_value in sorted(flatten(baseline).iteritems()):
+        if name not in current or base_value <= 0:
+            continue
+        value = current[name]
+        if name.endswith('chars_per_sec'):
+            change = (base_value - value) / float(base_value)
+        elif name.endswith('seconds') or name.endswith('rss_kb'):
+            change = (value - base_value) / float(base_value)
+        else:
+            continue
+        if change > threshold:
+            regressions.append((name, base_value, value, change))
+    return regressions
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+            description = 'Benchmark the word segmentation pipeline.')
+    parser.add_argument('--data_dir', default = os.path.join(ROOT_DIR, 'data'))
+    parser.add_argument('--document', default = os.path.join(ROOT_DIR,
+        'core', 'testdata', 'document.dat'))
+    parser.add_argument('--corpus_size', type = int, default = 100000,
+            help = 'chars of each generated corpus')
+    parser.add_argument('--oov_ratio', type = float, nargs = '*',
+            default = [0.0, 0.3], help = 'oov ratios of generated corpora')
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--output', help = 'write json results to file')
+    parser.add_argument('--baseline', help = 'baseline json results')
+    parser.add_argument('--threshold', type = float, default = 0.1,
+            help = 'relative change regarded as a regression')
+    parser.add_argument('--startup', choices = STARTUP_TARGETS,
+            help = argparse.SUPPRESS)
+    args = parser.parse_args(argv[1:])
+
+    if args.startup:
+        print json.dumps(measure_startup(args.startup, args.data_dir))
+        return 0
+
+    results = run(args)
+    output = json.dumps(results, indent = 2, sort_keys = True)
+    if args.output:
+        fp = open(args.output, 'wb')
+        fp.write(output)
+        fp.close()
+    else:
+        print output
+
+    if args.baseline:
+        fp = open(args.baseline, 'rb')
+        baseline = json.load(fp)
+        fp.close()
+        regressions = compare(results, baseline, args.threshold)
+        for name, base_value, value, change in regressions:
+            sys.stderr.write('REGRESSION %s: %.6g -> %.6g (%+.1f%%)\n'
+                    % (name, base_value, value, change * 100))
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
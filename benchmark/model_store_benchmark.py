@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+ModelStore 多进程内存测试.
+
+用法: python benchmark/model_store_benchmark.py [data_dir] [corpus_file]
+          [workers]
+
+分别以文本词典 + HMM 模型文件 (files) 和 ModelStore (store) 加载
+WordSegmenter, fork 出 workers 个 worker, 每个 worker 切分一遍 corpus_file
+后从 /proc/self/smaps 统计私有内存 (Private_Clean + Private_Dirty, 即
+不与父进程和其他 worker 共享的内存) 和 PSS. 输出每个 worker 的平均值以及
+ModelStore 节省的内存. 每种方式在独立的子进程中测量, 仅支持 Linux.
+"""
+
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT_DIR)
+from word_segmenter import WordSegmenter
+
+def memory_kb():
+    """
+    返回本进程的 (私有内存, PSS), 单位 KB.
+    """
+    private = pss = 0
+    fp = open('/proc/self/smaps', 'rb')
+    for line in fp:
+        if line.startswith('Private_'):
+            private += int(line.split()[1])
+        elif line.startswith('Pss:'):
+            pss += int(line.split()[1])
+    fp.close()
+    return private, pss
+
+def worker(word_segmenter, texts, queue):
+    for text in texts:
+        for word in word_segmenter.segment(text):
+            pass
+    queue.put(memory_kb())
+
+def measure(data_dir, corpus_file, workers):
+    """
+    在当前进程中加载 data_dir 并 fork workers 个 worker, 输出
+    "私有内存 PSS" (每个 worker 的平均值, KB).
+    """
+    word_segmenter = WordSegmenter()
+    word_segmenter.load(data_dir)
+    word_segmenter.warmup()
+    fp = open(corpus_file, 'rb')
+    texts = [line.strip().decode('utf-8') for line in fp.readlines()]
+    fp.close()
+
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target = worker,
+        args = (word_segmenter, texts, queue)) for i in xrange(workers)]
+    for process in processes:
+        process.start()
+    results = [queue.get() for process in processes]
+    for process in processes:
+        process.join()
+    print '%.0f %.0f' % (sum(r[0] for r in results) / float(workers),
+            sum(r[1] for r in results) / float(workers))
+
+def run(data_dir, corpus_file, workers):
+    output = subprocess.check_output([sys.executable,
+        os.path.abspath(__file__), '--measure', data_dir, corpus_file,
+        str(workers)])
+    return map(float, output.split())
+
+def main(argv):
+    if len(argv) > 1 and argv[1] == '--measure':
+        return measure(argv[2], argv[3], int(argv[4]))
+    data_dir = os.path.abspath(argv[1] if len(argv) > 1
+            else os.path.join(ROOT_DIR, 'data'))
+    corpus_file = os.path.abspath(argv[2] if len(argv) > 2
+            else os.path.join(ROOT_DIR, 'core', 'testdata', 'document.dat'))
+    workers = int(argv[3]) if len(argv) > 3 else 4
+
+    # 只链接基本词典和模型, 避免使用 data_dir 中已有的快照或 ModelStore
+    store_dir = tempfile.mkdtemp()
+    files_dir = tempfile.mkdtemp()
+    try:
+        for name in (WordSegmenter.VOCABULARY_FILENAME,
+                WordSegmenter.HMM_SEGMENT_MODEL_DIR,
+                WordSegmenter.HMM_POS_MODEL_DIR):
+            if os.path.exists(os.path.join(data_dir, name)):
+                for target_dir in (store_dir, files_dir):
+                    os.symlink(os.path.join(data_dir, name),
+                            os.path.join(target_dir, name))
+        word_segmenter = WordSegmenter()
+        word_segmenter.load(store_dir)
+        word_segmenter.compile_model_store()
+        del word_segmenter
+
+        files = run(files_dir, corpus_file, workers)
+        store = run(store_dir, corpus_file, workers)
+    finally:
+        shutil.rmtree(store_dir)
+        shutil.rmtree(files_dir)
+
+    print 'workers: %d' % workers
+    print 'mode\tprivate_kb/worker\tpss_kb/worker'
+    print 'files\t%.0f\t%.0f' % tuple(files)
+    print 'store\t%.0f\t%.0f' % tuple(store)
+    print 'saved\t%.0f\t%.0f' % (files[0] - store[0], files[1] - store[1])
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+WordSegmenter.segment_many 多进程扩展性测试.
+
+用法: python benchmark/segment_many_benchmark.py [data_dir] [corpus_file]
+          [repeat] [max_workers]
+
+依次以 1, 2, 4, ... max_workers 个 worker 切分 corpus_file (重复 repeat 次),
+输出吞吐量以及相对单进程的加速比和并行效率.
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from word_segmenter import WordSegmenter
+
+def main(argv):
+    data_dir = argv[1] if len(argv) > 1 else 'data'
+    corpus_file = argv[2] if len(argv) > 2 else 'core/testdata/document.dat'
+    repeat = int(argv[3]) if len(argv) > 3 else 200
+    max_workers = int(argv[4]) if len(argv) > 4 \
+            else multiprocessing.cpu_count()
+
+    word_segmenter = WordSegmenter()
+    word_segmenter.load(data_dir)
+    fp = open(corpus_file, 'rb')
+    texts = [line.strip().decode('utf-8') for line in fp.readlines()] * repeat
+    fp.close()
+    num_chars = sum(len(text) for text in texts)
+
+    workers = 1
+    base_speed = None
+    print 'workers\tchars/s\tspeedup\tefficiency'
+    while workers <= max_workers:
+        start = time.time()
+        for words in word_segmenter.segment_many(texts, workers):
+            pass
+        speed = num_chars / (time.time() - start)
+        if base_speed is None:
+            base_speed = speed
+        print '%d\t%.0f\t%.2f\t%.2f' % (workers, speed, speed / base_speed,
+                speed / base_speed / workers)
+        if workers == max_workers:
+            break
+        workers = min(workers * 2, max_workers)
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+剪枝 Viterbi 与 max_decode_length 的速度和一致率测试.
+
+用法: python benchmark/viterbi_beam_benchmark.py [data_dir] [corpus_file]
+          [length] [count]
+
+从 corpus_file 的汉字中随机生成 count 个长度为 length 的汉字串 (模拟很长
+的未登录串), 分别用精确解码和各种剪枝参数切分, 输出每字耗时 (us/char)、
+相对精确解码的加速比、切分边界一致率 (每个字之后是否切分与精确解码相同
+的比例) 和与精确解码完全相同的串的比例.
+"""
+
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'core'))
+from hmm_segmenter import HMMSegmenter
+
+# (名称, beam_width, beam_threshold, max_decode_length)
+MODES = [('exact', None, None, None),
+         ('width=3', 3, None, None),
+         ('width=2', 2, None, None),
+         ('width=1', 1, None, None),
+         ('threshold=10', None, 10.0, None),
+         ('threshold=5', None, 5.0, None),
+         ('threshold=2', None, 2.0, None),
+         ('width=2,cap=50', 2, None, 50),
+         ('cap=50', None, None, 50),
+         ('cap=20', None, None, 20)]
+
+def boundaries(spans):
+    return set(spans[1::2])
+
+def run(hmm_segmenter, texts):
+    start = time.time()
+    results = [boundaries(hmm_segmenter.segment_spans(text))
+               for text in texts]
+    return time.time() - start, results
+
+def main(argv):
+    data_dir = os.path.abspath(argv[1] if len(argv) > 1
+            else os.path.join(ROOT_DIR, 'data'))
+    corpus_file = os.path.abspath(argv[2] if len(argv) > 2
+            else os.path.join(ROOT_DIR, 'core', 'testdata', 'document.dat'))
+    length = int(argv[3]) if len(argv) > 3 else 200
+    count = int(argv[4]) if len(argv) > 4 else 200
+
+    fp = open(corpus_file, 'rb')
+    chars = [ch for ch in fp.read().decode('utf-8')
+             if HMMSegmenter.scanner.char_class(ch) == HMMSegmenter.HANZI]
+    fp.close()
+    random.seed(0)
+    texts = [u''.join(random.choice(chars) for i in xrange(length))
+             for j in xrange(count)]
+    chars = float(length * count)
+
+    hmm_segmenter = HMMSegmenter()
+    hmm_segmenter.load(os.path.join(data_dir, 'hmm_segment_model'))
+    hmm_segmenter.ensure_loaded()
+
+    print 'texts: %d x %d chars' % (count, length)
+    print 'mode\tus/char\tspeedup\tboundary_agree\ttext_agree'
+    exact = None
+    for name, beam_width, beam_threshold, max_decode_length in MODES:
+        hmm_segmenter.hmm.beam_width = beam_width
+        hmm_segmenter.hmm.beam_threshold = beam_threshold
+        hmm_segmenter.max_decode_length = max_decode_length
+        elapsed, results = run(hmm_segmenter, texts)
+        if exact is None:
+            exact = elapsed, results
+        same = sum(length - len(a ^ b)
+                   for a, b in zip(results, exact[1])) / chars
+        identical = sum(a == b for a, b in zip(results, exact[1]))
+        print '%s\t%.2f\t%.2fx\t%.2f%%\t%.1f%%' % (name,
+                elapsed * 1e6 / chars, exact[0] / elapsed, same * 100,
+                identical * 100.0 / count)
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import re
+
+class CharScanner(object):
+    """
+    基于字符类别的预切分器, 一遍扫描把文本切分为 run (同一类别的最长字符串).
+
+    classes 为有序的 (类别, 字符集) 列表, 类别为 1~255 的整数, 字符集为正则
+    字符类的内容 (例如 u'\\u4E00-\\u9FA5'). 扫描时 run 的类别为第一个包含其
+    首字符的类别, run 延伸到不属于该类别字符集的字符为止, 因此字符集可以
+    重叠, 例如 [(NUMBER, u'\\.0-9'), (WORD, u'a-zA-Z0-9')] 把 'a12.5' 切分为
+    'a12' (WORD) 和 '.5' (NUMBER). 不属于任何字符集的字符组成 OTHER run.
+
+    构造时预先计算:
+        table  : BMP 内每个码位的类别 (bytearray), char_class 查表判断单字
+                 的类别.
+        pattern: 每个类别一个分支的正则, 一次扫描得到所有 run 及其类别,
+                 不需要对切出的串再次匹配.
+
+    NOTE: Python 中逐字查表的循环比正则引擎慢, 因此扫描用由同一份类别定义
+    生成的正则完成, 类别表只用于单字判断.
+    """
+    OTHER = 0
+
+    def __init__(self, classes):
+        self.table = bytearray(0x10000)
+        all_chars = u''.join(unichr(i) for i in xrange(0x10000))
+        branches = []
+        self.group_classes = [None]  # 正则分组下标 -> 类别
+        for char_class, charset in reversed(classes):  # 前面的类别优先
+            for match in re.finditer(u'[%s]' % charset, all_chars):
+                self.table[match.start()] = char_class
+        for char_class, charset in classes:
+            branches.append(u'([%s]+)' % charset)
+            self.group_classes.append(char_class)
+        branches.append(u'([^%s]+)' % u''.join(
+            charset for char_class, charset in classes))
+        self.group_classes.append(self.OTHER)
+        self.pattern = re.compile(u'|'.join(branches))
+
+    def char_class(self, ch):
+        """
+        返回字符 ch 的类别.
+        """
+        code = ord(ch)
+        if code < 0x10000:
+            return self.table[code]
+        return self.OTHER
+
+    def findall(self, text):
+        """
+        返回 text 的 run 列表, 每个 run 为一个元组, 第 k 个元素为 classes
+        中第 k 个类别的串, 最后一个元素为 OTHER 串, 其余元素为空串. 用于
+        不需要位置的切分, 比 scan 快.
+        """
+        return self.pattern.findall(text)
+
+    def scan(self, text, begin = 0, end = None):
+        """
+        依次返回 text[begin : end] 中的 (类别, run_begin, run_end).
+        """
+        if end is None:
+            end = len(text)
+        group_classes = self.group_classes
+        for match in self.pattern.finditer(text, begin, end):
+            yield (group_classes[match.lastindex], match.start(), match.end())
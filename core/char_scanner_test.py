@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import unittest
+
+from char_scanner import CharScanner
+
+class CharScannerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scanner = CharScanner([(1, ur"一-龥"), (2, u"0-9"),
+                                    (3, ur" \t")])
+
+    def test_char_class(self):
+        self.assertEqual(1, self.scanner.char_class(u'中'))
+        self.assertEqual(2, self.scanner.char_class(u'7'))
+        self.assertEqual(3, self.scanner.char_class(u'\t'))
+        self.assertEqual(CharScanner.OTHER, self.scanner.char_class(u'a'))
+        self.assertEqual(CharScanner.OTHER,
+                self.scanner.char_class(u'\U0001F600'[0]))
+
+    def test_scan(self):
+        text = u'中国2014年 ab，'
+        self.assertEqual([(1, 0, 2), (2, 2, 6), (1, 6, 7), (3, 7, 8),
+                          (CharScanner.OTHER, 8, 11)],
+                         list(self.scanner.scan(text)))
+        self.assertEqual([(2, 3, 6), (1, 6, 7)],
+                         list(self.scanner.scan(text, 3, 7)))
+        self.assertEqual([], list(self.scanner.scan(u'')))
+        self.assertEqual([(u'中国', u'', u'', u''), (u'', u'2014', u'', u''),
+                          (u'', u'', u'', u'ab，')],
+                         self.scanner.findall(u'中国2014ab，'))
+
+    def test_overlap(self):
+        scanner = CharScanner([(1, ur"\.0-9"), (2, u"a-zA-Z0-9")])
+        self.assertEqual(1, scanner.char_class(u'5'))
+        self.assertEqual([(2, 0, 3), (1, 3, 5), (CharScanner.OTHER, 5, 6),
+                          (1, 6, 8), (2, 8, 10)],
+                         list(scanner.scan(u'a12.5 12ab')))
+
+if __name__ == '__main__':
+    unittest.main()
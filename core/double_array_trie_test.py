@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import unittest
+
+from double_array_trie import DoubleArrayTrie
+
+class DoubleArrayTrieTest(unittest.TestCase):
+
+    def setUp(self):
+        self.words = [u'中华', u'中华人民', u'中华人民共和国', u'人民',
+                u'共和国', u'英雄三国', u'英雄', u'a']
+        self.trie = DoubleArrayTrie()
+        self.trie.build(self.words)
+
+    def test_get(self):
+        for k, word in enumerate(self.words):
+            self.assertEqual(k, self.trie.get(word))
+            self.assertIn(word, self.trie)
+        self.assertEqual(-1, self.trie.get(u'中'))
+        self.assertEqual(-1, self.trie.get(u'中华人'))
+        self.assertEqual(-1, self.trie.get(u'英雄联盟'))
+        self.assertNotIn(u'b', self.trie)
+
+    def test_prefix_search(self):
+        text = u'中华人民共和国英雄'
+        codes = self.trie.encode(text)
+        self.assertEqual([1, 3, 6], self.trie.prefix_search(codes, 0, len(text)))
+        self.assertEqual([1, 3], self.trie.prefix_search(codes, 0, 4))
+        self.assertEqual([3], self.trie.prefix_search(codes, 2, len(text)))
+        self.assertEqual([], self.trie.prefix_search(codes, 1, len(text)))
+        self.assertEqual([8], self.trie.prefix_search(codes, 7, len(text)))
+
+if __name__ == '__main__':
+    unittest.main()
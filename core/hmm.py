@@ -24,43 +24,363 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+from array import array
+import ast
+import collections
+import ctypes
+import logging
+import os
+import struct
+import sys
+import threading
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from double_array_trie import DoubleArrayTrie
+
+_load_lock = threading.Lock()  # 保证延迟加载的模型只加载一次
+
 class HMM(object):
     """
     HMM 模型.
 
-    TODO(fandywang): 增加模型训练代码, 主要分两种:
-        1. 有指导学习: 在人工标注数据集基础上, 采用最大似然估计 (MLE) 方法得到
-           n-gram 模型.
-        2. 无指导学习: 不需要人工标注数据集, 采用 Baum-Welch 算法估计参数.
-           Baum-Welch 算法又称前向-后向算法 (Forward-backward algorithm),
-           属于一种典型的 EM 算法.
+    模型以稠密结构保存, 隐含状态和观测符号都用整数下标表示:
+        states         : 隐含状态列表, 按状态名排序, 使 viterbi 中 max 的平局
+                         规则与按 (log_prob, 状态名) 比较一致.
+        symbols        : 观测符号 -> 下标, 未登录符号的下标为 len(symbols).
+        start_log_prob : start_log_prob[k], 起始概率.
+        trans_log_prob : trans_log_prob[k0][k], 状态转移概率.
+        emit_log_prob  : emit_log_prob[k][symbol], 每个状态一个 array('d'),
+                         末尾多一项存放未登录符号的平滑概率.
+    缺失的概率均填充为 DEFAULT_LOG_PROB.
+
+    模型文件有两种格式, load 优先加载二进制格式:
+        1. 二进制格式 MODEL_FILENAME, 由 save 生成, 格式见 save.
+        2. 文本格式, 四个 Python 字面量文件 (states.dat 等), 可以通过
+           python hmm.py model_dir 转换为二进制格式.
+    load(model_dir, lazy = True) 只记录模型目录, 第一次解码时才加载.
+
+    beam_width / beam_threshold 不为 None 时 viterbi 使用剪枝解码: 每个
+    时刻只保留得分最高的 beam_width 个状态, 以及 / 或得分不低于最高分减
+    beam_threshold 的状态, 下一时刻只在保留的状态中取最大值 (最后一个时刻
+    不剪枝, 保证存在合法的终止状态). 结果不一定与精确解码相同, 速度和
+    一致率见 benchmark/viterbi_beam_benchmark.py.
+
+    dump_mapped 写出可直接映射的格式, attach 从 mmap 中使用该格式的模型
+    (见 ModelStore): 概率表为指向 mmap 的 ctypes 数组, symbols 为按码位
+    索引的数组或 double array trie, 多个进程共享同一份物理内存页.
+
+    模型训练见 hmm_trainer.py:
+        1. 有指导学习: HMMTrainer, 在人工标注数据集基础上采用最大似然估计.
+        2. 无指导学习: BaumWelchTrainer, 不需要人工标注数据集, 采用
+           Baum-Welch 算法 (前向-后向算法, 一种典型的 EM 算法) 估计参数.
     """
     STATES_FILENAME = "states.dat"
     START_LOG_PROB_FILENAME = 'start_log_prob.dat'
     TRANS_LOG_PROB_FILENAME = 'trans_log_prob.dat'
     EMIT_LOG_PROB_FILENAME = 'emit_log_prob.dat'
+    MODEL_FILENAME = 'hmm_model.bin'
+    MAGIC = 'WSHMM001'
+    HEADER_FORMAT = '=8s8sIIII'
+    MAPPED_MAGIC = 'WSHMMMAP'
+    # magic, byteorder, num_states, num_symbols, states_size, symbols_size,
+    # symbol_index, index_size, chars_size
+    MAPPED_HEADER_FORMAT = '=8s8sIIIIIII'
+    CHAR_INDEX = 0  # 观测符号均为单字: 以码位为下标的数组
+    TRIE_INDEX = 1  # 其他: double array trie
     DEFAULT_LOG_PROB = -3.14E100  # 平滑
+    NUMPY_MIN_STATES = 16  # 状态数不少于该值且安装了 NumPy 时, 向量化解码
 
     def __init__(self):
         self.states = None  # 隐含状态集
+        self.symbols = None  # 观测符号集
         self.start_log_prob = None  # 起始概率矩阵
         self.trans_log_prob = None  # 状态转移概率矩阵
         self.emit_log_prob = None  # 发射概率矩阵
+        self._trans_to = None  # _trans_to[k][k0] = trans_log_prob[k0][k]
+        self._numpy_model = None  # (start, trans, emit) 的 numpy.ndarray
+        self._symbol_states = None  # 见 symbol_states
+        self._mapped_emit = None  # attach 时 emit 矩阵在 mmap 中的 (mm, offset)
+        self.lazy_model_dir = None  # 延迟加载的模型目录, 加载后为 None
+        self.load_time = None  # 模型加载耗时 (秒), 尚未加载时为 None
+        self.beam_width = None  # 剪枝解码保留的状态数, None 表示不限制
+        self.beam_threshold = None  # 剪枝解码的得分阈值, None 表示不限制
+
+    def load(self, model_dir, lazy = False):
+        """
+        加载模型文件, 优先加载二进制格式.
+
+        lazy 为 True 时只记录 model_dir, 由 viterbi / viterbi_batch 在第一次
+        解码时调用 ensure_loaded 加载.
+        """
+        if lazy:
+            self.lazy_model_dir = model_dir
+            return
+
+        start = time.time()
+        model_file = model_dir + '/' + self.__class__.MODEL_FILENAME
+        if os.path.exists(model_file):
+            self._load_binary(model_file)
+        else:
+            self._load_text(model_dir)
+        self.load_time = time.time() - start
+        self.lazy_model_dir = None
+        logging.info('Load HMM model from %s in %.3fs.'
+                % (model_dir, self.load_time))
+
+    def ensure_loaded(self):
+        """
+        加载延迟加载的模型, 多个线程同时调用时只加载一次.
+        """
+        if self.lazy_model_dir is None:
+            return
+        with _load_lock:
+            if self.lazy_model_dir is not None:
+                self.load(self.lazy_model_dir)
+
+    def _load_text(self, model_dir):
+        """
+        加载文本格式的模型文件.
+        """
+        logging.info('Load hmm text model from %s.' % model_dir)
+        def literal(filename):
+            fp = open(model_dir + '/' + filename, 'rb')
+            value = ast.literal_eval(fp.read())
+            fp.close()
+            return value
+
+        self.set_model(literal(self.__class__.STATES_FILENAME),
+                literal(self.__class__.START_LOG_PROB_FILENAME),
+                literal(self.__class__.TRANS_LOG_PROB_FILENAME),
+                literal(self.__class__.EMIT_LOG_PROB_FILENAME))
+
+    def set_model(self, states, start_log_prob, trans_log_prob, emit_log_prob):
+        """
+        由 dict 形式的模型参数构造稠密模型:
+            start_log_prob[state], trans_log_prob[state0][state],
+            emit_log_prob[state][symbol].
+        """
+        default = self.__class__.DEFAULT_LOG_PROB
+        self.states = sorted(states)
+        symbols = set()
+        for state in self.states:
+            symbols.update(emit_log_prob.get(state, {}))
+        self.symbols = dict((symbol, i)
+                for i, symbol in enumerate(sorted(symbols)))
 
-    def load(self, model_dir):
+        self.start_log_prob = [start_log_prob.get(k, default)
+                for k in self.states]
+        self.trans_log_prob = [
+                [trans_log_prob.get(k0, {}).get(k, default)
+                    for k in self.states]
+                for k0 in self.states]
+        self.emit_log_prob = []
+        for k in self.states:
+            emit = array('d', [default]) * (len(self.symbols) + 1)
+            for symbol, log_prob in emit_log_prob.get(k, {}).iteritems():
+                emit[self.symbols[symbol]] = log_prob
+            self.emit_log_prob.append(emit)
+        self._reset_cache()
+
+    def save(self, model_dir):
         """
-        加载模型文件.
+        保存为二进制格式 (本机字节序):
+            header         : HEADER_FORMAT
+            states         : utf-8, '\\n' 分隔
+            symbols        : utf-8, '\\n' 分隔, 按下标顺序
+            start_log_prob : float64[num_states]
+            trans_log_prob : float64[num_states * num_states]
+            emit_log_prob  : float64[num_states * (num_symbols + 1)]
         """
-        self.states = eval(open(model_dir + '/'
-            + self.__class__.STATES_FILENAME, 'rb').read())
-        self.start_log_prob = eval(open(model_dir + '/'
-            + self.__class__.START_LOG_PROB_FILENAME, 'rb').read())
-        self.trans_log_prob = eval(open(model_dir + '/'
-            + self.__class__.TRANS_LOG_PROB_FILENAME, 'rb').read())
-        self.emit_log_prob = eval(open(model_dir + '/'
-            + self.__class__.EMIT_LOG_PROB_FILENAME, 'rb').read())
+        model_file = model_dir + '/' + self.__class__.MODEL_FILENAME
+        logging.info('Save hmm binary model to %s.' % model_file)
+        symbols = sorted(self.symbols, key = lambda symbol: self.symbols[symbol])
+        states_data = u'\n'.join(self.states).encode('utf-8')
+        symbols_data = u'\n'.join(symbols).encode('utf-8')
+
+        fp = open(model_file, 'wb')
+        fp.write(struct.pack(self.__class__.HEADER_FORMAT, self.__class__.MAGIC,
+                sys.byteorder.ljust(8), len(self.states), len(symbols),
+                len(states_data), len(symbols_data)))
+        fp.write(states_data)
+        fp.write(symbols_data)
+        array('d', self.start_log_prob).tofile(fp)
+        for row in self.trans_log_prob:
+            array('d', row).tofile(fp)
+        for emit in self.emit_log_prob:
+            array('d', emit).tofile(fp)
+        fp.close()
 
-    def viterbi(self, obs):
+    def dump_mapped(self, fp):
+        """
+        将模型以可映射格式写入 fp 的当前位置 (须按 8 字节对齐), 返回写入的
+        字节数. 各段按 8 字节对齐 (本机字节序):
+            header         : MAPPED_HEADER_FORMAT
+            states         : utf-8, '\\n' 分隔
+            symbols        : utf-8, '\\n' 分隔, 按下标顺序
+            start_log_prob : float64[num_states]
+            trans_log_prob : float64[num_states * num_states]
+            emit_log_prob  : float64[num_states * (num_symbols + 1)]
+            symbol_index   : CHAR_INDEX 时为 int32[index_size], 码位 -> 下标
+                             + 1 (0 表示未登录); TRIE_INDEX 时为 chars (utf-8,
+                             chars_size 字节) 和 base / check / value
+                             (int32[index_size]).
+        """
+        self.ensure_loaded()
+        symbols = sorted(self.symbols, key = lambda symbol: self.symbols[symbol])
+        states_data = u'\n'.join(self.states).encode('utf-8')
+        symbols_data = u'\n'.join(symbols).encode('utf-8')
+        probs = array('d', self.start_log_prob)
+        for row in self.trans_log_prob:
+            probs.extend(row)
+        for emit in self.emit_log_prob:
+            probs.extend(emit)
+
+        chars_data = ''
+        if all(len(symbol) == 1 and ord(symbol) < 0x10000
+                for symbol in symbols):
+            symbol_index = self.__class__.CHAR_INDEX
+            table = array('i', [0]) * (max([0] + map(ord, symbols)) + 1)
+            for i, symbol in enumerate(symbols):
+                table[ord(symbol)] = i + 1
+            index_sections = [table.tostring()]
+            index_size = len(table)
+        else:
+            symbol_index = self.__class__.TRIE_INDEX
+            trie = DoubleArrayTrie()
+            trie.build(symbols)
+            chars = sorted(trie.codes, key = lambda ch: trie.codes[ch])
+            chars_data = u''.join(chars).encode('utf-8')
+            index_sections = [chars_data, trie.base.tostring(),
+                    trie.check.tostring(), trie.value.tostring()]
+            index_size = len(trie.base)
+
+        header = struct.pack(self.__class__.MAPPED_HEADER_FORMAT,
+                self.__class__.MAPPED_MAGIC, sys.byteorder.ljust(8),
+                len(self.states), len(symbols), len(states_data),
+                len(symbols_data), symbol_index, index_size, len(chars_data))
+        size = 0
+        for section in [header, states_data, symbols_data,
+                probs.tostring()] + index_sections:
+            padding = '\0' * (-len(section) % 8)
+            fp.write(section)
+            fp.write(padding)
+            size += len(section) + len(padding)
+        return size
+
+    def attach(self, mm, offset = 0, name = None):
+        """
+        使用 mm (mmap, 须可写或 ACCESS_COPY) 中从 offset 开始的 dump_mapped
+        格式模型, 不复制概率表. name 用于错误信息.
+        """
+        start = time.time()
+        (magic, byteorder, num_states, num_symbols, states_size, symbols_size,
+                symbol_index, index_size, chars_size) = struct.unpack_from(
+                        self.__class__.MAPPED_HEADER_FORMAT, mm, offset)
+        if magic != self.__class__.MAPPED_MAGIC \
+                or byteorder.strip() != sys.byteorder:
+            raise ValueError('Bad mapped hmm model: %s.' % name)
+
+        position = [offset + struct.calcsize(
+            self.__class__.MAPPED_HEADER_FORMAT)]
+        def section(size):
+            begin = position[0] + (-position[0] % 8)
+            position[0] = begin + size
+            return begin
+
+        def ctypes_array(ctype, n):
+            return (ctype * n).from_buffer(mm, section(ctypes.sizeof(ctype) * n))
+
+        begin = section(states_size)
+        self.states = mm[begin : begin + states_size].decode(
+                'utf-8').split(u'\n')
+        symbols_offset = section(symbols_size)
+        S = num_states
+        W = num_symbols + 1
+        probs_offset = section(8 * (S + S * S + S * W))
+        probs = (ctypes.c_double * (S + S * S)).from_buffer(mm, probs_offset)
+        self.start_log_prob = probs[: S]
+        self.trans_log_prob = [probs[S + k0 * S : S + (k0 + 1) * S]
+                for k0 in xrange(S)]
+        emit_offset = probs_offset + 8 * (S + S * S)
+        self.emit_log_prob = [(ctypes.c_double * W).from_buffer(
+            mm, emit_offset + 8 * W * k) for k in xrange(S)]
+
+        if symbol_index == self.__class__.CHAR_INDEX:
+            self.symbols = _CharSymbols(
+                    ctypes_array(ctypes.c_int32, index_size), num_symbols,
+                    mm, symbols_offset, symbols_size)
+        else:
+            begin = section(chars_size)
+            trie = DoubleArrayTrie()
+            trie.codes = dict((ch, code) for code, ch in enumerate(
+                mm[begin : begin + chars_size].decode('utf-8'), 1))
+            trie.base = ctypes_array(ctypes.c_int32, index_size)
+            trie.check = ctypes_array(ctypes.c_int32, index_size)
+            trie.value = ctypes_array(ctypes.c_int32, index_size)
+            self.symbols = _TrieSymbols(trie, num_symbols,
+                    mm, symbols_offset, symbols_size)
+        self._reset_cache()
+        self._mapped_emit = (mm, emit_offset)
+        self.load_time = time.time() - start
+        self.lazy_model_dir = None
+
+    def _load_binary(self, model_file):
+        """
+        加载 save 生成的二进制模型文件.
+        """
+        logging.info('Load hmm binary model from %s.' % model_file)
+        fp = open(model_file, 'rb')
+        data = fp.read()
+        fp.close()
+
+        header_size = struct.calcsize(self.__class__.HEADER_FORMAT)
+        (magic, byteorder, num_states, num_symbols, states_size,
+                symbols_size) = struct.unpack_from(
+                        self.__class__.HEADER_FORMAT, data, 0)
+        if magic != self.__class__.MAGIC \
+                or byteorder.strip() != sys.byteorder:
+            raise ValueError('Bad hmm model file: %s.' % model_file)
+
+        offset = header_size
+        self.states = data[offset : offset + states_size].decode(
+                'utf-8').split(u'\n')
+        offset += states_size
+        symbols = data[offset : offset + symbols_size].decode(
+                'utf-8').split(u'\n') if num_symbols > 0 else []
+        self.symbols = dict((symbol, i) for i, symbol in enumerate(symbols))
+        offset += symbols_size
+
+        def read_array(n):
+            value = array('d')
+            value.fromstring(data[offset : offset + value.itemsize * n])
+            return value, offset + value.itemsize * n
+
+        self.start_log_prob, offset = read_array(num_states)
+        self.start_log_prob = self.start_log_prob.tolist()
+        self.trans_log_prob = []
+        for k0 in xrange(num_states):
+            row, offset = read_array(num_states)
+            self.trans_log_prob.append(row.tolist())
+        self.emit_log_prob = []
+        for k in xrange(num_states):
+            emit, offset = read_array(num_symbols + 1)
+            self.emit_log_prob.append(emit)
+        self._reset_cache()
+
+    def _reset_cache(self):
+        S = len(self.states)
+        self._trans_to = [[self.trans_log_prob[k0][k] for k0 in xrange(S)]
+                for k in xrange(S)]
+        self._numpy_model = None
+        self._symbol_states = None
+        self._mapped_emit = None
+
+    def viterbi(self, obs, end_states = ('E', 'S')):
         """
         HMM 解码: 基于动态规划的 Viterbi 算法.
 
@@ -68,28 +388,363 @@ class HMM(object):
         V[t][k] = argmax_k0 { V[t-1][k] + trans_log_prob[k0][k] }
                   + emit_log_prob[k][obs[t]] }
 
-        k, k0 表示隐含状态 states.
+        k, k0 表示隐含状态下标. 只保留前一时刻的得分, 并记录回溯指针
+        backpointers[t][k] = argmax_k0, 解码结束后一次回溯得到状态序列,
+        时间和空间都与 len(obs) 成线性关系. 得分相同时取下标较大的状态.
+
+        end_states 为允许的终止状态, None 表示不限制. 返回 (log_prob, 状态
+        名序列).
+
+        设置了 beam_width 或 beam_threshold 时使用剪枝解码, 见 _forward_beam.
         """
-        V = [{}]  # tabular
-        path = {}
+        self.ensure_loaded()
+        obs = self._encode(obs)
+        end_states = self._end_state_indices(end_states)
+
+        if self.beam_width is not None or self.beam_threshold is not None:
+            V, backpointers = self._forward_beam(obs)
+        elif numpy is not None \
+                and len(self.states) >= self.__class__.NUMPY_MIN_STATES:
+            V, backpointers = self._forward_numpy(obs)
+        else:
+            V, backpointers = self._forward(obs)
+
+        state = end_states[0]
+        for k in end_states:
+            if V[k] >= V[state]:
+                state = k
+        log_prob = float(V[state])
+
+        tags = [None] * len(obs)
+        for t in xrange(len(obs) - 1, 0, -1):
+            tags[t] = self.states[state]
+            state = backpointers[t][state]
+        tags[0] = self.states[state]
+        return (log_prob, tags)
+
+    def viterbi_batch(self, obs_list, end_states = ('E', 'S')):
+        """
+        批量 Viterbi 解码, 返回与 obs_list 一一对应的 (log_prob, 状态名序列),
+        结果与逐个调用 viterbi 相同.
+
+        安装了 NumPy 时, 将观测序列按长度分桶, 同一桶内的序列在一次前向过程
+        中同时解码, 每个时刻对 (序列, 状态, 状态) 做一次矩阵运算; 否则 (或
+        使用剪枝解码时) 逐个调用 viterbi.
+        """
+        self.ensure_loaded()
+        if numpy is None or self.beam_width is not None \
+                or self.beam_threshold is not None:
+            return [self.viterbi(obs, end_states) for obs in obs_list]
+
+        end_states = self._end_state_indices(end_states)
+        buckets = {}
+        for i, obs in enumerate(obs_list):
+            buckets.setdefault(len(obs), []).append(i)
 
-        for k in self.states:  # init
-            V[0][k] = (self.start_log_prob[k]
-                    + self.emit_log_prob[k].get(obs[0], self.__class__.DEFAULT_LOG_PROB))
-            path[k] = [k]
+        results = [None] * len(obs_list)
+        for length, indices in buckets.iteritems():
+            obs_batch = numpy.array([self._encode(obs_list[i])
+                for i in indices], dtype = numpy.intp)
+            V, backpointers = self._forward_batch_numpy(obs_batch)
 
+            state = numpy.empty(len(indices), dtype = numpy.intp)
+            state.fill(end_states[0])
+            rows = numpy.arange(len(indices))
+            for k in end_states:
+                state[V[:, k] >= V[rows, state]] = k
+            log_probs = V[rows, state]
+
+            tags = numpy.empty((len(indices), length), dtype = numpy.intp)
+            for t in xrange(length - 1, 0, -1):
+                tags[:, t] = state
+                state = backpointers[t, rows, state]
+            tags[:, 0] = state
+
+            for row, i in enumerate(indices):
+                results[i] = (float(log_probs[row]),
+                        [self.states[k] for k in tags[row]])
+        return results
+
+    def viterbi_lattice(self, lattice):
+        """
+        在剪枝后的网格上做 Viterbi 解码.
+
+        lattice[t] 为 (候选状态下标列表, 对应的发射概率列表), 每个时刻只在
+        相邻时刻的候选状态之间转移, 时间复杂度为
+        sum_t |lattice[t - 1]| * |lattice[t]|, 而不是 len(lattice) * 状态数^2.
+        候选状态按下标升序排列时, 平局规则与 viterbi 相同. 返回 (log_prob,
+        状态名序列).
+        """
+        self.ensure_loaded()
+        if not lattice:
+            return (0.0, [])
+
+        trans = self.trans_log_prob
+        candidates, emits = lattice[0]
+        V = [self.start_log_prob[k] + emits[i]
+                for i, k in enumerate(candidates)]
+        backpointers = []
+        for t in xrange(1, len(lattice)):
+            prev_candidates = candidates
+            candidates, emits = lattice[t]
+            V_t = []
+            pointers = []
+            for i, k in enumerate(candidates):
+                best, best_i0 = None, 0
+                for i0, k0 in enumerate(prev_candidates):
+                    log_prob = V[i0] + trans[k0][k]
+                    if best is None or log_prob >= best:
+                        best, best_i0 = log_prob, i0
+                V_t.append(best + emits[i])
+                pointers.append(best_i0)
+            V = V_t
+            backpointers.append(pointers)
+
+        i = 0
+        for i0 in xrange(len(V)):
+            if V[i0] >= V[i]:
+                i = i0
+        log_prob = V[i]
+
+        tags = [None] * len(lattice)
+        for t in xrange(len(lattice) - 1, 0, -1):
+            tags[t] = self.states[lattice[t][0][i]]
+            i = backpointers[t - 1][i]
+        tags[0] = self.states[lattice[0][0][i]]
+        return (log_prob, tags)
+
+    def symbol_states(self):
+        """
+        返回下标为观测符号编号的列表, 元素为该符号发射概率不为
+        DEFAULT_LOG_PROB 的状态下标 (升序), 即词性标注的词性词典. 模型加载
+        或映射后第一次调用时扫描一遍 emit 矩阵, 之后直接返回.
+        """
+        if self._symbol_states is None:
+            default = self.__class__.DEFAULT_LOG_PROB
+            num_symbols = len(self.symbols)
+            symbol_states = [[] for i in xrange(num_symbols)]
+            for k, emit in enumerate(self.emit_log_prob):
+                for symbol, log_prob in enumerate(emit[:num_symbols]):
+                    if log_prob > default:
+                        symbol_states[symbol].append(k)
+            self._symbol_states = symbol_states
+        return self._symbol_states
+
+    def _encode(self, obs):
+        unknown = len(self.symbols)
+        return [self.symbols.get(o, unknown) for o in obs]
+
+    def _end_state_indices(self, end_states):
+        if end_states is None:
+            return range(len(self.states))
+        return sorted(self.states.index(k) for k in end_states)
+
+    def _get_numpy_model(self):
+        if self._numpy_model is None:
+            if self._mapped_emit is not None:  # 直接使用 mmap 中的 emit 矩阵
+                mm, offset = self._mapped_emit
+                S = len(self.states)
+                W = len(self.symbols) + 1
+                emit = numpy.frombuffer(mm, numpy.float64, S * W,
+                        offset).reshape(S, W)
+            else:
+                emit = numpy.array(self.emit_log_prob)
+            self._numpy_model = (numpy.array(self.start_log_prob),
+                    numpy.array(self.trans_log_prob), emit)
+        return self._numpy_model
+
+    def _forward(self, obs):
+        """
+        Viterbi 前向过程, 返回最后时刻的得分和回溯指针表.
+        """
+        S = len(self.states)
+        states = xrange(S)
+        trans_to = self._trans_to
+        emit = self.emit_log_prob
+        backpointers = [None] * len(obs)
+
+        o = obs[0]
+        V = [self.start_log_prob[k] + emit[k][o] for k in states]
+        for t in xrange(1, len(obs)):
+            o = obs[t]
+            newV = [0.0] * S
+            backpointer = [0] * S
+            for k in states:
+                trans = trans_to[k]
+                log_prob, state = V[0] + trans[0], 0
+                for k0 in xrange(1, S):
+                    score = V[k0] + trans[k0]
+                    if score >= log_prob:
+                        log_prob, state = score, k0
+                newV[k] = log_prob + emit[k][o]
+                backpointer[k] = state
+            V = newV
+            backpointers[t] = backpointer
+        return V, backpointers
+
+    def _forward_beam(self, obs):
+        """
+        剪枝的 Viterbi 前向过程, 返回值同 _forward. 每个时刻只在上一时刻
+        保留的状态 (见 _prune, 按下标升序) 中取最大值, 得分相同时同样取下标
+        较大的状态.
+        """
+        S = len(self.states)
+        states = xrange(S)
+        trans_to = self._trans_to
+        emit = self.emit_log_prob
+        backpointers = [None] * len(obs)
+        last = len(obs) - 1
+
+        o = obs[0]
+        V = [self.start_log_prob[k] + emit[k][o] for k in states]
+        active = self._prune(V) if last > 0 else None
+        for t in xrange(1, len(obs)):
+            o = obs[t]
+            first, rest = active[0], active[1:]
+            newV = [0.0] * S
+            backpointer = [0] * S
+            for k in states:
+                trans = trans_to[k]
+                log_prob, state = V[first] + trans[first], first
+                for k0 in rest:
+                    score = V[k0] + trans[k0]
+                    if score >= log_prob:
+                        log_prob, state = score, k0
+                newV[k] = log_prob + emit[k][o]
+                backpointer[k] = state
+            V = newV
+            backpointers[t] = backpointer
+            if t < last:
+                active = self._prune(V)
+        return V, backpointers
+
+    def _prune(self, V):
+        """
+        返回按 beam_width 和 beam_threshold 保留的状态下标 (升序).
+        """
+        width = self.beam_width
+        if width is not None and width < len(V):
+            active = sorted(xrange(len(V)), key = V.__getitem__,
+                            reverse = True)[:max(width, 1)]
+            active.sort()
+        else:
+            active = range(len(V))
+        if self.beam_threshold is not None:
+            floor = max([V[k] for k in active]) - self.beam_threshold
+            active = [k for k in active if V[k] >= floor]
+        return active
+
+    def _forward_numpy(self, obs):
+        """
+        基于 NumPy 的 Viterbi 前向过程, 每个时刻对所有状态做矩阵运算.
+        """
+        start, trans, emit = self._get_numpy_model()
+        S = len(self.states)
+        columns = numpy.arange(S)
+        # 倒序排列 k0, argmax 取第一个最大值即下标最大的 k0
+        reversed_trans = trans[::-1]
+        emit = emit[:, obs]
+        backpointers = numpy.zeros((len(obs), S), dtype = numpy.int32)
+
+        V = start + emit[:, 0]
         for t in xrange(1, len(obs)):
-            V.append({})
-            newpath = {}
-            for k in self.states:
-                (log_prob, state) = \
-                        max([(V[t - 1][k0]
-                            + self.trans_log_prob[k0].get(k, self.__class__.DEFAULT_LOG_PROB), k0)
-                            for k0 in self.states])
-                V[t][k] = log_prob + self.emit_log_prob[k].get(obs[t], self.__class__.DEFAULT_LOG_PROB)
-                newpath[k] = path[state] + [k]
-            path = newpath
-        (log_prob, state) = max([(V[len(obs) - 1][k], k) for k in ('E', 'S')])
-
-        return (log_prob, path[state])
+            scores = V[::-1, None] + reversed_trans
+            best = scores.argmax(axis = 0)
+            V = scores[best, columns] + emit[:, t]
+            backpointers[t] = S - 1 - best
+        return V, backpointers
+
+    def _forward_batch_numpy(self, obs_batch):
+        """
+        对等长观测序列 obs_batch (序列数 x 长度) 同时做 Viterbi 前向过程,
+        返回最后时刻的得分 (序列数 x 状态数) 和回溯指针表
+        (长度 x 序列数 x 状态数).
+        """
+        start, trans, emit = self._get_numpy_model()
+        S = len(self.states)
+        B, N = obs_batch.shape
+        rows = numpy.arange(B)[:, None]
+        columns = numpy.arange(S)[None, :]
+        reversed_trans = trans[::-1][None, :, :]
+        emit = emit[:, obs_batch]  # 状态数 x 序列数 x 长度
+        backpointers = numpy.zeros((N, B, S), dtype = numpy.int32)
+
+        V = start[None, :] + emit[:, :, 0].T
+        for t in xrange(1, N):
+            scores = V[:, ::-1, None] + reversed_trans
+            best = scores.argmax(axis = 1)
+            V = scores[rows, best, columns] + emit[:, :, t].T
+            backpointers[t] = S - 1 - best
+        return V, backpointers
+
+class _MappedSymbols(collections.Mapping):
+    """
+    HMM.attach 使用的只读观测符号表: symbol -> 下标. 符号本身 (utf-8,
+    '\\n' 分隔) 也在 mmap 中, 只在遍历时解码.
+    """
+
+    def __init__(self, num_symbols, mm, symbols_offset, symbols_size):
+        self._num_symbols = num_symbols
+        self._mmap = mm
+        self._symbols_offset = symbols_offset
+        self._symbols_size = symbols_size
+
+    def __getitem__(self, symbol):
+        i = self.get(symbol, -1)
+        if i < 0:
+            raise KeyError(symbol)
+        return i
+
+    def __contains__(self, symbol):
+        return self.get(symbol, -1) >= 0
+
+    def __len__(self):
+        return self._num_symbols
+
+    def __iter__(self):
+        if self._num_symbols == 0:
+            return iter([])
+        begin = self._symbols_offset
+        return iter(self._mmap[begin : begin + self._symbols_size].decode(
+            'utf-8').split(u'\n'))
+
+class _CharSymbols(_MappedSymbols):
+    """
+    单字观测符号表, table[码位] 为下标 + 1, 0 表示未登录.
+    """
+
+    def __init__(self, table, *args):
+        _MappedSymbols.__init__(self, *args)
+        self._table = table
+        self._size = len(table)
+
+    def get(self, symbol, default = None):
+        if len(symbol) == 1:
+            code = ord(symbol)
+            if code < self._size:
+                i = self._table[code]
+                if i > 0:
+                    return i - 1
+        return default
+
+class _TrieSymbols(_MappedSymbols):
+    """
+    基于 double array trie 的观测符号表.
+    """
+
+    def __init__(self, trie, *args):
+        _MappedSymbols.__init__(self, *args)
+        self._trie = trie
+
+    def get(self, symbol, default = None):
+        i = self._trie.get(symbol)
+        if i < 0:
+            return default
+        return i
 
+if __name__ == '__main__':
+    # 用法: python hmm.py model_dir, 将文本格式模型转换为二进制格式.
+    logging.basicConfig(level = logging.INFO)
+    hmm = HMM()
+    hmm._load_text(sys.argv[1])
+    hmm.save(sys.argv[1])
@@ -25,31 +25,121 @@
 # THE SOFTWARE.
 
 import re
+
 from hmm import HMM
 
 class HMMPOSTagger(object):
     """
     在中文分词结果基础上, 采用 HMM 模型实现词性标注 (Part-of-speech tagging).
+
+    隐含状态为词性, 观测为词. 解码时每个词只考虑其候选词性, 在剪枝后的网格
+    上做 Viterbi (见 HMM.viterbi_lattice), 每个词的代价与候选词性数的乘积
+    成正比, 而不是词性集大小的平方. 词 w 的候选词性依次取:
+        1. 词性词典: 模型中 w 的发射概率不为 DEFAULT_LOG_PROB 的词性, 加载
+           模型后只计算一次 (见 HMM.symbol_states).
+        2. 词性词典中没有 w 时, 取分词词典 vocabulary 中 w 的词性 (若属于
+           模型的词性集), 补充训练语料中未出现的词.
+        3. 以上都没有时为全部词性.
+    模型中没有的 (词性, 词) 发射概率取该词性的未登录词平滑概率, 模型没有
+    平滑时取 UNKNOWN_EMIT_LOG_PROB, 此时由转移概率决定词性.
+
+    没有加载模型时 (例如 data_dir 下没有 hmm_pos_model), 词性取自分词词典
+    vocabulary (词典中没有的词为 'UNK'); 也没有 vocabulary 时抛出
+    ValueError.
     """
+    UNKNOWN_EMIT_LOG_PROB = -20.0
 
-    def __init__(self):
+    def __init__(self, vocabulary = None):
         self.hmm = HMM()
+        self.vocabulary = vocabulary  # 分词词典, 提供候选词性
 
         self.re_chinese = re.compile(ur"([\u4E00-\u9FA5]+)")  # 正则匹配汉字串
         self.re_skip = re.compile(ur"([\.0-9]+|[a-zA-Z0-9]+)")  # 正则匹配英文串和数字串
 
-    def load(self, model_dir):
+    def load(self, model_dir, lazy = False):
+        """
+        加载模型文件, lazy 为 True 时第一次使用时才加载, 见 HMM.load.
+        """
+        self.hmm.load(model_dir, lazy)
+
+    def ensure_loaded(self):
         """
-        加载模型文件.
+        立即加载延迟加载的模型.
         """
-        self.hmm.load(model_dir)
+        self.hmm.ensure_loaded()
 
     def pos_tag(self, words):
         """
-        基于 HMM 模型的词性标注.
+        基于 HMM 模型的词性标注, 返回 (词, 词性) 序列.
         """
-        log_prob, pos_list = self._viterbi(words)
+        words = list(words)
+        if not self._has_model():
+            for w in words:
+                yield (w, self.vocabulary.get_pos(w))
+            return
+        log_prob, pos_list = self.hmm.viterbi_lattice(
+                [self._candidates(word, {}) for word in words])
 
         for i, w in enumerate(words):
             yield (w, pos_list[i])
 
+    def pos_tag_batch(self, word_lists):
+        """
+        批量词性标注, 返回与 word_lists 一一对应的 (词, 词性) 列表. 同一批
+        中重复出现的词只计算一次候选词性.
+        """
+        if not self._has_model():
+            return [[(w, self.vocabulary.get_pos(w)) for w in words]
+                    for words in word_lists]
+        memo = {}
+        results = []
+        for words in word_lists:
+            words = list(words)
+            log_prob, pos_list = self.hmm.viterbi_lattice(
+                    [self._candidates(word, memo) for word in words])
+            results.append(zip(words, pos_list))
+        return results
+
+    def _has_model(self):
+        """
+        是否加载了词性标注模型 (延迟加载的模型在此时加载). 没有模型也没有
+        vocabulary 时抛出 ValueError.
+        """
+        self.hmm.ensure_loaded()
+        if self.hmm.states is not None:
+            return True
+        if self.vocabulary is None:
+            raise ValueError('HMM POS model is not loaded and there is no '
+                             'vocabulary to take POS tags from.')
+        return False
+
+    def _candidates(self, word, memo):
+        """
+        返回 word 的 (候选词性下标列表, 发射概率列表), 结果记录在 memo 中.
+        """
+        if word in memo:
+            return memo[word]
+
+        hmm = self.hmm
+        unknown = len(hmm.symbols)
+        symbol = hmm.symbols.get(word, unknown)
+        candidates = []
+        if symbol != unknown:
+            candidates = hmm.symbol_states()[symbol]
+        if not candidates and self.vocabulary is not None:
+            word_attr = self.vocabulary.get_word(word)
+            if word_attr is not None and word_attr[1] in hmm.states:
+                candidates = [hmm.states.index(word_attr[1])]
+        if not candidates:
+            candidates = range(len(hmm.states))
+
+        emits = []
+        for k in candidates:
+            log_prob = hmm.emit_log_prob[k][symbol]
+            if log_prob <= HMM.DEFAULT_LOG_PROB:
+                log_prob = hmm.emit_log_prob[k][unknown]
+            if log_prob <= HMM.DEFAULT_LOG_PROB:
+                log_prob = self.__class__.UNKNOWN_EMIT_LOG_PROB
+            emits.append(log_prob)
+        memo[word] = (candidates, emits)
+        return memo[word]
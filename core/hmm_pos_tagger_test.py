@@ -35,16 +35,16 @@ class HMMPOSTaggerTest(unittest.TestCase):
 
     def setUp(self):
         self.vocabulary = Vocabulary()
-        self.vocabulary.load('../data/vocabulary.dat')
+        self.vocabulary.load('testdata/vocabulary.dat', 'testdata/custom_words')
         self.hmm_segmenter = HMMSegmenter()
         self.hmm_segmenter.load('../data/hmm_segment_model')
         self.max_prob_segmenter = MaxProbSegmenter(
                 self.vocabulary, self.hmm_segmenter)
 
-        self.hmm_pos_tagger = HMMPOSTagger()
-        self.hmm_pos_tagger.load('../data/hmm_pos_model')
+        self.hmm_pos_tagger = HMMPOSTagger(self.vocabulary)
+        self.hmm_pos_tagger.load('testdata/hmm_pos_model')
 
-    def call_segment(self, text):
+    def call_pos_tag(self, text):
         for word, pos in self.hmm_pos_tagger.pos_tag(
                 self.max_prob_segmenter.segment(text)):
             print word + '/' + pos + '\t',
@@ -56,6 +56,46 @@ class HMMPOSTaggerTest(unittest.TestCase):
             self.call_pos_tag(text.strip())
         fp.close()
 
+        self.assertEqual([(u'我', 'r'), (u'爱', 'v'), (u'北京', 'ns'),
+            (u'天安门', 'ns')], list(self.hmm_pos_tagger.pos_tag(
+                [u'我', u'爱', u'北京', u'天安门'])))
+        self.assertEqual([(u'中国', 'ns'), (u'的', 'uj'), (u'人', 'n')],
+                list(self.hmm_pos_tagger.pos_tag([u'中国', u'的', u'人'])))
+        self.assertEqual([], list(self.hmm_pos_tagger.pos_tag([])))
+
+    def test_candidates(self):
+        hmm = self.hmm_pos_tagger.hmm
+        candidates, emits = self.hmm_pos_tagger._candidates(u'爱', {})
+        self.assertEqual(['n', 'v'], [hmm.states[k] for k in candidates])
+        # 模型中没有的词取分词词典中的词性
+        candidates, emits = self.hmm_pos_tagger._candidates(u'英雄三国', {})
+        self.assertEqual(['n'], [hmm.states[k] for k in candidates])
+        self.assertEqual([HMMPOSTagger.UNKNOWN_EMIT_LOG_PROB], emits)
+        candidates, emits = self.hmm_pos_tagger._candidates(u'十大伪歌手', {})
+        self.assertEqual(len(hmm.states), len(candidates))
+        # 词性词典中有的词不再补充分词词典中的词性
+        self.vocabulary.add_word(u'天安门', 10, 'n')
+        candidates, emits = self.hmm_pos_tagger._candidates(u'天安门', {})
+        self.assertEqual(['ns'], [hmm.states[k] for k in candidates])
+
+    def test_pos_tag_batch(self):
+        fp = open('testdata/document.dat', 'rb')
+        word_lists = [list(self.max_prob_segmenter.segment(text.strip()))
+                for text in fp.readlines()]
+        fp.close()
+        self.assertEqual(
+                [list(self.hmm_pos_tagger.pos_tag(words))
+                    for words in word_lists],
+                self.hmm_pos_tagger.pos_tag_batch(word_lists))
+
+    def test_without_model(self):
+        hmm_pos_tagger = HMMPOSTagger(self.vocabulary)
+        self.assertEqual([(u'英雄三国', 'n'), (u'十大伪歌手', 'UNK')],
+                list(hmm_pos_tagger.pos_tag([u'英雄三国', u'十大伪歌手'])))
+        self.assertEqual([[(u'英雄三国', 'n')]],
+                hmm_pos_tagger.pos_tag_batch([[u'英雄三国']]))
+        self.assertRaises(ValueError, list,
+                HMMPOSTagger().pos_tag([u'英雄三国']))
+
 if __name__ == '__main__':
     unittest.main()
-
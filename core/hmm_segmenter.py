@@ -24,8 +24,12 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
-import re
+import time
+from array import array
+
+from char_scanner import CharScanner
 from hmm import HMM
+from text_decoder import TextDecoder
 
 class HMMSegmenter(object):
     """
@@ -59,49 +63,188 @@ class HMMSegmenter(object):
           获得一个概率模型, 可以使用 HMM、MaxEnt、CRF 建模.
       (2) 然后, 在待分字串上, 根据字与字之间的结合紧密程度, 得到词位的标注结果.
       (3) 最后, 根据词位定义直接获得最终的分词结果.
+
+    文本先由 scanner 一遍扫描切分为汉字串 (HANZI)、数字串 (NUMBER, [.0-9]+)、
+    英文串 (WORD, 以字母开头的 [a-zA-Z0-9]+) 和其他字符串, 只对汉字串做字
+    标注, 其余各自作为一个词.
+
+    max_decode_length 不为 None 时, 每个汉字串只有前 max_decode_length 个字
+    交给 Viterbi 解码, 其余的字各自作为一个词, 避免很长的未登录字串占用
+    过多解码时间; 为 0 时不做 HMM 解码, 汉字串全部按单字切分. 剪枝解码见 HMM.beam_width / HMM.beam_threshold.
     """
+    HANZI = 1
+    NUMBER = 2
+    WORD = 3
+    scanner = CharScanner([(HANZI, ur"\u4E00-\u9FA5"), (NUMBER, ur"\.0-9"),
+                           (WORD, u"a-zA-Z0-9")])
 
     def __init__(self):
         self.hmm = HMM()
+        self.instrumentation = None  # 设置后记录 Viterbi 解码次数、长度和耗时
+        self.decoder = TextDecoder(sticky = False)  # 非 unicode 输入的解码
+        self.max_decode_length = None  # 汉字串最多解码的字数, None 表示不限制
 
-        self.re_chinese = re.compile(ur"([\u4E00-\u9FA5]+)")  # 正则匹配汉字串
-        self.re_skip = re.compile(ur"([\.0-9]+|[a-zA-Z0-9]+)")  # 正则匹配英文串和数字串
+    def load(self, model_dir, lazy = False):
+        """
+        加载模型文件, lazy 为 True 时第一次使用时才加载, 见 HMM.load.
+        """
+        self.hmm.load(model_dir, lazy)
 
-    def load(self, model_dir):
+    def ensure_loaded(self):
         """
-        加载模型文件.
+        立即加载延迟加载的模型.
         """
-        self.hmm.load(model_dir)
+        self.hmm.ensure_loaded()
 
     def segment(self, text):
         """
         对输入文本 text 做中文切词, 返回词序列.
 
-        NOTE: 支持 text 编码自动识别.
+        NOTE: 非 unicode 的 text 由 decoder 解码, 见 TextDecoder.
+        """
+        return self.segment_unicode(self.decoder.decode(text))
+
+    def segment_unicode(self, text):
+        """
+        同 segment, 但 text 必须是 unicode, 不做类型检查和解码.
         """
-        if not (type(text) is unicode):
-            try:
-                text = text.decode('utf-8')
-            except:
-                text = text.decode('gbk', 'ignore')
+        for hanzi, number, word, other in self.scanner.findall(text):
+            if hanzi:
+                for w in self._tagging(hanzi):
+                    yield w
+            else:
+                yield number or word or other
 
-        blocks = self.re_chinese.split(text)
-        for block in blocks:
-            if self.re_chinese.match(block):
-                for word in self._tagging(block):
-                    yield word
+    def segment_spans(self, text, begin = 0, end = None, spans = None):
+        """
+        对 text[begin : end] 切词, 返回词在 text 中的位置 array('i'),
+        第 k 个词为 text[spans[2 * k] : spans[2 * k + 1]]. 结果与 segment
+        相同, 但除交给 Viterbi 解码的汉字串外不生成子串. spans 不为 None 时
+        直接追加到 spans 中. text 必须是 unicode.
+        """
+        if spans is None:
+            spans = array('i')
+        if end is None:
+            end = len(text)
+        for char_class, begin, end in self.scanner.scan(text, begin, end):
+            if char_class == self.HANZI:
+                self._tagging_spans(text[begin : end], begin, spans)
             else:
-                words = self.re_skip.split(block)
-                for word in words:
-                    if len(word) > 0:
-                        yield word
+                spans.extend((begin, end))
+        return spans
+
+    def _tagging_spans(self, text, offset, spans):
+        """
+        基于 HMM 模型切词, 词的位置 (加上 offset) 追加到 spans.
+        """
+        tag_list = self._decode(text)
+        begin = offset
+        for i, tag in enumerate(tag_list):
+            if tag == 'B':
+                begin = offset + i
+            elif tag == 'E' or tag == 'S':
+                spans.extend((offset + i if tag == 'S' else begin,
+                              offset + i + 1))
+
+    def segment_batch(self, texts):
+        """
+        批量切词, 返回与 texts 一一对应的词列表.
+
+        所有文本中的汉字串一起交给 HMM.viterbi_batch 批量解码, 再按原顺序
+        拼回, 结果与逐个调用 segment 相同.
+        """
+        return self.segment_batch_unicode(
+                [self.decoder.decode(text) for text in texts])
+
+    def segment_batch_unicode(self, texts):
+        """
+        同 segment_batch, 但 texts 必须都是 unicode, 不做类型检查和解码.
+        """
+        results = []
+        blocks = []  # 待解码的汉字串, 在 results 中以其下标占位
+        for text in texts:
+            words = []
+            for hanzi, number, word, other in self.scanner.findall(text):
+                if hanzi:
+                    words.append(len(blocks))
+                    blocks.append(hanzi)
+                else:
+                    words.append(number or word or other)
+            results.append(words)
+
+        limit = self.max_decode_length
+        decoded = blocks
+        if limit is not None:
+            decoded = [block[:limit] for block in blocks]
+        instrumentation = self.instrumentation
+        if limit == 0:
+            tag_lists = [(0.0, [])] * len(blocks)
+        else:
+            if instrumentation is not None:
+                instrumentation.count('hmm.calls', len(decoded))
+                for block in decoded:
+                    instrumentation.observe('hmm.sequence_length',
+                                            len(block))
+                start = time.time()
+            tag_lists = self.hmm.viterbi_batch(decoded)
+            if instrumentation is not None:
+                instrumentation.timing('hmm.viterbi_us', start)
+        for i, words in enumerate(results):
+            segmented = []
+            for word in words:
+                if type(word) is int:
+                    block = blocks[word]
+                    tag_list = tag_lists[word][1]
+                    if len(tag_list) < len(block):
+                        tag_list = self._pad(tag_list, block)
+                    segmented.extend(self._cut(block, tag_list))
+                else:
+                    segmented.append(word)
+            results[i] = segmented
+        return results
 
     def _tagging(self, text):
         """
         基于 HMM 模型切词.
         """
-        log_prob, tag_list = self.hmm.viterbi(text)
+        return self._cut(text, self._decode(text))
 
+    def _decode(self, text):
+        """
+        返回 text 的字标注结果, 超出 max_decode_length 的部分标注为 S.
+        """
+        limit = self.max_decode_length
+        decoded = text
+        if limit is not None and len(text) > limit:
+            decoded = text[:limit]
+        instrumentation = self.instrumentation
+        if len(decoded) == 0:
+            tag_list = []
+        elif instrumentation is None:
+            log_prob, tag_list = self.hmm.viterbi(decoded)
+        else:
+            instrumentation.count('hmm.calls')
+            instrumentation.observe('hmm.sequence_length', len(decoded))
+            start = time.time()
+            log_prob, tag_list = self.hmm.viterbi(decoded)
+            instrumentation.timing('hmm.viterbi_us', start)
+        if decoded is not text:
+            tag_list = self._pad(tag_list, text)
+        return tag_list
+
+    def _pad(self, tag_list, text):
+        """
+        将 text 前缀的字标注结果补齐到 len(text), 未解码的字标注为 S.
+        """
+        if self.instrumentation is not None:
+            self.instrumentation.count('hmm.truncated_chars',
+                                       len(text) - len(tag_list))
+        return list(tag_list) + ['S'] * (len(text) - len(tag_list))
+
+    def _cut(self, text, tag_list):
+        """
+        根据字标注结果切词.
+        """
         begin = 0
         for i, ch in enumerate(text):
             tag = tag_list[i]
@@ -45,6 +45,45 @@ class HMMSegmenterTest(unittest.TestCase):
             self.call_segment(text.strip())
         fp.close()
 
+    def test_segment_batch(self):
+        fp = open('testdata/document.dat', 'rb')
+        texts = [text.strip() for text in fp.readlines()]
+        fp.close()
+        self.assertEqual(
+                [list(self.hmm_segmenter.segment(text)) for text in texts],
+                self.hmm_segmenter.segment_batch(texts))
+
+    def test_segment_spans(self):
+        fp = open('testdata/document.dat', 'rb')
+        texts = [text.strip().decode('utf-8') for text in fp.readlines()]
+        fp.close()
+        for text in texts:
+            spans = self.hmm_segmenter.segment_spans(text)
+            self.assertEqual(list(self.hmm_segmenter.segment(text)),
+                    [text[spans[k] : spans[k + 1]]
+                     for k in xrange(0, len(spans), 2)])
+
+    def test_max_decode_length(self):
+        text = u'小明硕士毕业于中国科学院计算所'
+        self.hmm_segmenter.max_decode_length = 7
+        words = list(self.hmm_segmenter.segment(text))
+        self.assertEqual(list(self.hmm_segmenter.segment(text[:7])),
+                         words[:-8])
+        self.assertEqual(list(text[7:]), words[-8:])
+        self.assertEqual([words], self.hmm_segmenter.segment_batch([text]))
+        spans = self.hmm_segmenter.segment_spans(text)
+        self.assertEqual(words, [text[spans[k] : spans[k + 1]]
+                                 for k in xrange(0, len(spans), 2)])
+
+        # 为 0 时不做 HMM 解码, 全部按单字切分
+        self.hmm_segmenter.max_decode_length = 0
+        self.assertEqual(list(text), list(self.hmm_segmenter.segment(text)))
+        self.assertEqual([list(text)],
+                         self.hmm_segmenter.segment_batch([text]))
+        spans = self.hmm_segmenter.segment_spans(text)
+        self.assertEqual(list(text), [text[spans[k] : spans[k + 1]]
+                                      for k in xrange(0, len(spans), 2)])
+
 if __name__ == '__main__':
     unittest.main()
 
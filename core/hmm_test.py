@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import ast
+import random
+import shutil
+import tempfile
+import unittest
+
+import hmm
+from hmm import HMM
+
+def load_dict_model(model_dir):
+    def literal(filename):
+        return ast.literal_eval(open(model_dir + '/' + filename, 'rb').read())
+    return (literal(HMM.STATES_FILENAME),
+            literal(HMM.START_LOG_PROB_FILENAME),
+            literal(HMM.TRANS_LOG_PROB_FILENAME),
+            literal(HMM.EMIT_LOG_PROB_FILENAME))
+
+def path_viterbi(model, obs):
+    """
+    原 dict 模型 + 路径复制的 Viterbi 实现, 用于校验解码结果.
+    """
+    states, start_log_prob, trans_log_prob, emit_log_prob = model
+
+    V = [{}]
+    path = {}
+    for k in states:
+        V[0][k] = (start_log_prob[k]
+                + emit_log_prob[k].get(obs[0], HMM.DEFAULT_LOG_PROB))
+        path[k] = [k]
+    for t in xrange(1, len(obs)):
+        V.append({})
+        newpath = {}
+        for k in states:
+            (log_prob, state) = max([(V[t - 1][k0]
+                + trans_log_prob[k0].get(k, HMM.DEFAULT_LOG_PROB), k0)
+                for k0 in states])
+            V[t][k] = log_prob + emit_log_prob[k].get(obs[t],
+                    HMM.DEFAULT_LOG_PROB)
+            newpath[k] = path[state] + [k]
+        path = newpath
+    (log_prob, state) = max([(V[len(obs) - 1][k], k) for k in ('E', 'S')])
+    return (log_prob, path[state])
+
+class HMMTest(unittest.TestCase):
+
+    def setUp(self):
+        self.text_hmm = HMM()
+        self.text_hmm._load_text('../data/hmm_segment_model')
+
+        self.model_dir = tempfile.mkdtemp()
+        self.text_hmm.save(self.model_dir)
+        self.hmm = HMM()
+        self.hmm.load(self.model_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.model_dir)
+
+    def test_load(self):
+        self.assertEqual(['B', 'E', 'M', 'S'], self.hmm.states)
+        self.assertEqual(self.text_hmm.symbols, self.hmm.symbols)
+        self.assertEqual(self.text_hmm.start_log_prob, self.hmm.start_log_prob)
+        self.assertEqual(self.text_hmm.trans_log_prob, self.hmm.trans_log_prob)
+        self.assertEqual(self.text_hmm.emit_log_prob, self.hmm.emit_log_prob)
+
+        B, E = self.hmm.states.index('B'), self.hmm.states.index('E')
+        self.assertEqual(HMM.DEFAULT_LOG_PROB, self.hmm.trans_log_prob[B][B])
+        self.assertAlmostEqual(-0.16037786260859094,
+                self.hmm.trans_log_prob[B][E])
+        self.assertAlmostEqual(-3.6544978750449433,
+                self.hmm.emit_log_prob[B][self.hmm.symbols[u'一']])
+        self.assertEqual(HMM.DEFAULT_LOG_PROB,
+                self.hmm.emit_log_prob[B][len(self.hmm.symbols)])
+
+    def test_viterbi(self):
+        log_prob, tags = self.hmm.viterbi(u'小明硕士毕业于中国科学院计算所')
+        self.assertEqual(15, len(tags))
+        self.assertIn(tags[-1], ('E', 'S'))
+        self.assertEqual((log_prob, tags),
+                self.text_hmm.viterbi(u'小明硕士毕业于中国科学院计算所'))
+
+    def test_viterbi_equals_path_viterbi(self):
+        chars = list(open('testdata/document.dat', 'rb').read().decode('utf-8'))
+        chars.append(u'\u9fff')  # 未登录字
+        random.seed(0)
+        texts = [u''.join(random.choice(chars)
+            for i in xrange(random.randint(1, 40))) for j in xrange(200)]
+        model = load_dict_model('../data/hmm_segment_model')
+        expected = [path_viterbi(model, text) for text in texts]
+
+        for text, result in zip(texts, expected):
+            self.assertEqual(result, self.hmm.viterbi(text))
+
+        if hmm.numpy is not None:
+            numpy_min_states = HMM.NUMPY_MIN_STATES
+            HMM.NUMPY_MIN_STATES = 1
+            try:
+                for text, result in zip(texts, expected):
+                    self.assertEqual(result, self.hmm.viterbi(text))
+            finally:
+                HMM.NUMPY_MIN_STATES = numpy_min_states
+
+        self.assertEqual(expected, self.hmm.viterbi_batch(texts))
+
+    def test_viterbi_beam(self):
+        chars = list(open('testdata/document.dat', 'rb').read().decode('utf-8'))
+        random.seed(1)
+        texts = [u''.join(random.choice(chars)
+            for i in xrange(random.randint(1, 60))) for j in xrange(100)]
+        expected = [self.hmm.viterbi(text) for text in texts]
+
+        self.hmm.beam_width = len(self.hmm.states)
+        self.assertEqual(expected, [self.hmm.viterbi(text) for text in texts])
+        self.hmm.beam_width = None
+        self.hmm.beam_threshold = float('inf')
+        self.assertEqual(expected, self.hmm.viterbi_batch(texts))
+
+        self.hmm.beam_width = 1
+        self.hmm.beam_threshold = None
+        for text, (log_prob, tags) in zip(texts, expected):
+            beam_log_prob, beam_tags = self.hmm.viterbi(text)
+            self.assertEqual(len(text), len(beam_tags))
+            self.assertIn(beam_tags[-1], ('E', 'S'))
+            self.assertLessEqual(beam_log_prob, log_prob)
+
+    def test_symbol_states(self):
+        states, start, trans, emit = load_dict_model('../data/hmm_segment_model')
+        for model in (self.text_hmm, self.hmm):
+            symbol_states = model.symbol_states()
+            self.assertIs(symbol_states, model.symbol_states())
+            self.assertEqual(len(model.symbols), len(symbol_states))
+            for symbol in (u'一', u'的', u'鑫'):
+                self.assertEqual([k for k, state in enumerate(model.states)
+                                  if symbol in emit[state]],
+                        symbol_states[model.symbols[symbol]])
+
+    def test_viterbi_lattice(self):
+        text = u'小明硕士毕业于中国科学院计算所'
+        states = range(len(self.hmm.states))
+        unknown = len(self.hmm.symbols)
+        lattice = [(states, [self.hmm.emit_log_prob[k][
+            self.hmm.symbols.get(ch, unknown)] for k in states])
+            for ch in text]
+        self.assertEqual(self.hmm.viterbi(text, None),
+                self.hmm.viterbi_lattice(lattice))
+
+        # 只保留 B、E 两个候选状态
+        B, E = self.hmm.states.index('B'), self.hmm.states.index('E')
+        lattice = [([B, E], [emits[B], emits[E]]) for states, emits in lattice]
+        log_prob, tags = self.hmm.viterbi_lattice(lattice[:4])
+        self.assertEqual(['B', 'E', 'B', 'E'], tags)
+
+if __name__ == '__main__':
+    unittest.main()
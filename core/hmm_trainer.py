@@ -0,0 +1,624 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import argparse
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import pprint
+import signal
+import sys
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from hmm import HMM
+from hmm_segmenter import HMMSegmenter
+
+class HMMCounts(object):
+    """
+    HMM 有指导训练的计数: start[state]、trans[state0][state] 和
+    emit[state][symbol] 分别为起始、转移和发射事件的次数. 计数可以按任意
+    顺序合并 (merge), 合并结果与语料的切分方式和处理顺序无关.
+    """
+
+    def __init__(self):
+        self.start = {}
+        self.trans = {}
+        self.emit = {}
+        self.sequences = 0  # 序列数
+        self.symbols = 0  # 观测符号总数
+
+    def add(self, states, symbols):
+        """
+        累加一个 (状态序列, 观测序列) 的计数, 两者等长且不为空.
+        """
+        start, trans, emit = self.start, self.trans, self.emit
+        state0 = states[0]
+        start[state0] = start.get(state0, 0) + 1
+        for i, state in enumerate(states):
+            if i > 0:
+                row = trans.get(state0)
+                if row is None:
+                    row = trans[state0] = {}
+                row[state] = row.get(state, 0) + 1
+            row = emit.get(state)
+            if row is None:
+                row = emit[state] = {}
+            symbol = symbols[i]
+            row[symbol] = row.get(symbol, 0) + 1
+            state0 = state
+        self.sequences += 1
+        self.symbols += len(states)
+
+    def merge(self, other):
+        """
+        将 other 的计数合并到本对象, 返回本对象.
+        """
+        for state, n in other.start.iteritems():
+            self.start[state] = self.start.get(state, 0) + n
+        for table, other_table in ((self.trans, other.trans),
+                (self.emit, other.emit)):
+            for state, other_row in other_table.iteritems():
+                row = table.setdefault(state, {})
+                for key, n in other_row.iteritems():
+                    row[key] = row.get(key, 0) + n
+        self.sequences += other.sequences
+        self.symbols += other.symbols
+        return self
+
+    def estimate(self, states = None):
+        """
+        最大似然估计, 返回 (states, start_log_prob, trans_log_prob,
+        emit_log_prob), 格式同 HMM.set_model. 没有出现过的事件不写入,
+        由 HMM 以 DEFAULT_LOG_PROB 平滑. states 为 None 时取出现过的状态.
+        """
+        if states is None:
+            states = set(self.start) | set(self.emit)
+            for row in self.trans.itervalues():
+                states.update(row)
+            states = sorted(states)
+        return (list(states), self._normalize(self.start),
+                dict((state, self._normalize(row))
+                     for state, row in self.trans.iteritems()),
+                dict((state, self._normalize(row))
+                     for state, row in self.emit.iteritems()))
+
+    def _normalize(self, counts):
+        log_total = math.log(sum(counts.itervalues()))
+        return dict((key, math.log(n) - log_total)
+                    for key, n in counts.iteritems())
+
+
+class HMMTrainer(object):
+    """
+    从已切分或已标注的语料有指导地训练 HMM 模型 (最大似然估计).
+
+    语料为文本文件, 每行一个句子, 词之间以空白分隔:
+        1. 分词模型 (tagged 为 False): 每个词按 BMES 标注为字的状态序列,
+           即 HMMSegmenter 使用的模型. 与 HMMSegmenter 一样只对汉字串建模,
+           含有非汉字字符的词将句子断开为多个序列.
+        2. 词性标注模型 (tagged 为 True): 每个词写作 "词/词性", 词性为状态,
+           词为观测符号, 即 HMMPOSTagger 使用的模型.
+
+    训练为 map-reduce 过程: 语料文件按 chunk_size 字节切分为若干段 (段的
+    边界对齐到行首), workers 个进程各自流式读取一段并计数 (HMMCounts),
+    主进程按完成顺序合并计数, 最后做最大似然估计. 内存只与计数表的大小
+    (状态数 x 符号数, 分词模型还有每段中不同词的个数) 有关, 与语料大小
+    无关; 计数是整数, 结果与 workers 和 chunk_size 无关. workers 为 1 时
+    在当前进程中计数.
+
+    用法: python hmm_trainer.py [--tagged] [--workers N] model_dir
+              corpus_file ...
+    写出文本格式模型 (states.dat 等) 和二进制格式 (HMM.save), 可以直接由
+    HMM.load 加载或写入 ModelStore.
+    """
+    SEGMENT_STATES = ['B', 'M', 'E', 'S']
+    TAG_SEPARATOR = u'/'
+    CHUNK_SIZE = 64 << 20
+
+    def __init__(self, tagged = False, workers = None, chunk_size = None,
+            encoding = 'utf-8'):
+        self.tagged = tagged
+        self.workers = workers or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size or self.__class__.CHUNK_SIZE
+        self.encoding = encoding
+
+    def count(self, corpus_files):
+        """
+        统计 corpus_files 中的事件, 返回合并后的 HMMCounts.
+        """
+        tasks = [(self.tagged, self.encoding) + chunk
+                 for chunk in _chunks(corpus_files, self.chunk_size)]
+        logging.info('Count %d chunks with %d workers.'
+                % (len(tasks), self.workers))
+
+        counts = HMMCounts()
+        if self.workers == 1 or len(tasks) <= 1:
+            for task in tasks:
+                counts.merge(_count_chunk(task))
+            return counts
+        pool = multiprocessing.Pool(self.workers, _init_worker)
+        try:
+            for chunk_counts in pool.imap_unordered(_count_chunk, tasks):
+                counts.merge(chunk_counts)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+        return counts
+
+    def train(self, corpus_files):
+        """
+        训练并返回 HMM 模型.
+        """
+        counts = self.count(corpus_files)
+        logging.info('Counted %d sequences, %d symbols.'
+                % (counts.sequences, counts.symbols))
+        states = None if self.tagged else self.__class__.SEGMENT_STATES
+        hmm = HMM()
+        hmm.set_model(*counts.estimate(states))
+        return hmm
+
+    @staticmethod
+    def save(hmm, model_dir):
+        """
+        将 hmm 保存为文本格式和二进制格式, model_dir 不存在时创建.
+        """
+        if not os.path.isdir(model_dir):
+            os.makedirs(model_dir)
+        default = HMM.DEFAULT_LOG_PROB
+        states = hmm.states
+        symbols = sorted(hmm.symbols, key = hmm.symbols.get)
+        emit_log_prob = {}
+        for k, state in enumerate(states):
+            emit = hmm.emit_log_prob[k]
+            emit_log_prob[state] = dict((symbol, emit[i])
+                    for i, symbol in enumerate(symbols) if emit[i] != default)
+        for filename, value in (
+                (HMM.STATES_FILENAME, states),
+                (HMM.START_LOG_PROB_FILENAME,
+                 dict(zip(states, hmm.start_log_prob))),
+                (HMM.TRANS_LOG_PROB_FILENAME,
+                 dict((state0, dict((state, log_prob)
+                      for state, log_prob in zip(states, row)
+                      if log_prob != default))
+                      for state0, row in zip(states, hmm.trans_log_prob))),
+                (HMM.EMIT_LOG_PROB_FILENAME, emit_log_prob)):
+            fp = open(os.path.join(model_dir, filename), 'wb')
+            fp.write(pprint.pformat(value))
+            fp.close()
+        hmm.save(model_dir)
+
+    @classmethod
+    def count_lines(cls, lines, tagged = False, counts = None):
+        """
+        统计 lines (unicode 句子序列) 中的事件, 累加到 counts 并返回.
+        """
+        if counts is None:
+            counts = HMMCounts()
+        if tagged:
+            separator = cls.TAG_SEPARATOR
+            for line in lines:
+                words, tags = [], []
+                for token in line.split():
+                    word, sep, tag = token.rpartition(separator)
+                    if sep and word:
+                        words.append(word)
+                        tags.append(tag)
+                if words:
+                    counts.add(tags, words)
+            return counts
+
+        # 词内的 BMES 标注只取决于词本身, 词间的转移只取决于前后两个词是否
+        # 为单字, 因此先按词计数, 最后再展开为字的计数
+        match = HMMSegmenter.scanner.pattern.match
+        group_classes = HMMSegmenter.scanner.group_classes
+        hanzi = HMMSegmenter.HANZI
+        word_counts = {}
+        starts = [0, 0]  # 以多字词 / 单字开始的序列数
+        joins = [[0, 0], [0, 0]]  # joins[前一个词是单字][后一个词是单字]
+        for line in lines:
+            prev = None  # 序列中的前一个词是否为单字, None 表示序列开始
+            for word in line.split():
+                m = match(word)
+                if group_classes[m.lastindex] != hanzi or m.end() < len(word):
+                    prev = None
+                    continue
+                word_counts[word] = word_counts.get(word, 0) + 1
+                single = len(word) == 1
+                if prev is None:
+                    starts[single] += 1
+                else:
+                    joins[prev][single] += 1
+                prev = single
+
+        def add(table, state, key, n):
+            if n > 0:
+                row = table.setdefault(state, {})
+                row[key] = row.get(key, 0) + n
+        trans, emit = counts.trans, counts.emit
+        for single, state in ((0, 'B'), (1, 'S')):
+            if starts[single] > 0:
+                counts.start[state] = \
+                        counts.start.get(state, 0) + starts[single]
+        for prev, last in ((0, 'E'), (1, 'S')):
+            add(trans, last, 'B', joins[prev][0])
+            add(trans, last, 'S', joins[prev][1])
+        for word, n in word_counts.iteritems():
+            counts.symbols += n * len(word)
+            if len(word) == 1:
+                add(emit, 'S', word, n)
+                continue
+            add(emit, 'B', word[0], n)
+            for ch in word[1:-1]:
+                add(emit, 'M', ch, n)
+            add(emit, 'E', word[-1], n)
+            if len(word) == 2:
+                add(trans, 'B', 'E', n)
+            else:
+                add(trans, 'B', 'M', n)
+                add(trans, 'M', 'M', n * (len(word) - 3))
+                add(trans, 'M', 'E', n)
+        counts.sequences += starts[0] + starts[1]
+        return counts
+
+
+class BaumWelchTrainer(object):
+    """
+    用 Baum-Welch 算法 (前向-后向算法, EM) 在未切分的生语料上无指导地训练
+    HMMSegmenter 的分词模型. 通常以已有模型为初始值, 使模型适应新领域的
+    文本. 需要 NumPy.
+
+    与 HMMSegmenter 一样只使用语料中的汉字串, 每个汉字串为一个观测序列.
+    观测符号为 HMMSegmenter.scanner 中的全部汉字 (以码位查表得到下标, 不需要
+    预先统计字表), 初始模型中发射概率为 0 的字取该状态的最小非 0 发射概率,
+    再归一化, 使新领域的字也能被学到.
+
+    每轮迭代:
+        E 步: 语料按 chunk_size 字节切分 (见 HMMTrainer), workers 个进程
+              各自流式读取一段, 将汉字串按长度分桶, 同一桶内的序列一起做
+              带缩放 (scaling) 的前向-后向计算: 每个时刻是一次 (序列, 状态)
+              x (状态, 状态) 的矩阵运算, 没有逐字的 Python 循环. 累加起始、
+              转移和发射的期望次数, 每批最多 BATCH_CHARS 个字, 内存与语料
+              大小无关. 序列的终止状态限定为 end_states, 与 HMM.viterbi
+              一致.
+        M 步: 主进程合并各段的期望次数并归一化, 再与初始参数按
+              interpolation 插值, 得到新的模型参数.
+    每轮的每字平均 log 似然记录在 history 中并写入日志, 其变化小于
+    tolerance 或达到 max_iterations 轮时停止.
+
+    NOTE: 不插值 (interpolation 为 0) 时似然单调上升, 但几轮之后模型会
+    退化为几乎全部标注为 S (逐字切分的似然更高), 语料中没有出现的字的
+    发射概率也变为 0. 插值保留初始模型的切分能力, 用于领域适应. 返回的 HMM 可以由
+    HMMTrainer.save 保存, 由 HMMSegmenter 加载.
+
+    用法: python hmm_trainer.py --init_model model_dir [--iterations N]
+              output_model_dir corpus_file ...
+    """
+    MAX_ITERATIONS = 10
+    TOLERANCE = 1e-4  # 每字平均 log 似然的最小增量
+    BATCH_CHARS = 1 << 18  # 每批前向-后向计算的最大字数
+    INTERPOLATION = 0.5  # 新参数与初始参数插值时初始参数的权重
+
+    def __init__(self, workers = None, chunk_size = None, encoding = 'utf-8',
+            max_iterations = None, tolerance = None, interpolation = None):
+        if numpy is None:
+            raise ImportError('BaumWelchTrainer requires NumPy.')
+        self.workers = workers or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size or HMMTrainer.CHUNK_SIZE
+        self.encoding = encoding
+        self.max_iterations = max_iterations or self.__class__.MAX_ITERATIONS
+        self.tolerance = tolerance
+        if tolerance is None:
+            self.tolerance = self.__class__.TOLERANCE
+        self.interpolation = interpolation
+        if interpolation is None:
+            self.interpolation = self.__class__.INTERPOLATION
+        self.history = []  # 每轮的每字平均 log 似然
+
+    def train(self, corpus_files, hmm, end_states = ('E', 'S')):
+        """
+        以 hmm 为初始模型训练, 返回新的 HMM 模型, hmm 本身不变.
+        """
+        hmm.ensure_loaded()
+        symbols = _hanzi_symbols()
+        model = initial_model = self._initial_model(hmm, symbols, end_states)
+        chunks = _chunks(corpus_files, self.chunk_size)
+        pool = None
+        if self.workers > 1 and len(chunks) > 1:
+            pool = multiprocessing.Pool(self.workers, _init_worker)
+        self.history = []
+        try:
+            for iteration in xrange(1, self.max_iterations + 1):
+                start_time = time.time()
+                tasks = [(model, self.encoding) + chunk + (self.BATCH_CHARS,)
+                         for chunk in chunks]
+                if pool is None:
+                    results = itertools.imap(_expect_chunk, tasks)
+                else:
+                    results = pool.imap_unordered(_expect_chunk, tasks)
+                totals = None
+                for result in results:
+                    if totals is None:
+                        totals = result
+                    else:
+                        totals = [a + b for a, b in zip(totals, result)]
+                start, trans, emit, log_likelihood, chars = totals
+                if chars == 0:
+                    raise ValueError('No decodable Hanzi in corpus.')
+                self.history.append(log_likelihood / chars)
+                logging.info('Baum-Welch iteration %d: log likelihood %.6f '
+                        'per char over %d chars, %.1fs.' % (iteration,
+                        self.history[-1], chars, time.time() - start_time))
+                model = self._maximize(model, start, trans, emit,
+                                       initial_model)
+                if len(self.history) > 1 \
+                        and abs(self.history[-1] - self.history[-2]) \
+                        < self.tolerance:
+                    break
+            if pool is not None:
+                pool.close()
+        except:
+            if pool is not None:
+                pool.terminate()
+            raise
+        finally:
+            if pool is not None:
+                pool.join()
+        return self._to_hmm(hmm.states, symbols, model)
+
+    def _initial_model(self, hmm, symbols, end_states):
+        """
+        由 hmm 得到概率形式的初始参数 (pi, A, B, end_mask), B 的列与
+        symbols 对应.
+        """
+        states = hmm.states
+        pi = numpy.exp(numpy.array(hmm.start_log_prob, float))
+        A = numpy.exp(numpy.array(hmm.trans_log_prob, float))
+        known = numpy.array([hmm.symbols.get(symbol, -1)
+                             for symbol in symbols])
+        B = numpy.zeros((len(states), len(symbols)))
+        for k in xrange(len(states)):
+            emit = numpy.exp(numpy.array(list(hmm.emit_log_prob[k]), float))
+            row = numpy.where(known >= 0, emit[known], 0.0)
+            floor = row[row > 0].min() if (row > 0).any() \
+                    else 1.0 / len(symbols)
+            row[row == 0] = floor
+            B[k] = row / row.sum()
+        end_mask = numpy.array([1.0 if end_states is None
+                                or state in end_states else 0.0
+                                for state in states])
+        return pi, A, B, end_mask
+
+    def _maximize(self, model, start, trans, emit, initial_model):
+        """
+        M 步: 由期望次数得到新的参数, 期望次数全为 0 的行保持不变. 再按
+        interpolation 与初始参数插值.
+        """
+        l = self.interpolation
+        def normalize(counts, old, initial):
+            total = counts.sum(axis = -1)[..., None]
+            new = numpy.where(total > 0,
+                    counts / numpy.where(total > 0, total, 1.0), old)
+            return (1 - l) * new + l * initial if l > 0 else new
+        return tuple([normalize(counts, old, initial)
+                      for counts, old, initial in zip((start, trans, emit),
+                          model, initial_model)] + [model[3]])
+
+    def _to_hmm(self, states, symbols, model):
+        """
+        由概率形式的参数构造 HMM, 概率为 0 的项不写入.
+        """
+        pi, A, B, end_mask = model
+        def log_probs(keys, row):
+            return dict((key, math.log(p))
+                    for key, p in zip(keys, row.tolist()) if p > 0)
+        hmm = HMM()
+        hmm.set_model(states, log_probs(states, pi),
+                dict((state, log_probs(states, A[k]))
+                     for k, state in enumerate(states)),
+                dict((state, log_probs(symbols, B[k]))
+                     for k, state in enumerate(states)))
+        return hmm
+
+
+def _chunks(corpus_files, chunk_size):
+    """
+    将 corpus_files 按 chunk_size 字节切分, 返回 (文件, begin, end) 列表.
+    """
+    chunks = []
+    for corpus_file in corpus_files:
+        size = os.path.getsize(corpus_file)
+        for begin in xrange(0, size, chunk_size):
+            chunks.append((corpus_file, begin, min(size, begin + chunk_size)))
+    return chunks
+
+def _read_chunk(fp, begin, end):
+    """
+    逐行读取 fp 中行首位于 [begin, end) 的行.
+    """
+    if begin > 0:
+        fp.seek(begin - 1)
+        fp.readline()  # 跳过行首在 begin 之前的行
+    while fp.tell() < end:
+        line = fp.readline()
+        if not line:
+            break
+        yield line
+
+def _init_worker():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # 由父进程处理中断
+
+def _count_chunk(task):
+    tagged, encoding, corpus_file, begin, end = task
+    fp = open(corpus_file, 'rb')
+    try:
+        lines = (line.decode(encoding, 'ignore')
+                 for line in _read_chunk(fp, begin, end))
+        return HMMTrainer.count_lines(lines, tagged)
+    finally:
+        fp.close()
+
+_symbols = None  # HMMSegmenter.scanner 中的全部汉字
+_symbol_index = None  # 码位 -> 汉字在 _symbols 中的下标, 其他字符为 -1
+
+def _hanzi_symbols():
+    global _symbols, _symbol_index
+    if _symbols is None:
+        table = numpy.frombuffer(bytes(HMMSegmenter.scanner.table),
+                                 numpy.uint8)
+        codes = numpy.flatnonzero(table == HMMSegmenter.HANZI)
+        _symbol_index = numpy.empty(len(table), numpy.intp)
+        _symbol_index.fill(-1)
+        _symbol_index[codes] = numpy.arange(len(codes))
+        _symbols = [unichr(code) for code in codes]
+    return _symbols
+
+def _expect_chunk(task):
+    """
+    E 步: 返回一段语料的 [起始, 转移, 发射期望次数, log 似然, 字数].
+    """
+    model, encoding, corpus_file, begin, end, batch_chars = task
+    _hanzi_symbols()
+    S, V = model[2].shape
+    totals = [numpy.zeros(S), numpy.zeros((S, S)), numpy.zeros((S, V)),
+              0.0, 0]
+    findall = HMMSegmenter.scanner.findall
+    buckets = {}  # 长度 -> 汉字串列表
+    pending = 0
+    fp = open(corpus_file, 'rb')
+    try:
+        for line in _read_chunk(fp, begin, end):
+            for hanzi, number, word, other in \
+                    findall(line.decode(encoding, 'ignore')):
+                if hanzi:
+                    buckets.setdefault(len(hanzi), []).append(hanzi)
+                    pending += len(hanzi)
+            if pending >= batch_chars:
+                _expect_buckets(model, buckets, totals)
+                buckets, pending = {}, 0
+        _expect_buckets(model, buckets, totals)
+    finally:
+        fp.close()
+    return totals
+
+def _expect_buckets(model, buckets, totals):
+    for T, texts in buckets.iteritems():
+        codes = numpy.frombuffer(u''.join(texts).encode('utf-16-le'),
+                                 numpy.uint16)
+        _forward_backward(model,
+                _symbol_index[codes].reshape(len(texts), T), totals)
+
+def _forward_backward(model, obs, totals):
+    """
+    对 obs (序列数 M x 长度 T 的符号下标矩阵) 中的序列同时做带缩放的前向-
+    后向计算, 期望次数和 log 似然累加到 totals (见 _expect_chunk). 在
+    end_mask 限定的终止状态下概率为 0 的序列不参与统计.
+    """
+    pi, A, B, end_mask = model
+    M, T = obs.shape
+    S, V = B.shape
+    emit = B.T[obs.T]  # emit[t, m, k]: 状态 k 发射 obs[m, t] 的概率
+
+    # 前向: alpha[t] 为按 scale[t] 逐时刻归一化的前向概率
+    alpha = numpy.empty((T, M, S))
+    scale = numpy.empty((T, M))
+    a = pi * emit[0]
+    for t in xrange(T):
+        if t > 0:
+            a = a.dot(A) * emit[t]
+        scale[t] = a.sum(axis = 1)
+        a = a / numpy.where(scale[t] > 0, scale[t], 1.0)[:, None]
+        alpha[t] = a
+    Z = alpha[T - 1].dot(end_mask)
+    valid = (Z > 0) & (scale > 0).all(axis = 0)
+    weight = numpy.where(valid, 1.0 / numpy.where(valid, Z, 1.0), 0.0)
+    weight = weight[:, None]
+
+    # 后向: 同时把 alpha[t] 改写为状态后验 gamma[t]
+    b = numpy.tile(end_mask, (M, 1))
+    xi = numpy.zeros((S, S))
+    alpha[T - 1] *= b * weight
+    for t in xrange(T - 2, -1, -1):
+        w = emit[t + 1] * b / numpy.where(
+                scale[t + 1] > 0, scale[t + 1], 1.0)[:, None]
+        xi += (alpha[t] * weight).T.dot(w)
+        b = w.dot(A.T)
+        alpha[t] *= b * weight
+
+    totals[0] += alpha[0].sum(axis = 0)
+    totals[1] += xi * A
+    gamma = alpha.reshape(T * M, S)
+    flat_obs = obs.T.ravel()
+    for k in xrange(S):
+        totals[2][k] += numpy.bincount(flat_obs, gamma[:, k], V)
+    totals[3] += numpy.log(scale[:, valid]).sum() + numpy.log(Z[valid]).sum()
+    totals[4] += int(valid.sum()) * T
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+            description = 'Train an HMM model from a segmented corpus, '
+                          'or adapt one to raw text with Baum-Welch.')
+    parser.add_argument('model_dir')
+    parser.add_argument('corpus_files', nargs = '+')
+    parser.add_argument('--tagged', action = 'store_true',
+            help = 'corpus tokens are word/tag, train a POS model')
+    parser.add_argument('-w', '--workers', type = int, default = None)
+    parser.add_argument('--chunk_size', type = int, default = None,
+            help = 'bytes per map task')
+    parser.add_argument('-e', '--encoding', default = 'utf-8')
+    parser.add_argument('--init_model', default = None,
+            help = 'initial model dir, train with Baum-Welch on raw text')
+    parser.add_argument('-i', '--iterations', type = int, default = None,
+            help = 'max Baum-Welch iterations')
+    parser.add_argument('--interpolation', type = float, default = None,
+            help = 'weight of the initial model in each Baum-Welch update')
+    args = parser.parse_args(argv[1:])
+
+    if args.init_model is None:
+        trainer = HMMTrainer(args.tagged, args.workers, args.chunk_size,
+                             args.encoding)
+        hmm = trainer.train(args.corpus_files)
+    else:
+        init_hmm = HMM()
+        init_hmm.load(args.init_model)
+        trainer = BaumWelchTrainer(args.workers, args.chunk_size,
+                args.encoding, args.iterations,
+                interpolation = args.interpolation)
+        hmm = trainer.train(args.corpus_files, init_hmm)
+    HMMTrainer.save(hmm, args.model_dir)
+
+if __name__ == '__main__':
+    logging.basicConfig(level = logging.INFO)
+    main(sys.argv)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import itertools
+import math
+import os
+import shutil
+import tempfile
+import unittest
+
+import hmm_trainer
+from hmm import HMM
+from hmm_segmenter import HMMSegmenter
+from hmm_trainer import BaumWelchTrainer, HMMCounts, HMMTrainer
+numpy = hmm_trainer.numpy
+
+SEGMENTED = [u'我 爱 北京 天安门 。',
+             u'小明 硕士 毕业 于 中国科学院 计算所',
+             u'他 来到 了 网易 杭研 大厦 Python 2.7']
+TAGGED = [u'我/r 爱/v 北京/ns 天安门/ns',
+          u'他/r 是/v 英雄/n']
+
+class HMMTrainerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+        self.corpus_file = os.path.join(self.model_dir, 'corpus.txt')
+        fp = open(self.corpus_file, 'wb')
+        for i in xrange(50):
+            fp.write(u'\n'.join(SEGMENTED).encode('utf-8') + '\n')
+        fp.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.model_dir)
+
+    def test_count_lines(self):
+        counts = HMMTrainer.count_lines(SEGMENTED[:1])
+        self.assertEqual({'S': 1}, counts.start)
+        self.assertEqual({'S': {'S': 1, 'B': 1}, 'B': {'E': 1, 'M': 1},
+                          'M': {'E': 1}, 'E': {'B': 1}}, counts.trans)
+        self.assertEqual({u'北': 1, u'天': 1}, counts.emit['B'])
+        self.assertEqual(1, counts.sequences)  # 句号之后没有汉字
+
+        counts = HMMTrainer.count_lines(SEGMENTED[2:])
+        self.assertEqual(1, counts.sequences)  # Python 2.7 断开序列
+        self.assertEqual(10, counts.symbols)
+
+        counts = HMMTrainer.count_lines(TAGGED, tagged = True)
+        self.assertEqual({'r': 2}, counts.start)
+        self.assertEqual({u'北京': 1, u'天安门': 1}, counts.emit['ns'])
+
+    def test_estimate(self):
+        counts = HMMCounts()
+        counts.add('SBE', u'我北京')
+        counts.add('BE', u'北京')
+        states, start, trans, emit = counts.estimate()
+        self.assertEqual(['B', 'E', 'S'], states)
+        self.assertAlmostEqual(0.5, 2.718281828 ** start['S'])
+        self.assertEqual(0.0, trans['B']['E'])
+        self.assertEqual(0.0, emit['B'][u'北'])
+
+    def test_train(self):
+        serial = HMMTrainer(workers = 1).count([self.corpus_file])
+        parallel = HMMTrainer(workers = 2, chunk_size = 100).count(
+                [self.corpus_file])
+        for name in ('start', 'trans', 'emit', 'sequences', 'symbols'):
+            self.assertEqual(getattr(serial, name), getattr(parallel, name))
+        self.assertEqual(150, serial.sequences)
+
+        trainer = HMMTrainer(workers = 1)
+        HMMTrainer.save(trainer.train([self.corpus_file]), self.model_dir)
+        hmm_segmenter = HMMSegmenter()
+        hmm_segmenter.load(self.model_dir)
+        self.assertEqual(SEGMENTED[1].split(),
+                list(hmm_segmenter.segment(SEGMENTED[1].replace(' ', ''))))
+
+        text_hmm = HMM()
+        text_hmm._load_text(self.model_dir)
+        self.assertEqual(hmm_segmenter.hmm.viterbi(u'小明毕业于北京'),
+                text_hmm.viterbi(u'小明毕业于北京'))
+
+    def test_train_tagged(self):
+        fp = open(self.corpus_file, 'wb')
+        fp.write(u'\n'.join(TAGGED).encode('utf-8'))
+        fp.close()
+        hmm = HMMTrainer(tagged = True, workers = 1).train([self.corpus_file])
+        self.assertEqual(['n', 'ns', 'r', 'v'], hmm.states)
+        self.assertEqual(['r', 'v', 'n'],
+                hmm.viterbi([u'他', u'是', u'英雄'], None)[1])
+
+
+@unittest.skipIf(numpy is None, 'requires NumPy')
+class BaumWelchTrainerTest(unittest.TestCase):
+
+    def test_forward_backward(self):
+        # 与枚举所有状态路径得到的期望次数比较
+        random = numpy.random.RandomState(0)
+        def distribution(*shape):
+            x = random.rand(*shape)
+            return x / x.sum(axis = -1)[..., None]
+        pi, A, B = distribution(3), distribution(3, 3), distribution(3, 5)
+        end_mask = numpy.array([1.0, 0.0, 1.0])
+        obs = random.randint(0, 5, (4, 5))
+        totals = [numpy.zeros(3), numpy.zeros((3, 3)), numpy.zeros((3, 5)),
+                  0.0, 0]
+        hmm_trainer._forward_backward((pi, A, B, end_mask), obs, totals)
+
+        expected = [numpy.zeros(3), numpy.zeros((3, 3)), numpy.zeros((3, 5)),
+                    0.0]
+        for o in obs:
+            paths = []
+            for path in itertools.product(range(3), repeat = len(o)):
+                p = pi[path[0]] * B[path[0], o[0]] * end_mask[path[-1]]
+                for t in xrange(1, len(o)):
+                    p *= A[path[t - 1], path[t]] * B[path[t], o[t]]
+                paths.append((p, path))
+            total = sum(p for p, path in paths)
+            expected[3] += math.log(total)
+            for p, path in paths:
+                expected[0][path[0]] += p / total
+                for t in xrange(len(o)):
+                    expected[2][path[t], o[t]] += p / total
+                    if t > 0:
+                        expected[1][path[t - 1], path[t]] += p / total
+        for value, expected_value in zip(totals, expected):
+            self.assertTrue(numpy.allclose(expected_value, value))
+        self.assertEqual(20, totals[4])
+
+    def test_train(self):
+        hmm = HMM()
+        hmm.load('../data/hmm_segment_model')
+        trainer = BaumWelchTrainer(workers = 1, max_iterations = 3,
+                                   interpolation = 0.0)
+        trainer.train(['testdata/document.dat'], hmm)
+        self.assertEqual(3, len(trainer.history))
+        self.assertEqual(sorted(trainer.history), trainer.history)
+
+        trainer = BaumWelchTrainer(workers = 1, max_iterations = 2)
+        parallel = BaumWelchTrainer(workers = 2, chunk_size = 500,
+                                    max_iterations = 2)
+        trained = trainer.train(['testdata/document.dat'], hmm)
+        parallel.train(['testdata/document.dat'], hmm)
+        self.assertTrue(numpy.allclose(trainer.history, parallel.history))
+
+        model_dir = tempfile.mkdtemp()
+        try:
+            HMMTrainer.save(trained, model_dir)
+            hmm_segmenter = HMMSegmenter()
+            hmm_segmenter.load(model_dir)
+            text = u'小明硕士毕业于中国科学院计算所'
+            self.assertEqual(text, u''.join(hmm_segmenter.segment(text)))
+            self.assertIn(u'中国', list(hmm_segmenter.segment(text)))
+        finally:
+            shutil.rmtree(model_dir)
+
+if __name__ == '__main__':
+    unittest.main()
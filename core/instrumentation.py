@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import logging
+import math
+import time
+
+class Histogram(object):
+    """
+    按 2 的幂分桶的直方图, 桶 b 统计 (b / 2, b] 内的值, 0 单独成桶.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = {}
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        bucket = 0
+        if value > 0:
+            bucket = 1
+            while bucket < value:
+                bucket <<= 1
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, q):
+        """
+        返回第 q (0~100) 百分位数的估计值: 所在桶的上界, 不超过 max. 误差
+        不超过 2 倍.
+        """
+        if self.count == 0:
+            return None
+        rank = max(1, int(math.ceil(q / 100.0 * self.count)))
+        n = 0
+        for bucket in sorted(self.buckets):
+            n += self.buckets[bucket]
+            if n >= rank:
+                return min(bucket, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {'count': self.count, 'sum': self.total, 'min': self.min,
+                'max': self.max,
+                'mean': self.total / self.count if self.count else None,
+                'buckets': dict(self.buckets)}
+
+class Instrumentation(object):
+    """
+    分词流程的计数器和直方图, 由 MaxProbSegmenter、HMMSegmenter 和
+    Vocabulary 在各阶段记录, 未设置时 (instrumentation 为 None) 各组件只多
+    一次 None 判断.
+
+    记录的指标:
+        vocabulary.load_us              : 词典加载耗时
+        max_prob.texts / chars          : 文本数 / 字数
+        max_prob.scan_us                : 字符类别预切分耗时
+        max_prob.blocks / block_chars   : 汉字串数 / 字数
+        max_prob.block_length           : 汉字串长度分布
+        max_prob.gen_edges_us / dp_us   : 词图生成 / 动态规划耗时
+        max_prob.oov_buffers / oov_chars: 未登录词串数 / 字数
+        max_prob.hmm_fallback_us        : 未登录词识别耗时
+        hmm.calls                       : Viterbi 解码次数
+        hmm.sequence_length / viterbi_us: 解码序列长度 / 耗时
+    snapshot 额外给出 max_prob.oov_rate = oov_chars / block_chars.
+
+    sinks 为回调函数列表, flush 时以 snapshot 为参数依次调用, 例如
+    logging_sink 或用户自定义的上报函数.
+    """
+
+    def __init__(self, sinks = None):
+        self.sinks = list(sinks) if sinks else []
+        self.counters = {}
+        self.histograms = {}
+
+    def count(self, name, n = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def timing(self, name, start):
+        """
+        记录从 start (time.time()) 到现在的耗时, 单位为微秒.
+        """
+        self.observe(name, (time.time() - start) * 1e6)
+
+    def snapshot(self):
+        """
+        返回当前指标的副本.
+        """
+        counters = dict(self.counters)
+        block_chars = counters.get('max_prob.block_chars', 0)
+        if block_chars > 0:
+            counters['max_prob.oov_rate'] = \
+                    counters.get('max_prob.oov_chars', 0) / float(block_chars)
+        return {'counters': counters,
+                'histograms': dict((name, histogram.snapshot())
+                    for name, histogram in self.histograms.iteritems())}
+
+    def reset(self):
+        self.counters = {}
+        self.histograms = {}
+
+    def flush(self, reset = True):
+        """
+        将 snapshot 发送给所有 sinks, 默认随后清零.
+        """
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            sink(snapshot)
+        if reset:
+            self.reset()
+        return snapshot
+
+def logging_sink(logger = None, level = logging.INFO):
+    """
+    返回将 snapshot 写入日志的 sink.
+    """
+    logger = logger or logging.getLogger(__name__)
+
+    def sink(snapshot):
+        for name, value in sorted(snapshot['counters'].iteritems()):
+            logger.log(level, '%s: %s' % (name, value))
+        for name, histogram in sorted(snapshot['histograms'].iteritems()):
+            logger.log(level, '%s: count=%d mean=%.1f min=%s max=%s' % (name,
+                histogram['count'], histogram['mean'], histogram['min'],
+                histogram['max']))
+    return sink
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import unittest
+
+from instrumentation import Histogram, Instrumentation
+
+class InstrumentationTest(unittest.TestCase):
+
+    def test_histogram(self):
+        histogram = Histogram()
+        for value in (0, 1, 3, 4, 5):
+            histogram.observe(value)
+        self.assertEqual({'count': 5, 'sum': 13.0, 'min': 0, 'max': 5,
+            'mean': 2.6, 'buckets': {0: 1, 1: 1, 4: 2, 8: 1}},
+            histogram.snapshot())
+        self.assertEqual(0, histogram.percentile(20))
+        self.assertEqual(4, histogram.percentile(60))
+        self.assertEqual(5, histogram.percentile(100))
+        self.assertEqual(None, Histogram().percentile(50))
+
+    def test_flush(self):
+        snapshots = []
+        instrumentation = Instrumentation([snapshots.append])
+        instrumentation.count('max_prob.block_chars', 10)
+        instrumentation.count('max_prob.oov_chars', 2)
+        instrumentation.observe('max_prob.block_length', 10)
+        instrumentation.flush()
+        self.assertEqual(1, len(snapshots))
+        self.assertAlmostEqual(0.2,
+                snapshots[0]['counters']['max_prob.oov_rate'])
+        self.assertEqual(1,
+                snapshots[0]['histograms']['max_prob.block_length']['count'])
+        self.assertEqual({'counters': {}, 'histograms': {}},
+                instrumentation.snapshot())
+
+if __name__ == '__main__':
+    unittest.main()
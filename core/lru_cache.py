@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import collections
+
+class LRUCache(object):
+    """
+    有界 LRU 缓存, 淘汰最久未被访问的项.
+
+    容量可以按项数 (max_size) 和/或按 key 的总长度 (max_chars) 限制,
+    为 None 表示不限制. 统计命中 (hits)、未命中 (misses) 和淘汰 (evictions)
+    次数.
+    """
+
+    def __init__(self, max_size = 10000, max_chars = None):
+        self.max_size = max_size
+        self.max_chars = max_chars
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._items = collections.OrderedDict()
+        self._chars = 0
+
+    def get(self, key):
+        """
+        返回 key 对应的值并将其标记为最近访问, 不存在返回 None.
+        """
+        value = self._items.pop(key, None)
+        if value is None:
+            self.misses += 1
+            return None
+        self._items[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if (self.max_chars is not None and len(key) > self.max_chars) \
+                or self.max_size == 0:
+            return
+        if key in self._items:
+            del self._items[key]
+        else:
+            self._chars += len(key)
+        self._items[key] = value
+
+        while self._overflow():
+            key, value = self._items.popitem(last = False)
+            self._chars -= len(key)
+            self.evictions += 1
+
+    def _overflow(self):
+        return (self.max_size is not None
+                    and len(self._items) > self.max_size) \
+                or (self.max_chars is not None
+                    and self._chars > self.max_chars)
+
+    def clear(self):
+        self._items.clear()
+        self._chars = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def stats(self):
+        """
+        返回缓存统计信息.
+        """
+        return {'size': len(self._items), 'chars': self._chars,
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions}
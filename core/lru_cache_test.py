@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import unittest
+
+from lru_cache import LRUCache
+
+class LRUCacheTest(unittest.TestCase):
+
+    def test_max_size(self):
+        cache = LRUCache(2)
+        cache.put(u'a', 1)
+        cache.put(u'b', 2)
+        self.assertEqual(1, cache.get(u'a'))
+        cache.put(u'c', 3)  # 淘汰最久未访问的 b
+        self.assertIsNone(cache.get(u'b'))
+        self.assertEqual(1, cache.get(u'a'))
+        self.assertEqual(3, cache.get(u'c'))
+        self.assertEqual({'size': 2, 'chars': 2, 'hits': 3, 'misses': 1,
+            'evictions': 1}, cache.stats())
+
+    def test_max_chars(self):
+        cache = LRUCache(None, 5)
+        cache.put(u'abc', 1)
+        cache.put(u'de', 2)
+        cache.put(u'f', 3)
+        self.assertNotIn(u'abc', cache)
+        self.assertIn(u'de', cache)
+        cache.put(u'abcdef', 4)  # 超过总字数限制, 不缓存
+        self.assertNotIn(u'abcdef', cache)
+        self.assertEqual(2, len(cache))
+
+        cache.clear()
+        self.assertEqual(0, len(cache))
+        self.assertEqual(0, cache.stats()['chars'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -26,9 +26,13 @@
 
 import logging
 import pprint
-import re
+import time
+from array import array
 
+from char_scanner import CharScanner
 from hmm_segmenter import HMMSegmenter
+from lru_cache import LRUCache
+from text_decoder import TextDecoder
 from vocabulary import Vocabulary
 
 class MaxProbSegmenter(object):
@@ -41,80 +45,618 @@ class MaxProbSegmenter(object):
            即词图.
         2. 基于动态规划算法计算最大概率路径, 得到基于词频的最大切分组合.
         3. 对于未登录词问题, 采用 HMMSegmnter 的字标注方法识别.
+
+    cache_size > 0 时, 以汉字串为 key 缓存其切分结果 (LRU), 重复出现的串
+    (标题、商品名、模板文本等) 只需一次查找. 缓存总字数可以通过
+    cache_max_chars 限制. 词典变化 (Vocabulary.version 改变) 时缓存自动清空.
+
+    设置 instrumentation (Instrumentation) 后记录各阶段耗时和未登录词统计.
+
+    设置 ngram_model (NGramModel) 后, 最大概率路径按 bigram 或 trigram 计算,
+    否则使用 unigram 词频. 内存和速度对比见 NGramModel.
+
+    文本先由 scanner 一遍扫描切分为汉字串 (CHINESE, 含字母、数字等)、空白串
+    (SPACE) 和其他字符串, 汉字串做最大概率切分, 空白串切为一个空格, 其他
+    字符逐字切分.
+
+    长于 WINDOW_SIZE 的汉字串 (如没有标点的长网页文本) 按窗口切分: 每次只对
+    WINDOW_SIZE 个字生成词图, 在其中找到最后一个没有词图边跨过的位置 (安全
+    切分点), 对切分点之前的部分做动态规划并输出, 其余部分并入下一个窗口.
+    任何切分路径都经过安全切分点, 因此结果与对整个汉字串做动态规划相同,
+    而词图和路径只占用一个窗口的内存, 第一个词也无需等到整串处理完才输出.
+    bigram / trigram 的得分依赖跨过切分点的前一个词, 设置 ngram_model 时
+    仍对整个汉字串做动态规划. 长汉字串不进入切分缓存.
     """
+    WINDOW_SIZE = 4096  # 按窗口切分的汉字串长度阈值和窗口大小
+    CHINESE = 1
+    SPACE = 2
+    scanner = CharScanner([(CHINESE, ur"\u4E00-\u9FA5a-zA-Z0-9+#&\._"),
+                           (SPACE, ur" \t\n\r\f\v")])
 
-    def __init__(self, vocabulary, hmm_segmenter):
+    def __init__(self, vocabulary, hmm_segmenter, cache_size = 0,
+            cache_max_chars = None, ngram_model = None):
         self.vocabulary = vocabulary
         self.hmm_segmenter = hmm_segmenter
-
-        self.re_chinese = re.compile(ur"([\u4E00-\u9FA5a-zA-Z0-9+#&\._]+)")
-        self.re_skip = re.compile(ur"(\s+)")
+        self.ngram_model = ngram_model
+        self.cache = None
+        if cache_size > 0:
+            self.cache = LRUCache(cache_size, cache_max_chars)
+        self._cache_version = vocabulary.version
+        self.instrumentation = None
+        self.decoder = TextDecoder(sticky = False)  # 非 unicode 输入的解码
 
     def segment(self, text):
         """
         最大概率分词.
 
-        NOTE: 支持自动识别 text 编码.
+        NOTE: 非 unicode 的 text 由 decoder 解码, 见 TextDecoder.
+        """
+        return self.segment_unicode(self.decoder.decode(text))
+
+    def segment_unicode(self, text):
+        """
+        同 segment, 但 text 必须是 unicode, 不做类型检查和解码.
+        """
+        if self.cache is not None \
+                and self._cache_version != self.vocabulary.version:
+            self.cache.clear()
+            self._cache_version = self.vocabulary.version
+
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            instrumentation.count('max_prob.texts')
+            instrumentation.count('max_prob.chars', len(text))
+            start = time.time()
+        runs = self.scanner.findall(text)
+        if instrumentation is not None:
+            instrumentation.timing('max_prob.scan_us', start)
+
+        for block, space, other in runs:
+            if block:
+                if instrumentation is not None:
+                    self._observe_block(block)
+                for word in self._segment_cached_block(block):
+                    yield word
+            elif space:
+                yield ' '
+            else:
+                for ch in other:
+                    yield ch
+
+    def _observe_block(self, block):
+        self.instrumentation.count('max_prob.blocks')
+        self.instrumentation.count('max_prob.block_chars', len(block))
+        self.instrumentation.observe('max_prob.block_length', len(block))
+
+    def segment_stream(self, chunks):
         """
-        if not (type(text) is unicode):
-            try:
-                text = text.decode('utf-8')
-            except:
-                text = text.decode('gbk', 'ignore')
+        流式分词, chunks 为 unicode 文本片段序列, 依次返回切分出的词.
 
-        blocks = self.re_chinese.split(text)
-        for block in blocks:
-            if self.re_chinese.match(block):
-                for word in self._segment_block(block):
+        只有最后一个 run (同一类别的最长字符串) 可能在下一个片段中延续,
+        因此每个新片段只需从其末尾向前扫描到最后一个 run 的起点, 之前的文本
+        立即分词输出, 结果与对整个文本调用 segment 相同. 未输出的 run:
+            空白串: 整体切为一个空格, 只保留一个字.
+            其他字符: 逐字切分, 立即输出.
+            汉字串: 长于 2 * WINDOW_SIZE 时, 在前 WINDOW_SIZE 个字中找到安全
+                    切分点 (见 _window_route), 输出切分点之前路径上最后一个
+                    多字词及其之前的词, 其余部分 (可能与之后的单字组成未登录
+                    词串) 继续保留.
+        因此内存只与片段大小和 WINDOW_SIZE 有关. 例外: 设置 ngram_model
+        时, 或很长的汉字串中没有多字词 (整串为未登录词串) 时, 汉字串只能
+        整串切分.
+        """
+        char_class = self.scanner.char_class
+        pending = u''  # 尚未输出的最后一个 run
+        pending_class = None
+        for chunk in chunks:
+            if len(chunk) == 0:
+                continue
+            last_class = char_class(chunk[-1])
+            j = len(chunk) - 1
+            while j > 0 and char_class(chunk[j - 1]) == last_class:
+                j -= 1
+            if j > 0 or last_class != pending_class:
+                for word in self.segment_unicode(pending + chunk[:j]):
                     yield word
+                pending = chunk[j:]
+                pending_class = last_class
             else:
-                fields = self.re_skip.split(block)
-                for field in fields:
-                    if self.re_skip.match(field):
-                        yield ' '
-                    else:
-                        for ch in field:
-                            yield ch
+                pending += chunk
+
+            if pending_class == self.SPACE:
+                pending = pending[-1:]
+            elif pending_class == self.CHINESE:
+                while self.ngram_model is None \
+                        and len(pending) >= 2 * self.WINDOW_SIZE:
+                    end, route_end = self._stream_prefix(pending)
+                    if end == 0:
+                        break
+                    for word in self._segment_cuts(pending[:end],
+                            self._cut_route(end, route_end)):
+                        yield word
+                    pending = pending[end:]
+            else:
+                for word in self.segment_unicode(pending):
+                    yield word
+                pending = u''
+        if len(pending) > 0:
+            for word in self.segment_unicode(pending):
+                yield word
+
+    def _stream_prefix(self, text):
+        """
+        segment_stream 中未结束的汉字串 text 过长时, 返回 (end, route_end):
+        text[:end] 的切分不受 text 之后的文本影响, route_end 为其上的最大
+        概率路径. 找不到这样的前缀时 end 为 0.
+        """
+        cut, route_end = self._window_route(text[:self.WINDOW_SIZE], False)
+        end = 0  # 路径上最后一个多字词的结尾
+        i = 0
+        while i < cut:
+            j = route_end[i] + 1
+            if j - i > 1:
+                end = j
+            i = j
+        return end, route_end
+
+    def _segment_cached_block(self, text):
+        """
+        带缓存的 _segment_block.
+        """
+        if self.cache is None or len(text) > self.WINDOW_SIZE:
+            return self._segment_block(text)
+        words = self.cache.get(text)
+        if words is None:
+            words = tuple(self._segment_block(text))
+            self.cache.put(text, words)
+        return words
+
+    def segment_spans(self, text):
+        """
+        最大概率分词, 返回词在 text 中的位置 array('i'), 第 k 个词为
+        text[spans[2 * k] : spans[2 * k + 1]], 空白串整体为一个词. 切分结果
+        与 segment 相同, 但不为每个词生成 unicode 对象, 只有汉字串和未登录词
+        串需要取子串用于查词典和 Viterbi 解码, 适合只需要词边界的高亮、索引
+        等场景. 不使用切分缓存.
+
+        NOTE: text 不是 unicode 时由 decoder 解码, 位置相对于解码后的文本.
+        """
+        text = self.decoder.decode(text)
+
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            instrumentation.count('max_prob.texts')
+            instrumentation.count('max_prob.chars', len(text))
+
+        spans = array('i')
+        for char_class, begin, end in self.scanner.scan(text):
+            if char_class == self.CHINESE:
+                block = text[begin : end]
+                if instrumentation is not None:
+                    self._observe_block(block)
+                self._block_spans(block, begin, spans)
+            elif char_class == self.SPACE:
+                spans.extend((begin, end))
+            else:
+                for i in xrange(begin, end):
+                    spans.extend((i, i + 1))
+        return spans
+
+    def _block_spans(self, text, offset, spans):
+        """
+        汉字串的最大概率切分 + 未登录词识别, 词的位置 (加上 offset) 追加到
+        spans.
+        """
+        for begin, end, is_oov in self._cut_spans(text):
+            if not is_oov:
+                spans.extend((offset + begin, offset + end))
+                continue
+            if self.instrumentation is not None:
+                self.instrumentation.count('max_prob.oov_buffers')
+                self.instrumentation.count('max_prob.oov_chars', end - begin)
+            n = len(spans)
+            self.hmm_segmenter.segment_spans(text, begin, end, spans)
+            for k in xrange(n, len(spans)):
+                spans[k] += offset
+
+    def segment_for_search(self, text):
+        """
+        搜索引擎模式分词, 返回 (word, begin, end) 序列, [begin, end) 为 word
+        在 text 中的字符偏移.
+
+        在 segment 结果的基础上, 对长度大于 2 的词先输出其中所有长度不小于 2
+        的词典词 (按起始位置排列), 再输出该词本身, 以提高索引召回. 子词直接
+        取自最大概率切分所用的词图, 每个汉字串只生成一次词图.
+        """
+        return self._segment_runs(self.decoder.decode(text),
+                self._segment_block_for_search)
+
+    def segment_full(self, text):
+        """
+        全模式分词, 返回 text 中所有的多字词典词 (word, begin, end), 按起始
+        位置排列. 不属于任何多字词的连续单字与 segment 一样做未登录词识别.
+        """
+        return self._segment_runs(self.decoder.decode(text),
+                self._segment_block_full)
+
+    def _segment_runs(self, text, segment_block):
+        """
+        按 scanner 切分 text, 汉字串交给 segment_block 切分, 返回
+        (word, begin, end) 序列.
+        """
+        for char_class, begin, end in self.scanner.scan(text):
+            if char_class == self.CHINESE:
+                for word, i, j in segment_block(text[begin : end]):
+                    yield (word, begin + i, begin + j)
+            elif char_class == self.SPACE:
+                yield (' ', begin, end)
+            else:
+                for i in xrange(begin, end):
+                    yield (text[i], i, i + 1)
+
+    def _segment_block_for_search(self, text):
+        offsets, ends, route_end = self._route(text)
+        for begin, end, is_oov in self._cut_route(len(text), route_end):
+            if is_oov:
+                i = begin
+                for word in self.hmm_segmenter.segment_unicode(
+                        text[begin : end]):
+                    yield (word, i, i + len(word))
+                    i += len(word)
+                continue
+
+            if end - begin > 2:
+                for i in xrange(begin, end):
+                    for k in xrange(offsets[i], offsets[i + 1]):
+                        j = ends[k] + 1
+                        if j > end or (i == begin and j == end):
+                            break
+                        if j - i > 1:
+                            yield (text[i : j], i, j)
+            yield (text[begin : end], begin, end)
+
+    def _segment_block_full(self, text):
+        offsets, ends, log_probs, pos_list, word_ids = \
+                self.vocabulary.gen_edges(text)
+        covered = 0  # [0, covered) 已被输出的多字词覆盖
+        buf_begin = 0  # 未被覆盖的连续单字 [buf_begin, i)
+        for i in xrange(len(text) + 1):
+            if i == len(text) or (i < covered or ends[offsets[i + 1] - 1] > i):
+                for span in self._segment_buf_spans(text, buf_begin, i):
+                    yield span
+                buf_begin = i + 1
+            if i == len(text):
+                break
+            for k in xrange(offsets[i], offsets[i + 1]):
+                j = ends[k] + 1
+                if j - i > 1:
+                    yield (text[i : j], i, j)
+                    covered = max(covered, j)
+            if i < covered:
+                buf_begin = i + 1
+
+    def _segment_buf_spans(self, text, begin, end):
+        """
+        返回连续单字 text[begin : end] 的切分结果 (word, begin, end), 多于
+        一个字时交给 HMMSegmenter 识别.
+        """
+        if end - begin == 1:
+            yield (text[begin], begin, end)
+        elif end - begin > 1:
+            i = begin
+            for word in self.hmm_segmenter.segment_unicode(text[begin : end]):
+                yield (word, i, i + len(word))
+                i += len(word)
+
+    def segment_batch(self, texts):
+        """
+        批量最大概率分词, 返回与 texts 一一对应的词列表.
+
+        先对所有文本做最大概率切分, 收集其中全部未登录词串, 一起交给
+        HMMSegmenter.segment_batch 批量识别, 再按原顺序拼回. 结果与逐个调用
+        segment 相同.
+        """
+        instrumentation = self.instrumentation
+        results = []
+        bufs = []  # 未登录词串, 在 results 中以其下标占位
+        for text in texts:
+            text = self.decoder.decode(text)
+            if instrumentation is not None:
+                instrumentation.count('max_prob.texts')
+                instrumentation.count('max_prob.chars', len(text))
+
+            words = []
+            for block, space, other in self.scanner.findall(text):
+                if block:
+                    if instrumentation is not None:
+                        self._observe_block(block)
+                    for word, is_oov in self._cut_block(block):
+                        if is_oov:
+                            words.append(len(bufs))
+                            bufs.append(word)
+                        else:
+                            words.append(word)
+                elif space:
+                    words.append(' ')
+                else:
+                    words.extend(other)
+            results.append(words)
+
+        if instrumentation is not None:
+            instrumentation.count('max_prob.oov_buffers', len(bufs))
+            instrumentation.count('max_prob.oov_chars', sum(map(len, bufs)))
+            start = time.time()
+        oov_words = self.hmm_segmenter.segment_batch_unicode(bufs)
+        if instrumentation is not None:
+            instrumentation.timing('max_prob.hmm_fallback_us', start)
+        for i, words in enumerate(results):
+            segmented = []
+            for word in words:
+                if type(word) is int:
+                    segmented.extend(oov_words[word])
+                else:
+                    segmented.append(word)
+            results[i] = segmented
+        return results
 
     def _segment_block(self, text):
         """
-        最大概率切分, 此处使用的是 unigram 模型.
+        最大概率切分 + 未登录词识别.
+        """
+        return self._segment_cuts(text, self._cut_spans(text))
 
-        TODO(fandywang): unigram  ->  bigram, trigram
+    def _segment_cuts(self, text, cuts):
         """
-        DAG = self.vocabulary.gen_DAG(text)
-        route = {}
-        N = len(text)
-        route[N] = (0.0, '')
+        按最大概率切分结果 cuts ((begin, end, is_oov) 序列, 见 _cut_route)
+        返回词序列, 未登录词串交给 HMMSegmenter 识别.
+        """
+        instrumentation = self.instrumentation
+        for begin, end, is_oov in cuts:
+            word = text[begin : end]
+            if not is_oov:
+                yield word
+            elif instrumentation is None:
+                for w in self.hmm_segmenter.segment_unicode(word):
+                    yield w
+            else:
+                instrumentation.count('max_prob.oov_buffers')
+                instrumentation.count('max_prob.oov_chars', len(word))
+                start = time.time()
+                words = list(self.hmm_segmenter.segment_unicode(word))
+                instrumentation.timing('max_prob.hmm_fallback_us', start)
+                for w in words:
+                    yield w
+
+    def _route_unigram(self, N, offsets, ends, log_probs):
+        """
+        unigram 最大概率路径, 返回 route_end: 路径上从 i 开始的词的结尾为
+        route_end[i].
+        """
+        route_log_prob = [0.0] * (N + 1)
+        route_end = [0] * N
+
+        # 动态规划算法确定最大词频切分路径, 得分相同时取较长的词
+        for i in xrange(N - 1, -1, -1):
+            k = offsets[i]
+            best_j = ends[k]
+            best = log_probs[k] + route_log_prob[best_j + 1]
+            for k in xrange(k + 1, offsets[i + 1]):
+                j = ends[k]
+                log_prob = log_probs[k] + route_log_prob[j + 1]
+                if log_prob >= best:
+                    best, best_j = log_prob, j
+            route_log_prob[i] = best
+            route_end[i] = best_j
+        return route_end
+
+    def _route_bigram(self, N, offsets, ends, log_probs, word_ids):
+        """
+        bigram 最大概率路径. 以边为状态, score[k] 为边 k 之后到串尾的最大
+        log 概率, 从后向前计算; 首词使用 unigram. 得分相同时取较长的词.
+        """
+        bigram_log_prob = self.ngram_model.bigram_log_prob
+        score = [0.0] * offsets[N]
+        successor = [-1] * offsets[N]
+        for i in xrange(N - 1, -1, -1):
+            for k in xrange(offsets[i], offsets[i + 1]):
+                j = ends[k] + 1
+                if j == N:
+                    continue
+                w1 = word_ids[k]
+                best = None
+                for k2 in xrange(offsets[j], offsets[j + 1]):
+                    log_prob = bigram_log_prob(w1, word_ids[k2],
+                            log_probs[k2]) + score[k2]
+                    if best is None or log_prob >= best:
+                        best, successor[k] = log_prob, k2
+                score[k] = best
+
+        best = None
+        for k in xrange(offsets[0], offsets[1]):
+            if best is None or log_probs[k] + score[k] >= best:
+                best, first = log_probs[k] + score[k], k
+        route_end = [0] * N
+        k, i = first, 0
+        while k >= 0:
+            route_end[i] = ends[k]
+            i = ends[k] + 1
+            k = successor[k]
+        return route_end
+
+    def _route_trigram(self, N, offsets, ends, log_probs, word_ids):
+        """
+        trigram 最大概率路径. 以 (前一条边, 当前边) 为状态, 前一条边为 -1
+        表示串首, 其余同 _route_bigram.
+        """
+        trigram_log_prob = self.ngram_model.trigram_log_prob
+        predecessors = [[] for i in xrange(N)]
+        predecessors[0].append(-1)
+        for k in xrange(offsets[N]):
+            if ends[k] + 1 < N:
+                predecessors[ends[k] + 1].append(k)
 
-        # 动态规划算法确定最大词频切分路径
+        score = {}
+        successor = {}
         for i in xrange(N - 1, -1, -1):
-            route[i] = max(
-                    [(self.vocabulary.get_log_prob(text[i : j + 1]) + route[j + 1][0], j)
-                        for j in DAG[i] ])
+            for k in xrange(offsets[i], offsets[i + 1]):
+                j = ends[k] + 1
+                w2 = word_ids[k]
+                for kp in predecessors[i]:
+                    if j == N:
+                        score[kp, k] = 0.0
+                        continue
+                    w1 = word_ids[kp] if kp >= 0 else -1
+                    best = None
+                    for k2 in xrange(offsets[j], offsets[j + 1]):
+                        log_prob = trigram_log_prob(w1, w2, word_ids[k2],
+                                log_probs[k2]) + score[k, k2]
+                        if best is None or log_prob >= best:
+                            best, successor[kp, k] = log_prob, k2
+                    score[kp, k] = best
 
-        buf = u''
+        best = None
+        for k in xrange(offsets[0], offsets[1]):
+            if best is None or log_probs[k] + score[-1, k] >= best:
+                best, first = log_probs[k] + score[-1, k], k
+        route_end = [0] * N
+        kp, k, i = -1, first, 0
+        while True:
+            route_end[i] = ends[k]
+            i = ends[k] + 1
+            if i == N:
+                break
+            kp, k = k, successor[kp, k]
+        return route_end
+
+    def _cut_block(self, text):
+        """
+        最大概率切分, 按 ngram_model 使用 unigram、bigram 或 trigram 模型.
+        返回 (word, is_oov) 序列, 连续单字组成的未登录词串 (长度大于 1) 的
+        is_oov 为 True.
+        """
+        for begin, end, is_oov in self._cut_spans(text):
+            yield (text[begin : end], is_oov)
+
+    def _cut_spans(self, text):
+        """
+        最大概率切分, 返回 (begin, end, is_oov) 序列, 见 _cut_route. 长汉字串
+        按窗口切分, 见 _cut_windows.
+        """
+        if self.ngram_model is None and len(text) > self.WINDOW_SIZE:
+            return self._cut_windows(text)
+        offsets, ends, route_end = self._route(text)
+        return self._cut_route(len(text), route_end)
+
+    def _cut_windows(self, text):
+        """
+        按窗口做 unigram 最大概率切分, 结果同 _cut_route. 窗口内找不到安全
+        切分点时 (很长的交叠词链) 窗口加倍.
+        """
+        N = len(text)
+        buf_begin = 0  # 连续单字串 [buf_begin, start + i), 可跨越窗口
+        start = 0
+        window = self.WINDOW_SIZE
+        while start < N:
+            stop = min(N, start + window)
+            cut, route_end = self._window_route(text[start : stop], stop == N)
+            if cut == 0:
+                window *= 2
+                continue
+            i = 0
+            while i < cut:
+                j = route_end[i] + 1
+                if j - i > 1:
+                    if buf_begin < start + i:
+                        yield (buf_begin, start + i,
+                               start + i - buf_begin > 1)
+                    yield (start + i, start + j, False)
+                    buf_begin = start + j
+                i = j
+            start += cut
+            window = self.WINDOW_SIZE
+
+        if buf_begin < N:
+            yield (buf_begin, N, N - buf_begin > 1)
+
+    def _window_route(self, text, final):
+        """
+        对窗口 text 生成词图, 返回 (cut, route_end): cut 为最后一个安全切分
+        点 (final 为 True, 即 text 为汉字串的结尾时为 len(text)), route_end
+        为 text[:cut] 上的 unigram 最大概率路径. 没有安全切分点时 cut 为 0.
+        """
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            instrumentation.count('max_prob.windows')
+            begin_time = time.time()
+        offsets, ends, log_probs, pos_list, word_ids = \
+                self.vocabulary.gen_edges(text)
+        if instrumentation is not None:
+            instrumentation.timing('max_prob.gen_edges_us', begin_time)
+
+        # 从 i 开始的边在窗口内完整时 (i + max_length <= 窗口长度), 若之前
+        # 的边都不超过 i, 则 i + 1 为安全切分点
+        if final:
+            cut = len(text)
+        else:
+            max_length = self.vocabulary.MAX_WORD_LENGTH + 1
+            cut = 0
+            reach = 0
+            for i in xrange(len(text) - max_length + 1):
+                reach = max(reach, ends[offsets[i + 1] - 1])
+                if reach == i:
+                    cut = i + 1
+            if cut == 0:
+                return 0, None
+
+        if instrumentation is not None:
+            begin_time = time.time()
+        route_end = self._route_unigram(cut, offsets, ends, log_probs)
+        if instrumentation is not None:
+            instrumentation.timing('max_prob.dp_us', begin_time)
+        return cut, route_end
+
+    def _route(self, text):
+        """
+        生成词图并计算最大概率路径, 返回 (offsets, ends, route_end), 前两项
+        见 Vocabulary.gen_edges.
+        """
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            start = time.time()
+        offsets, ends, log_probs, pos_list, word_ids = \
+                self.vocabulary.gen_edges(text)
+        if instrumentation is not None:
+            instrumentation.timing('max_prob.gen_edges_us', start)
+            start = time.time()
+        N = len(text)
+        if self.ngram_model is None:
+            route_end = self._route_unigram(N, offsets, ends, log_probs)
+        elif self.ngram_model.order >= 3:
+            route_end = self._route_trigram(N, offsets, ends, log_probs,
+                    word_ids)
+        else:
+            route_end = self._route_bigram(N, offsets, ends, log_probs,
+                    word_ids)
+        if instrumentation is not None:
+            instrumentation.timing('max_prob.dp_us', start)
+        return offsets, ends, route_end
+
+    def _cut_route(self, N, route_end):
+        """
+        沿最大概率路径返回 (begin, end, is_oov) 序列, 连续单字合并为一段.
+        """
+        buf_begin = 0  # 连续单字串 [buf_begin, i)
         i = 0
         while i < N:
-            j = route[i][1] + 1
-            word = text[i : j]
-            if j - i == 1:  # 单字
-                buf += word
-            else:
-                if len(buf) > 0:
-                    if len(buf) == 1:
-                        yield buf
-                    else:  # 未登录词识别
-                        for w in self.hmm_segmenter.segment(buf):
-                            yield w
-                    buf = u''
-                yield word
+            j = route_end[i] + 1
+            if j - i > 1:
+                if buf_begin < i:
+                    # 未登录词识别
+                    yield (buf_begin, i, i - buf_begin > 1)
+                yield (i, j, False)
+                buf_begin = j
             i = j
 
-        if len(buf) > 0:
-            if len(buf) == 1:
-                yield buf
-            else:
-                for w in self.hmm_segmenter.segment(buf):
-                    yield w
+        if buf_begin < N:
+            yield (buf_begin, N, N - buf_begin > 1)
 
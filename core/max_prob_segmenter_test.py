@@ -27,6 +27,7 @@
 import unittest
 
 from hmm_segmenter import HMMSegmenter
+from instrumentation import Instrumentation
 from max_prob_segmenter import MaxProbSegmenter
 from vocabulary import Vocabulary
 
@@ -51,6 +52,137 @@ class MaxProbSegmenterTest(unittest.TestCase):
             self.call_segment(text.strip())
         fp.close()
 
+    def test_segment_batch(self):
+        fp = open('testdata/document.dat', 'rb')
+        texts = [text.strip() for text in fp.readlines()]
+        fp.close()
+        self.assertEqual(
+                [list(self.max_prob_segmenter.segment(text)) for text in texts],
+                self.max_prob_segmenter.segment_batch(texts))
+
+    def test_segment_stream(self):
+        text = u'我爱北京天安门。  小明硕士毕业于中国科学院计算所\t\n\nPython 2.7'
+        expected = list(self.max_prob_segmenter.segment(text))
+        for size in (1, 2, 3, 10):
+            chunks = [text[i : i + size] for i in xrange(0, len(text), size)]
+            self.assertEqual(expected,
+                    list(self.max_prob_segmenter.segment_stream(chunks)))
+
+    def test_cache(self):
+        max_prob_segmenter = MaxProbSegmenter(
+                self.vocabulary, self.hmm_segmenter, 100)
+        fp = open('testdata/document.dat', 'rb')
+        texts = [text.strip() for text in fp.readlines()]
+        fp.close()
+        for i in xrange(2):
+            for text in texts:
+                self.assertEqual(list(self.max_prob_segmenter.segment(text)),
+                        list(max_prob_segmenter.segment(text)))
+        stats = max_prob_segmenter.cache.stats()
+        self.assertGreater(stats['hits'], 0)
+        self.assertGreater(stats['evictions'], 0)
+        self.assertLessEqual(stats['size'], 100)
+
+        self.vocabulary.version += 1  # 词典变化后缓存失效
+        list(max_prob_segmenter.segment(texts[0]))
+        self.assertEqual(1, len(max_prob_segmenter.cache))
+
+    def test_instrumentation(self):
+        text = u'他来到了网易杭研大厦'  # 杭研 为未登录词
+        expected = list(self.max_prob_segmenter.segment(text))
+        instrumentation = Instrumentation()
+        self.max_prob_segmenter.instrumentation = instrumentation
+        self.hmm_segmenter.instrumentation = instrumentation
+        self.assertEqual(expected, list(self.max_prob_segmenter.segment(text)))
+        snapshot = instrumentation.snapshot()
+        counters = snapshot['counters']
+        self.assertEqual(1, counters['max_prob.texts'])
+        self.assertEqual(len(text), counters['max_prob.block_chars'])
+        self.assertEqual(1, counters['max_prob.oov_buffers'])
+        self.assertEqual(1, counters['hmm.calls'])
+        self.assertIn('max_prob.dp_us', snapshot['histograms'])
+        self.assertIn('max_prob.oov_rate', counters)
+
+    def test_segment_spans(self):
+        fp = open('testdata/document.dat', 'rb')
+        texts = [text.strip().decode('utf-8') for text in fp.readlines()]
+        fp.close()
+        texts.append(u'他来到了网易杭研大厦  Python 2.7, c++')
+        for text in texts:
+            spans = self.max_prob_segmenter.segment_spans(text)
+            words = [text[spans[k] : spans[k + 1]]
+                     for k in xrange(0, len(spans), 2)]
+            words = [' ' if word.isspace() else word for word in words]
+            self.assertEqual(list(self.max_prob_segmenter.segment(text)),
+                    words)
+
+    def test_windows(self):
+        fp = open('testdata/document.dat', 'rb')
+        text = u''.join(ch for ch in fp.read().decode('utf-8')
+                if self.max_prob_segmenter.scanner.char_class(ch)
+                == MaxProbSegmenter.CHINESE)
+        fp.close()
+        expected = list(self.max_prob_segmenter.segment(text))
+        expected_spans = self.max_prob_segmenter.segment_spans(text)
+        for window_size in (1, 20, 50):
+            self.max_prob_segmenter.WINDOW_SIZE = window_size
+            self.assertEqual(expected,
+                    list(self.max_prob_segmenter.segment(text)))
+            self.assertEqual([expected],
+                    self.max_prob_segmenter.segment_batch([text]))
+            self.assertEqual(expected_spans,
+                    self.max_prob_segmenter.segment_spans(text))
+
+    def test_stream_windows(self):
+        fp = open('testdata/document.dat', 'rb')
+        text = u''.join(ch for ch in fp.read().decode('utf-8')
+                if self.max_prob_segmenter.scanner.char_class(ch)
+                == MaxProbSegmenter.CHINESE)
+        fp.close()
+        expected = list(self.max_prob_segmenter.segment(text))
+        self.max_prob_segmenter.WINDOW_SIZE = 50
+        for size in (1, 7, 100):
+            chunks = [text[i : i + size] for i in xrange(0, len(text), size)]
+            self.assertEqual(expected,
+                    list(self.max_prob_segmenter.segment_stream(chunks)))
+
+        # 不含标点的长汉字串也应边读边输出
+        consumed = []
+        def read():
+            for i in xrange(0, len(text), 10):
+                consumed.append(i)
+                yield text[i : i + 10]
+        stream = self.max_prob_segmenter.segment_stream(read())
+        self.assertEqual(expected[0], next(stream))
+        self.assertTrue(len(consumed) * 10 < len(text))
+        self.assertEqual(expected[1:], list(stream))
+
+    def test_segment_for_search(self):
+        text = u'小明硕士毕业于中国科学院计算所，后在日本京都大学深造'
+        spans = list(self.max_prob_segmenter.segment_for_search(text))
+        for word, begin, end in spans:
+            self.assertEqual(text[begin : end], word)
+        words = [word for word, begin, end in spans]
+        self.assertLess(words.index(u'科学院'), words.index(u'中国科学院'))
+        self.assertIn(u'中国', words)
+        # 去掉被包含的子词后即为 segment 的结果
+        top = [word for word, begin, end in spans
+               if not any(b <= begin and end <= e and e - b > end - begin
+                          for w, b, e in spans)]
+        self.assertEqual(list(self.max_prob_segmenter.segment(text)), top)
+
+    def test_segment_full(self):
+        text = u'中国科学院计算所 Python'
+        spans = list(self.max_prob_segmenter.segment_full(text))
+        for word, begin, end in spans:
+            self.assertEqual(text[begin : end], word)
+        words = [word for word, begin, end in spans]
+        for word in [u'中国', u'科学', u'科学院', u'中国科学院', u'计算所',
+                     u'Python']:
+            self.assertIn(word, words)
+        begins = [begin for word, begin, end in spans]
+        self.assertEqual(sorted(begins), begins)
+
 if __name__ == '__main__':
     unittest.main()
 
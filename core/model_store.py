@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import logging
+import mmap
+import os
+import struct
+import sys
+
+from hmm import HMM
+from vocabulary_snapshot import VocabularySnapshot
+
+class ModelStore(object):
+    """
+    多进程共享的模型文件: 词典快照 (VocabularySnapshot)、HMM 分词模型和 HMM
+    词性标注模型 (HMM.dump_mapped) 写入同一个文件, 各进程 mmap 后直接使用
+    其中的 double array trie、词的 log 概率、词性编号和 HMM 概率表, 不在
+    进程内构造 dict.
+
+    映射方式为私有只读 (ACCESS_COPY, 这些数据从不修改): 同一主机上的所有
+    worker (无论是 fork 出的还是独立启动的) 共享同一份页缓存, 每多一个
+    worker 只增加少量 Python 对象 (字符编码表、状态表等). 引用计数的更新
+    只涉及这些小对象, 不会使模型数据所在的页变为私有. memory_usage 从
+    /proc/self/smaps 统计映射区的共享 / 私有内存.
+
+    文件格式 (本机字节序, 每段按 8 字节对齐):
+        header   : HEADER_FORMAT, 段数
+        sections : SECTION_FORMAT * 段数, (段名, 偏移, 字节数)
+        段数据   : VOCABULARY、HMM_SEGMENT、HMM_POS (可选)
+    """
+    MAGIC = 'WSSTORE1'
+    HEADER_FORMAT = '=8s8sI'
+    SECTION_FORMAT = '=16sQQ'
+    VOCABULARY = 'vocabulary'
+    HMM_SEGMENT = 'hmm_segment'
+    HMM_POS = 'hmm_pos'
+
+    def __init__(self):
+        self.store_file = None
+        self.sections = {}  # 段名 -> (偏移, 字节数)
+        self._mmap = None
+
+    @classmethod
+    def write(cls, store_file, vocabulary, hmm_segment, hmm_pos = None):
+        """
+        将 vocabulary (Vocabulary)、hmm_segment 和 hmm_pos (HMM) 写入
+        store_file. 先写临时文件再改名, 已映射旧文件的进程不受影响.
+        """
+        logging.info('Write model store to %s.' % store_file)
+        dumps = [(cls.VOCABULARY,
+                  lambda fp: VocabularySnapshot.dump(vocabulary, fp)),
+                 (cls.HMM_SEGMENT, hmm_segment.dump_mapped)]
+        if hmm_pos is not None:
+            dumps.append((cls.HMM_POS, hmm_pos.dump_mapped))
+
+        header_size = struct.calcsize(cls.HEADER_FORMAT) \
+                + struct.calcsize(cls.SECTION_FORMAT) * len(dumps)
+        header_size += -header_size % 8
+        tmp_file = store_file + '.tmp'
+        fp = open(tmp_file, 'wb')
+        fp.write('\0' * header_size)
+        sections = []
+        offset = header_size
+        for name, dump in dumps:
+            size = dump(fp)
+            sections.append((name, offset, size))
+            offset += size
+        fp.seek(0)
+        fp.write(struct.pack(cls.HEADER_FORMAT, cls.MAGIC,
+            sys.byteorder.ljust(8), len(sections)))
+        for name, offset, size in sections:
+            fp.write(struct.pack(cls.SECTION_FORMAT, name, offset, size))
+        fp.close()
+        os.rename(tmp_file, store_file)
+
+    @classmethod
+    def open(cls, store_file):
+        """
+        映射 store_file, 返回 ModelStore.
+        """
+        logging.info('Open model store %s.' % store_file)
+        fp = open(store_file, 'rb')
+        mm = mmap.mmap(fp.fileno(), 0, access = mmap.ACCESS_COPY)
+        fp.close()
+
+        magic, byteorder, num_sections = struct.unpack_from(
+                cls.HEADER_FORMAT, mm, 0)
+        if magic != cls.MAGIC or byteorder.strip() != sys.byteorder:
+            raise ValueError('Bad model store: %s.' % store_file)
+        store = cls()
+        store.store_file = store_file
+        store._mmap = mm
+        offset = struct.calcsize(cls.HEADER_FORMAT)
+        for i in xrange(num_sections):
+            name, begin, size = struct.unpack_from(cls.SECTION_FORMAT, mm,
+                    offset)
+            store.sections[name.rstrip('\0')] = (begin, size)
+            offset += struct.calcsize(cls.SECTION_FORMAT)
+        return store
+
+    def __contains__(self, name):
+        return name in self.sections
+
+    def vocabulary_snapshot(self):
+        """
+        返回词典段的 VocabularySnapshot, 见 Vocabulary.attach_snapshot.
+        """
+        return VocabularySnapshot.attach(self._mmap,
+                self.sections[self.VOCABULARY][0], self.store_file)
+
+    def attach_hmm(self, hmm, name):
+        """
+        hmm (HMM) 使用段 name (HMM_SEGMENT 或 HMM_POS) 中的模型.
+        """
+        hmm.attach(self._mmap, self.sections[name][0],
+                '%s:%s' % (self.store_file, name))
+
+    def memory_usage(self):
+        """
+        返回本进程中该文件映射区的内存统计 (KB): size、rss、shared (与其他
+        进程共享的页) 和 private (仅本进程使用的页). 非 Linux 系统返回 None.
+        """
+        smaps_file = '/proc/self/smaps'
+        if not os.path.exists(smaps_file):
+            return None
+        path = os.path.realpath(self.store_file)
+        usage = {'size': 0, 'rss': 0, 'shared': 0, 'private': 0}
+        fields = {'Size:': 'size', 'Rss:': 'rss',
+                  'Shared_Clean:': 'shared', 'Shared_Dirty:': 'shared',
+                  'Private_Clean:': 'private', 'Private_Dirty:': 'private'}
+        in_store = False
+        fp = open(smaps_file, 'rb')
+        for line in fp:
+            parts = line.split()
+            if not parts:
+                continue
+            if not parts[0].endswith(':'):  # 映射区的起始行
+                in_store = ' '.join(parts[5:]) == path
+            elif in_store and parts[0] in fields:
+                usage[fields[parts[0]]] += int(parts[1])
+        fp.close()
+        return usage
+
+if __name__ == '__main__':
+    # 用法: python model_store.py data_dir store_file
+    from vocabulary import Vocabulary
+
+    logging.basicConfig(level = logging.INFO)
+    data_dir = sys.argv[1]
+    vocabulary = Vocabulary()
+    vocabulary.load(data_dir + '/vocabulary.dat', data_dir + '/custom_words')
+    hmm_segment = HMM()
+    hmm_segment.load(data_dir + '/hmm_segment_model')
+    hmm_pos = None
+    if os.path.isdir(data_dir + '/hmm_pos_model'):
+        hmm_pos = HMM()
+        hmm_pos.load(data_dir + '/hmm_pos_model')
+    ModelStore.write(sys.argv[2], vocabulary, hmm_segment, hmm_pos)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import os
+import tempfile
+import unittest
+
+from hmm import HMM
+from hmm_pos_tagger import HMMPOSTagger
+from hmm_segmenter import HMMSegmenter
+from max_prob_segmenter import MaxProbSegmenter
+from model_store import ModelStore
+from vocabulary import Vocabulary
+
+class ModelStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.vocabulary = Vocabulary()
+        self.vocabulary.load('testdata/vocabulary.dat', 'testdata/custom_words')
+        self.hmm_segmenter = HMMSegmenter()
+        self.hmm_segmenter.load('../data/hmm_segment_model')
+        self.hmm_pos_tagger = HMMPOSTagger(self.vocabulary)
+        self.hmm_pos_tagger.load('testdata/hmm_pos_model')
+
+        fd, self.store_file = tempfile.mkstemp()
+        os.close(fd)
+        ModelStore.write(self.store_file, self.vocabulary,
+                self.hmm_segmenter.hmm, self.hmm_pos_tagger.hmm)
+        self.store = ModelStore.open(self.store_file)
+
+    def tearDown(self):
+        os.remove(self.store_file)
+
+    def test_sections(self):
+        for name in (ModelStore.VOCABULARY, ModelStore.HMM_SEGMENT,
+                ModelStore.HMM_POS):
+            self.assertIn(name, self.store)
+            self.assertEqual(0, self.store.sections[name][0] % 8)
+
+    def test_hmm(self):
+        for name, hmm in ((ModelStore.HMM_SEGMENT, self.hmm_segmenter.hmm),
+                (ModelStore.HMM_POS, self.hmm_pos_tagger.hmm)):
+            mapped = HMM()
+            self.store.attach_hmm(mapped, name)
+            self.assertEqual(hmm.states, mapped.states)
+            self.assertEqual(hmm.symbols, dict(mapped.symbols))
+            self.assertEqual(len(hmm.symbols), mapped.symbols.get(u'\0',
+                len(hmm.symbols)))
+            self.assertEqual([list(row) for row in hmm.emit_log_prob],
+                    [list(row) for row in mapped.emit_log_prob])
+
+    def test_segment(self):
+        vocabulary = Vocabulary()
+        vocabulary.attach_snapshot(self.store.vocabulary_snapshot())
+        hmm_segmenter = HMMSegmenter()
+        self.store.attach_hmm(hmm_segmenter.hmm, ModelStore.HMM_SEGMENT)
+        hmm_pos_tagger = HMMPOSTagger(vocabulary)
+        self.store.attach_hmm(hmm_pos_tagger.hmm, ModelStore.HMM_POS)
+
+        expected = MaxProbSegmenter(self.vocabulary, self.hmm_segmenter)
+        mapped = MaxProbSegmenter(vocabulary, hmm_segmenter)
+        fp = open('testdata/document.dat', 'rb')
+        for text in fp.readlines():
+            words = list(expected.segment(text.strip()))
+            self.assertEqual(words, list(mapped.segment(text.strip())))
+            self.assertEqual(list(self.hmm_pos_tagger.pos_tag(words)),
+                    list(hmm_pos_tagger.pos_tag(words)))
+        fp.close()
+
+    def test_memory_usage(self):
+        usage = self.store.memory_usage()
+        if usage is None:  # 非 Linux
+            return
+        self.assertEqual(
+                (os.path.getsize(self.store_file) + 4095) // 4096 * 4,
+                usage['size'])
+        self.assertEqual(usage['rss'], usage['shared'] + usage['private'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import math
+import unittest
+
+from hmm_segmenter import HMMSegmenter
+from max_prob_segmenter import MaxProbSegmenter
+from ngram_model import NGramModel
+from vocabulary import Vocabulary
+
+class NGramModelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.vocabulary = Vocabulary()
+        self.vocabulary.load('testdata/vocabulary.dat', 'testdata/custom_words')
+        self.ngram_model = NGramModel()
+        self.ngram_model.load('testdata/ngram.arpa', self.vocabulary)
+
+    def test_load(self):
+        self.assertEqual(3, self.ngram_model.order)
+        self.assertEqual(2, len(self.ngram_model.bigram_ids))
+        self.assertEqual(1, len(self.ngram_model.trigram_ids))
+
+    def test_log_prob(self):
+        ln10 = math.log(10)
+        hero, three_kingdoms, fight = [self.vocabulary.get_word_id(word)
+                for word in (u'英雄', u'三国', u'对战')]
+        model = self.ngram_model
+        self.assertAlmostEqual(-0.01 * ln10,
+                model.bigram_log_prob(hero, three_kingdoms, -5.0))
+        self.assertAlmostEqual(-0.5 * ln10 - 5.0,
+                model.bigram_log_prob(hero, fight, -5.0), 5)
+        self.assertEqual(-5.0, model.bigram_log_prob(fight, hero, -5.0))
+        self.assertEqual(-5.0, model.bigram_log_prob(-1, hero, -5.0))
+
+        self.assertAlmostEqual(-0.1 * ln10,
+                model.trigram_log_prob(hero, three_kingdoms, fight, -5.0))
+        self.assertAlmostEqual(-0.01 * ln10,
+                model.trigram_log_prob(fight, hero, three_kingdoms, -5.0))
+        # 回退: backoff(英雄 三国) + log P(英雄 | 三国)
+        self.assertAlmostEqual(-0.2 * ln10 - 5.0,
+                model.trigram_log_prob(hero, three_kingdoms, hero, -5.0))
+
+    def test_segment(self):
+        hmm_segmenter = HMMSegmenter()
+        hmm_segmenter.load('../data/hmm_segment_model')
+        text = u'英雄三国是由网易历时四年自主研发运营的一款英雄对战竞技网游'
+        unigram = list(MaxProbSegmenter(self.vocabulary,
+            hmm_segmenter).segment(text))
+        self.assertIn(u'英雄三国', unigram)
+
+        trigram = list(MaxProbSegmenter(self.vocabulary, hmm_segmenter,
+            ngram_model = self.ngram_model).segment(text))
+        self.assertEqual([u'英雄', u'三国'], trigram[:2])
+        self.assertEqual(len(text), len(u''.join(trigram)))
+
+        self.ngram_model.order = 2
+        self.assertEqual(trigram, list(MaxProbSegmenter(self.vocabulary,
+            hmm_segmenter, ngram_model = self.ngram_model).segment(text)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import codecs
+import threading
+
+_record_state = threading.local()  # _record_errors 的 errors 和出错标记
+
+def _record_errors(error):
+    """
+    解码出错处理函数: 记录出错, 再按 _record_state.errors 方式处理.
+    """
+    _record_state.failed = True
+    return codecs.lookup_error(_record_state.errors)(error)
+
+codecs.register_error('text_decoder.record', _record_errors)
+
+class TextDecoder(object):
+    """
+    分词输入的解码层: 接受 unicode、str、bytearray、memoryview 或 buffer,
+    返回 unicode. unicode 原样返回, 其余输入直接交给编码的解码函数, 不复制
+    也不做多余的类型转换.
+
+    encoding 不为 None 时只按 encoding 解码一次, errors 为出错处理方式.
+
+    encoding 为 None 时自动识别: 依次尝试 CANDIDATE_ENCODINGS (utf-8, gbk),
+    所有候选编码都失败时按最后一个候选编码以 errors 方式解码. 最后一个候选
+    编码直接以 errors 方式解码并记录是否出错, 不再先严格解码一次, 因此每次
+    输入最多解码两次. sticky 为 True 时识别出的编码在后续输入中优先使用,
+    因此一个 gbk 数据流只在第一次输入时多尝试一次 utf-8, 之后每次输入只解码
+    一次.
+
+    一个数据流 (文件、抓取任务等) 使用一个 sticky 的 TextDecoder, 编码识别
+    结果不会影响其他数据流. 各分词组件默认的 decoder 不是 sticky 的 (输入
+    可能来自不同数据流), 每次都先尝试 utf-8.
+    """
+    CANDIDATE_ENCODINGS = ('utf-8', 'gbk')
+
+    def __init__(self, encoding = None, errors = 'ignore', sticky = True):
+        self.errors = errors
+        self.sticky = sticky
+        self.explicit = encoding is not None
+        if encoding is None:
+            encoding = self.CANDIDATE_ENCODINGS[0]
+        self.encoding = codecs.lookup(encoding).name  # 当前使用的编码
+        self._decode = codecs.lookup(self.encoding).decode
+        self._decoders = dict((encoding, codecs.lookup(encoding).decode)
+                for encoding in self.CANDIDATE_ENCODINGS)
+
+    def decode(self, data):
+        """
+        返回 data 解码后的 unicode 文本.
+        """
+        if type(data) is unicode:
+            return data
+        if self.explicit:
+            return self._decode(data, self.errors)[0]
+        if self.encoding != self.CANDIDATE_ENCODINGS[-1]:
+            try:
+                return self._decode(data)[0]
+            except UnicodeDecodeError:
+                return self._detect(data, None)
+        text, failed = self._decode_fallback(data)
+        if not failed:
+            return text
+        return self._detect(data, text)
+
+    def incremental_decoder(self, first_chunk):
+        """
+        返回 (增量解码器, first_chunk 解码后的文本), 用于分块读入的数据流.
+        编码按与 decode 相同的顺序由 first_chunk 识别 (sticky 时记住), 识别
+        成功的增量解码器直接用于之后的片段, 不再重新解码 first_chunk.
+        """
+        if self.explicit:
+            decoder = codecs.getincrementaldecoder(self.encoding)(self.errors)
+            return decoder, decoder.decode(first_chunk)
+        fallback = self.CANDIDATE_ENCODINGS[-1]
+        fallback_result = None
+        encodings = [self.encoding] + [encoding
+                for encoding in self.CANDIDATE_ENCODINGS
+                if encoding != self.encoding]
+        for encoding in encodings:
+            if encoding == fallback:
+                _record_state.errors = self.errors
+                _record_state.failed = False
+                decoder = codecs.getincrementaldecoder(encoding)(
+                        'text_decoder.record')
+                text = decoder.decode(first_chunk)
+                decoder.errors = self.errors
+                if _record_state.failed:
+                    fallback_result = (decoder, text)
+                    continue
+            else:
+                decoder = codecs.getincrementaldecoder(encoding)()
+                try:
+                    text = decoder.decode(first_chunk)
+                except UnicodeDecodeError:
+                    continue
+                decoder.errors = self.errors
+            if self.sticky:
+                self.encoding = encoding
+                self._decode = self._decoders[encoding]
+            return decoder, text
+        return fallback_result
+
+    def _detect(self, data, fallback_text):
+        """
+        当前编码解码失败时依次尝试其他候选编码, sticky 时成功后切换为该
+        编码. 最后一个候选编码 (兜底编码) 只以 errors 方式解码一次, 其他
+        候选编码都失败时返回其结果; 当前编码即兜底编码时其结果为
+        fallback_text.
+        """
+        fallback = self.CANDIDATE_ENCODINGS[-1]
+        for encoding in self.CANDIDATE_ENCODINGS:
+            if encoding == self.encoding:
+                continue
+            if encoding == fallback:
+                text, failed = self._decode_fallback(data)
+                if failed:
+                    return text
+            else:
+                try:
+                    text = self._decoders[encoding](data)[0]
+                except UnicodeDecodeError:
+                    continue
+            if self.sticky:
+                self.encoding = encoding
+                self._decode = self._decoders[encoding]
+            return text
+        return fallback_text
+
+    def _decode_fallback(self, data):
+        """
+        按兜底编码以 errors 方式解码, 返回 (文本, 是否出错).
+        """
+        _record_state.errors = self.errors
+        _record_state.failed = False
+        text = self._decoders[self.CANDIDATE_ENCODINGS[-1]](
+                data, 'text_decoder.record')[0]
+        return text, _record_state.failed
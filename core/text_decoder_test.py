@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import unittest
+
+from text_decoder import TextDecoder
+
+class TextDecoderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.text = u'小明硕士毕业于中国科学院计算所'
+
+    def test_decode(self):
+        decoder = TextDecoder()
+        self.assertTrue(decoder.decode(self.text) is self.text)
+        data = self.text.encode('utf-8')
+        for value in (data, bytearray(data), memoryview(data), buffer(data)):
+            self.assertEqual(self.text, decoder.decode(value))
+
+    def test_explicit_encoding(self):
+        decoder = TextDecoder('GBK')
+        self.assertEqual('gbk', decoder.encoding)
+        self.assertEqual(self.text, decoder.decode(self.text.encode('gbk')))
+        self.assertEqual(u'ab', decoder.decode('ab\xff'))
+
+    def test_detect(self):
+        data = self.text.encode('gbk')
+        decoder = TextDecoder()
+        self.assertEqual(self.text, decoder.decode(data))
+        self.assertEqual('gbk', decoder.encoding)
+
+        decoder = TextDecoder(sticky = False)
+        self.assertEqual(self.text, decoder.decode(data))
+        self.assertEqual('utf-8', decoder.encoding)
+        self.assertEqual(self.text,
+                decoder.decode(self.text.encode('utf-8')))
+
+    def test_incremental_decoder(self):
+        for encoding in ('utf-8', 'gbk'):
+            data = self.text.encode(encoding)
+            chunks = [data[i : i + 5] for i in xrange(0, len(data), 5)]
+            for decoder in (TextDecoder(), TextDecoder(encoding)):
+                incremental_decoder, text = decoder.incremental_decoder(
+                        chunks[0])
+                self.assertEqual(encoding, decoder.encoding)
+                for chunk in chunks[1:]:
+                    text += incremental_decoder.decode(chunk)
+                text += incremental_decoder.decode('', True)
+                self.assertEqual(self.text, text)
+
+        # 都无法严格解码时按兜底编码以 errors 方式解码
+        incremental_decoder, text = TextDecoder().incremental_decoder(
+                self.text.encode('gbk') + '\xff!')
+        self.assertEqual(self.text, text)
+        self.assertEqual(u'ab', incremental_decoder.decode('ab', True))
+
+    def test_detect_failure(self):
+        # utf-8 和 gbk 都无法严格解码时最多解码两次
+        passes = []
+        def counting(encoding, decode):
+            def counting_decode(data, *args):
+                passes.append(encoding)
+                return decode(data, *args)
+            return counting_decode
+        def count_passes(decoder):
+            for encoding, decode in decoder._decoders.items():
+                decoder._decoders[encoding] = counting(encoding, decode)
+            decoder._decode = decoder._decoders[decoder.encoding]
+
+        data = self.text.encode('gbk') + '\xff'
+        for sticky in (True, False):
+            decoder = TextDecoder(sticky = sticky)
+            count_passes(decoder)
+            del passes[:]
+            self.assertEqual(self.text, decoder.decode(data))
+            self.assertEqual(['utf-8', 'gbk'], passes)
+            self.assertEqual('utf-8', decoder.encoding)
+
+        # 兜底编码为当前编码时同样最多两次
+        decoder = TextDecoder()
+        decoder.decode(self.text.encode('gbk'))
+        self.assertEqual('gbk', decoder.encoding)
+        count_passes(decoder)
+        del passes[:]
+        self.assertEqual(self.text, decoder.decode(data))
+        self.assertEqual(['gbk', 'utf-8'], passes)
+        self.assertEqual(self.text,
+                decoder.decode(self.text.encode('utf-8')))
+
+if __name__ == '__main__':
+    unittest.main()
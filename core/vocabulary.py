@@ -24,41 +24,270 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+from array import array
 import logging
 import math
 import os
+import threading
+import time
+
+from double_array_trie import DoubleArrayTrie
+from vocabulary_snapshot import VocabularySnapshot
+
+_update_lock = threading.RLock()  # 串行化 add_word / remove_word 等写操作
 
 class Vocabulary(object):
     """
     分词词典.
 
-    使用 Trie 树结构组织词典, 实现高效查找.
+    使用 Trie 树结构组织词典, 实现高效查找. trie 的词尾节点上记录词的 log
+    概率、词性和词编号, gen_edges 遍历 trie 时直接取出, 无需截取子串再查
+    words. 词编号供 NGramModel 等以整数索引词的模型使用.
+    支持两种 trie 实现:
+        DICT_TRIE: 嵌套 dict, 构建快, 但内存占用大.
+        DOUBLE_ARRAY_TRIE: double array trie, 内存占用约为前者的 1/10,
+                           详见 DoubleArrayTrie.
+
+    add_word / remove_word / reload_custom_words 支持运行时增删词, 不重新
+    加载词典. 更新采用写时复制: 只复制被修改词路径上的 trie 节点, 构建完成后
+    整体替换 self.trie (double array trie 模式下为 self.overlay), 正在进行的
+    gen_edges 继续使用旧 trie, 不会看到修改了一半的结构.
     """
 
     MAX_WORD_LENGTH = 16  # 词的最大长度
+    DICT_TRIE = 'dict'
+    DOUBLE_ARRAY_TRIE = 'double_array'
 
     def __init__(self):
-        # TODO(fandywang): 实现 double array trie, 节省内存, 提高速度
+        self.trie_type = self.__class__.DICT_TRIE
         self.trie = {}  # trie 树结构组织词典, 实现高效查找
         self.words = {}  # word->(log_prob, pos), 词频率分布
         self.total_freq = 0.0
         self.min_log_prob = 1.0
+        self.version = 0  # 词典每次变化时加 1, 供缓存失效判断
+        self.instrumentation = None  # 设置后记录加载耗时
+        self.load_time = None  # 加载耗时 (秒)
+        self.next_word_id = 0  # 运行时新增词的编号
+
+        # double array trie 的词尾信息, 按词编号索引
+        self.word_log_prob = None  # 词的 log 概率
+        self.word_pos_id = None  # 词性编号
+        self.pos_names = None  # 词性编号 -> 词性
+
+        # double array trie 不支持增量修改, 运行时更新的词记录在 overlay 中,
+        # 结构同 dict trie, 词尾为 None 表示该词已删除
+        self.overlay = {}
+        self.overlay_words = {}  # word->(log_prob, pos) 或 None
+        # dict trie 中删除的词的编号, word->word_id, 重新添加时沿用
+        self.removed_word_ids = {}
+
+        self.custom_words_dir = None
+        self.custom_words = {}  # 用户自定义词典中的词, word->(freq, pos)
+        self.shadowed_words = {}  # 被用户自定义词覆盖的基本词典词, word->(freq, pos)
 
-    def load(self, vocabulary_file, custom_words_dir = None):
+    def load(self, vocabulary_file, custom_words_dir = None,
+            trie_type = DICT_TRIE):
         """
         加载词典, 包括基本词典和用户自定义词典.
+
+        trie_type 指定 trie 实现, 取值为 DICT_TRIE 或 DOUBLE_ARRAY_TRIE.
         """
+        if trie_type not in (self.__class__.DICT_TRIE,
+                self.__class__.DOUBLE_ARRAY_TRIE):
+            raise ValueError('Unknown trie type: %s.' % trie_type)
+        self.trie_type = trie_type
+        self.overlay, self.overlay_words = {}, {}
+        self.removed_word_ids = {}
+        start = time.time()
+
         self._load_vocabulary(vocabulary_file)
         if custom_words_dir is not None:
             self._load_custom_words(custom_words_dir)
 
-        for word, word_attr in self.words.iteritems():
+        words = self.words.keys()  # 词编号为词在 words 中的下标
+        for word_id, word in enumerate(words):
+            word_attr = self.words[word]
             log_prob = math.log(word_attr[0] / self.total_freq)
             self.words[word] = (log_prob, word_attr[1])
             self.min_log_prob = min(self.min_log_prob, log_prob)
+            if self.trie_type == self.__class__.DICT_TRIE:
+                self._set_payload(word, self.words[word] + (word_id,))
+        self.next_word_id = len(words)
+
+        if self.trie_type == self.__class__.DOUBLE_ARRAY_TRIE:
+            self.trie = DoubleArrayTrie()
+            self.trie.build(words)
+            pos_ids = {}
+            self.word_log_prob = array('d', [self.words[word][0]
+                for word in words])
+            self.word_pos_id = array('h', [pos_ids.setdefault(
+                self.words[word][1], len(pos_ids)) for word in words])
+            self.pos_names = sorted(pos_ids, key = lambda pos: pos_ids[pos])
+        self.version += 1
+        self.load_time = time.time() - start
+        if self.instrumentation is not None:
+            self.instrumentation.timing('vocabulary.load_us', start)
         # pprint.pprint(self.trie)
         # pprint.pprint(self.words)
 
+    def compile(self, snapshot_file):
+        """
+        将已加载的词典 (含用户自定义词典) 编译为二进制快照文件.
+        """
+        VocabularySnapshot.write(self, snapshot_file)
+
+    def all_words(self):
+        """
+        返回包含运行时更新的 word->(log_prob, pos).
+        """
+        if not self.overlay_words:
+            return self.words
+        words = dict(self.words.iteritems())
+        for word, word_attr in self.overlay_words.iteritems():
+            if word_attr is None:
+                words.pop(word, None)
+            else:
+                words[word] = word_attr
+        return words
+
+    def add_word(self, word, freq, pos = 'UNK'):
+        """
+        运行时添加词, 或修改已有词的词频和词性.
+
+        只计算 word 自身的 log 概率 (新词的 freq 计入 total_freq), 其余词不
+        重新归一化. 与全量重新加载相比, 其余词的 log 概率相差
+        log(1 + freq / total_freq), 对切分结果的影响可以忽略.
+        """
+        with _update_lock:
+            word_attr = self.get_word(word)
+            if word_attr is None:
+                self.total_freq += freq
+            new_word_attr = (math.log(float(freq) / self.total_freq), pos)
+            if new_word_attr == word_attr:
+                return
+            word_id = self.get_word_id(word)
+            if word_id < 0:  # 删除后重新添加的词沿用原编号
+                if self.trie_type == self.__class__.DICT_TRIE:
+                    word_id = self.removed_word_ids.pop(word, -1)
+                else:
+                    word_id = self.trie.get(word)
+            if word_id < 0:
+                word_id = self.next_word_id
+                self.next_word_id += 1
+            self._update_word(word, new_word_attr, word_id)
+
+    def remove_word(self, word):
+        """
+        运行时删除词, word 不在词典中时忽略.
+        """
+        with _update_lock:
+            if self.get_word(word) is not None:
+                self._update_word(word, None)
+
+    def reload_custom_words(self, custom_words_dir = None):
+        """
+        重新扫描用户自定义词典目录 (默认为 load 时的目录), 只增删有变化的词.
+        从文件中删去的词若原本在基本词典中, 恢复其基本词典的词频和词性.
+
+        NOTE: 通过 load_snapshot 加载时无法区分快照中哪些词来自用户自定义
+        词典, 第一次调用只添加和修改词, 不删除.
+        """
+        if custom_words_dir is None:
+            custom_words_dir = self.custom_words_dir
+        if custom_words_dir is None:
+            raise ValueError('Unknown custom words dir.')
+
+        custom_words = {}
+        for word, freq, pos in self._read_custom_words(custom_words_dir):
+            custom_words[word] = (freq, pos)
+        # 整个比较和更新过程持有锁 (可重入, add_word 等会再次获取), 避免
+        # 并发的 reload_custom_words / add_word 交错
+        with _update_lock:
+            for word in self.custom_words:
+                if word in custom_words:
+                    continue
+                if word in self.shadowed_words:
+                    self.add_word(word, *self.shadowed_words.pop(word))
+                else:
+                    self.remove_word(word)
+            for word, (freq, pos) in custom_words.iteritems():
+                if self.custom_words.get(word) == (freq, pos):
+                    continue
+                word_attr = self.get_word(word)
+                if word not in self.custom_words and word_attr is not None:
+                    self.shadowed_words[word] = (math.exp(word_attr[0])
+                            * self.total_freq, word_attr[1])
+                self.add_word(word, freq, pos)
+            self.custom_words = custom_words
+            self.custom_words_dir = custom_words_dir
+
+    def _update_word(self, word, word_attr, word_id = -1):
+        """
+        写时复制更新 word, word_attr 为 None 表示删除. 调用者需持有
+        _update_lock.
+        """
+        payload = None
+        if word_attr is not None:
+            payload = word_attr + (word_id,)
+        if self.trie_type == self.__class__.DICT_TRIE:
+            trie, ptr = self._copy_path(self.trie, word)
+            if word_attr is None:
+                self.removed_word_ids[word] = ptr.pop('')[2]
+                del self.words[word]
+            else:
+                ptr[''] = payload
+                self.words[word] = word_attr
+            self.trie = trie
+        else:
+            overlay, ptr = self._copy_path(self.overlay, word)
+            ptr[''] = payload
+            self.overlay_words[word] = word_attr
+            self.overlay = overlay
+        if word_attr is not None:
+            self.min_log_prob = min(self.min_log_prob, word_attr[0])
+        self.version += 1
+
+    def _copy_path(self, trie, word):
+        """
+        复制 trie 的根节点和 word 路径上的节点, 返回 (新根节点, word 的词尾
+        节点).
+        """
+        root = ptr = dict(trie)
+        for ch in word:
+            node = dict(ptr.get(ch, {}))
+            ptr[ch] = node
+            ptr = node
+        return root, ptr
+
+    def load_snapshot(self, snapshot_file):
+        """
+        通过 mmap 加载 compile 生成的快照文件, 使用 double array trie.
+
+        加载后 self.words 为只读的 VocabularySnapshot.
+        """
+        start = time.time()
+        self.attach_snapshot(VocabularySnapshot.open(snapshot_file))
+        self.load_time = time.time() - start
+        if self.instrumentation is not None:
+            self.instrumentation.timing('vocabulary.load_us', start)
+
+    def attach_snapshot(self, snapshot):
+        """
+        使用已映射的 VocabularySnapshot (见 VocabularySnapshot.attach), 例如
+        ModelStore 中的词典快照.
+        """
+        self.trie_type = self.__class__.DOUBLE_ARRAY_TRIE
+        self.trie = snapshot.trie
+        self.overlay, self.overlay_words = {}, {}
+        self.words = snapshot
+        self.total_freq = snapshot.total_freq
+        self.min_log_prob = snapshot.min_log_prob
+        self.word_log_prob = snapshot.log_prob
+        self.word_pos_id = snapshot.pos_id
+        self.pos_names = snapshot.pos_names
+        self.next_word_id = len(snapshot)
+        self.version += 1
+
     def _load_vocabulary(self, vocabulary_file):
         """
         加载基本分词词典, 构建 trie 树.
@@ -89,6 +318,19 @@ class Vocabulary(object):
         加载用户自定义词典, 丰富 trie 树.
         """
         logging.info('Load custom_words from %s.' % custom_words_dir)
+        for word, freq, pos in self._read_custom_words(custom_words_dir):
+            if word in self.words and not word in self.custom_words:
+                self.shadowed_words[word] = self.words[word]
+            self.words[word] = (freq, pos)
+            self.custom_words[word] = (freq, pos)
+            self.total_freq += freq
+            self._insert_trie(word)
+        self.custom_words_dir = custom_words_dir
+
+    def _read_custom_words(self, custom_words_dir):
+        """
+        依次返回用户自定义词典中的 (word, freq, pos).
+        """
         for root, dirs, files in os.walk(custom_words_dir):
             for f in files:
                 filename = os.path.join(root, f)
@@ -103,40 +345,175 @@ class Vocabulary(object):
                         logging.warning('Line format error, line: %s.' % line)
                         continue
 
-                    word, freq, pos = fields[0], float(fields[1]), fields[2]
-                    self.words[word] = (freq, pos)
-                    self.total_freq += freq
-                    self._insert_trie(word)
+                    yield fields[0], float(fields[1]), fields[2]
                 fp.close()
 
     def _insert_trie(self, word):
+        if self.trie_type != self.__class__.DICT_TRIE:
+            return  # double array trie 在全部词加载完成后一次性构建
         ptr = self.trie
         for ch in word:
             if not ch in ptr:
                 ptr[ch] = {}
             ptr = ptr[ch]
-        ptr[''] = ''  # ending flag
+        ptr[''] = ''  # ending flag, 加载完成后替换为 (log_prob, pos, word_id)
+
+    def _set_payload(self, word, word_attr):
+        ptr = self.trie
+        for ch in word:
+            ptr = ptr[ch]
+        ptr[''] = word_attr
+
+    def get_word(self, word):
+        """
+        获取 word 的 (log_prob, pos), 如果 word 不在词典中, 返回 None.
+        """
+        if word in self.overlay_words:
+            return self.overlay_words[word]
+        return self.words.get(word)
+
+    def get_word_id(self, word):
+        """
+        获取 word 的编号, 与 gen_edges 返回的 word_ids 一致, 如果 word 不在
+        词典中, 返回 -1.
+        """
+        if self.trie_type == self.__class__.DICT_TRIE:
+            payload = self._get_payload(self.trie, word)
+        elif word in self.overlay_words:
+            payload = self._get_payload(self.overlay, word)
+        else:
+            return self.trie.get(word)
+        return payload[2] if payload else -1
+
+    def _get_payload(self, trie, word):
+        ptr = trie
+        for ch in word:
+            if not ch in ptr:
+                return None
+            ptr = ptr[ch]
+        return ptr.get('')
 
     def get_log_prob(self, word):
         """
         获取 word 的概率, 如果 word 不在词典中, 返回最小概率.
         """
-        return self.words.get(word, (self.min_log_prob, ''))[0]
+        return (self.get_word(word) or (self.min_log_prob, ''))[0]
 
 
     def get_pos(self, word):
         """
         获取 word 的词性.
         """
-        return self.words.get(word, (0, 'UNK'))[1]
+        return (self.get_word(word) or (0, 'UNK'))[1]
+
+    def gen_edges(self, text):
+        """
+        生成词图, 以平铺数组 (CSR) 表示: 从位置 i 开始的边为
+        edges[offsets[i] : offsets[i + 1]], 第 k 条边对应的词为
+        text[i : ends[k] + 1], 其 log 概率、词性和词编号取自 trie 的词尾节点,
+        分别为 log_probs[k]、pos_list[k] 和 word_ids[k]. 没有词从 i 开始时只有
+        单字边, 其 log 概率为 min_log_prob, 词性为 'UNK', 词编号为 -1. 边与
+        gen_DAG 一致.
+
+        返回 (offsets, ends, log_probs, pos_list, word_ids), 其中 offsets 长度
+        为 len(text) + 1. 整个过程不截取子串, 也不查询 words.
+        """
+        if self.trie_type == self.__class__.DOUBLE_ARRAY_TRIE:
+            return self._gen_edges_double_array(text)
+
+        N = len(text)
+        max_length = self.__class__.MAX_WORD_LENGTH + 1
+        offsets = [0] * (N + 1)
+        ends, log_probs, pos_list, word_ids = [], [], [], []
+        add_end, add_log_prob, add_pos, add_word_id = ends.append, \
+                log_probs.append, pos_list.append, word_ids.append
+        trie = self.trie
+        for i in xrange(N):
+            ptr = trie
+            for j in xrange(i, min(N, i + max_length)):
+                ch = text[j]
+                if not ch in ptr:
+                    break
+                ptr = ptr[ch]
+                if '' in ptr:
+                    word_attr = ptr['']
+                    add_end(j)
+                    add_log_prob(word_attr[0])
+                    add_pos(word_attr[1])
+                    add_word_id(word_attr[2])
+            if len(ends) == offsets[i]:
+                add_end(i)
+                add_log_prob(self.min_log_prob)
+                add_pos('UNK')
+                add_word_id(-1)
+            offsets[i + 1] = len(ends)
+        return offsets, ends, log_probs, pos_list, word_ids
+
+    def _gen_edges_double_array(self, text):
+        """
+        基于 double array trie 的 gen_edges.
+        """
+        N = len(text)
+        max_length = self.__class__.MAX_WORD_LENGTH + 1
+        offsets = [0] * (N + 1)
+        ends, log_probs, pos_list, word_ids = [], [], [], []
+        add_end, add_log_prob, add_pos, add_word_id = ends.append, \
+                log_probs.append, pos_list.append, word_ids.append
+        codes = self.trie.encode(text)
+        base, check, value = self.trie.base, self.trie.check, self.trie.value
+        size = len(check)
+        word_log_prob, word_pos_id, pos_names = \
+                self.word_log_prob, self.word_pos_id, self.pos_names
+        overlay = self.overlay
+        for i in xrange(N):
+            s = 0
+            for j in xrange(i, min(N, i + max_length)):
+                code = codes[j]
+                if code == 0:
+                    break
+                t = base[s] + code
+                if t >= size or check[t] != s:
+                    break
+                s = t
+                word_id = value[s]
+                if word_id >= 0:
+                    add_end(j)
+                    add_log_prob(word_log_prob[word_id])
+                    add_pos(pos_names[word_pos_id[word_id]])
+                    add_word_id(word_id)
+            if overlay and text[i] in overlay:
+                edges = dict((ends[k],
+                    (log_probs[k], pos_list[k], word_ids[k]))
+                    for k in xrange(offsets[i], len(ends)))
+                edges.update(self._match_overlay(overlay, text, i,
+                    min(N, i + max_length)))
+                del ends[offsets[i]:], log_probs[offsets[i]:], \
+                        pos_list[offsets[i]:], word_ids[offsets[i]:]
+                for j in sorted(edges):
+                    if edges[j] is not None:
+                        add_end(j)
+                        add_log_prob(edges[j][0])
+                        add_pos(edges[j][1])
+                        add_word_id(edges[j][2])
+            if len(ends) == offsets[i]:
+                add_end(i)
+                add_log_prob(self.min_log_prob)
+                add_pos('UNK')
+                add_word_id(-1)
+            offsets[i + 1] = len(ends)
+        return offsets, ends, log_probs, pos_list, word_ids
 
     def gen_DAG(self, text):
         """
         生成词图.
         """
+        if self.trie_type == self.__class__.DOUBLE_ARRAY_TRIE:
+            return self._gen_DAG_double_array(text)
+
         N = len(text)
         DAG = {}
-        ptr = self.trie
+        trie = self.trie  # add_word 会替换 self.trie, 整个文本使用同一版本
+        ptr = trie
         i, j = 0, 0
 
         while i < N:
@@ -151,9 +528,9 @@ class Vocabulary(object):
                 if j >= N or j - i > self.__class__.MAX_WORD_LENGTH:
                     i += 1
                     j = i
-                    ptr = self.trie
+                    ptr = trie
             else:
-                ptr = self.trie
+                ptr = trie
                 i += 1
                 j = i
 
@@ -162,3 +539,38 @@ class Vocabulary(object):
                 DAG[i] = [i]
         return DAG
 
+
+    def _gen_DAG_double_array(self, text):
+        """
+        基于 double array trie 生成词图, 结果与 gen_DAG 一致.
+        """
+        N = len(text)
+        DAG = {}
+        codes = self.trie.encode(text)
+        prefix_search = self.trie.prefix_search
+        overlay = self.overlay
+        # 与 gen_DAG 一致, 最多向后匹配 MAX_WORD_LENGTH + 1 个字
+        max_length = self.__class__.MAX_WORD_LENGTH + 1
+        for i in xrange(N):
+            ends = prefix_search(codes, i, min(N, i + max_length))
+            if overlay and text[i] in overlay:
+                edges = dict.fromkeys(ends, True)
+                edges.update(self._match_overlay(overlay, text, i,
+                    min(N, i + max_length)))
+                ends = [j for j in sorted(edges) if edges[j] is not None]
+            DAG[i] = ends if ends else [i]
+        return DAG
+
+    def _match_overlay(self, overlay, text, begin, end):
+        """
+        在 overlay 中匹配 text[begin : end] 的前缀, 返回 {词尾位置: 词尾节点值}.
+        """
+        matches = {}
+        ptr = overlay
+        for j in xrange(begin, end):
+            ptr = ptr.get(text[j])
+            if ptr is None:
+                break
+            if '' in ptr:
+                matches[j] = ptr['']
+        return matches
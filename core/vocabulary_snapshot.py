@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import collections
+import ctypes
+import logging
+import mmap
+import struct
+import sys
+
+from double_array_trie import DoubleArrayTrie
+
+class VocabularySnapshot(collections.Mapping):
+    """
+    预编译的词典快照, 供 Vocabulary.load_snapshot 使用.
+
+    快照文件将 double array trie、词的 log 概率、词性以及词本身写入同一个
+    二进制文件, 加载时通过 mmap 映射, 无需解析文本和构建 trie. 映射方式为
+    私有只读 (ACCESS_COPY), 多个进程 (包括 fork 出的子进程) 共享同一份物理
+    内存页.
+
+    文件格式 (本机字节序, 每段按 8 字节对齐):
+        header    : HEADER_FORMAT
+        chars     : utf-8, 按字符编码顺序排列的字符表, 编码从 1 开始
+        base      : int32[num_states]
+        check     : int32[num_states]
+        value     : int32[num_states], 词编号
+        log_prob  : float64[num_words]
+        pos_id    : int16[num_words]
+        pos_names : utf-8, '\n' 分隔的词性表
+        offsets   : int32[num_words + 1], 词在 word_data 中的偏移
+        word_data : utf-8, 所有词按编号顺序拼接
+
+    实现 Mapping 接口, 行为与 Vocabulary.words 一致: word -> (log_prob, pos).
+    """
+
+    MAGIC = 'WSVOCAB1'
+    HEADER_FORMAT = '=8s8sIIIIIIdd'
+
+    def __init__(self):
+        self.trie = None
+        self.total_freq = 0.0
+        self.min_log_prob = 1.0
+
+        self._mmap = None
+        self.log_prob = None
+        self.pos_id = None
+        self.pos_names = None
+        self._offsets = None
+        self._word_data_offset = 0
+        self._num_words = 0
+
+    @classmethod
+    def write(cls, vocabulary, snapshot_file):
+        """
+        将已加载的 vocabulary 编译为快照文件.
+        """
+        logging.info('Write vocabulary snapshot to %s.' % snapshot_file)
+        fp = open(snapshot_file, 'wb')
+        cls.dump(vocabulary, fp)
+        fp.close()
+
+    @classmethod
+    def dump(cls, vocabulary, fp):
+        """
+        将快照写入 fp 的当前位置 (须按 8 字节对齐), 返回写入的字节数.
+        """
+        all_words = vocabulary.all_words()
+        words = sorted(all_words.iterkeys())
+        trie = DoubleArrayTrie()
+        trie.build(words)
+
+        chars = sorted(trie.codes, key = lambda ch: trie.codes[ch])
+        pos_ids = {}
+        log_prob = []
+        pos_id = []
+        offsets = [0]
+        word_data = []
+        for word in words:
+            word_attr = all_words[word]
+            log_prob.append(word_attr[0])
+            pos_id.append(pos_ids.setdefault(word_attr[1], len(pos_ids)))
+            word_data.append(word.encode('utf-8'))
+            offsets.append(offsets[-1] + len(word_data[-1]))
+        pos_names = sorted(pos_ids, key = lambda pos: pos_ids[pos])
+
+        sections = [
+                u''.join(chars).encode('utf-8'),
+                trie.base.tostring(),
+                trie.check.tostring(),
+                trie.value.tostring(),
+                struct.pack('=%dd' % len(log_prob), *log_prob),
+                struct.pack('=%dh' % len(pos_id), *pos_id),
+                u'\n'.join(pos_names).encode('utf-8'),
+                struct.pack('=%di' % len(offsets), *offsets),
+                ''.join(word_data)]
+        header = struct.pack(cls.HEADER_FORMAT, cls.MAGIC,
+                sys.byteorder.ljust(8), len(chars), len(trie.base), len(words),
+                len(sections[0]), len(sections[6]), len(sections[8]),
+                vocabulary.total_freq, vocabulary.min_log_prob)
+
+        size = 0
+        for section in [header] + sections:
+            padding = '\0' * (-len(section) % 8)
+            fp.write(section)
+            fp.write(padding)
+            size += len(section) + len(padding)
+        return size
+
+    @classmethod
+    def open(cls, snapshot_file):
+        """
+        映射快照文件, 返回 VocabularySnapshot.
+        """
+        logging.info('Load vocabulary snapshot from %s.' % snapshot_file)
+        fp = open(snapshot_file, 'rb')
+        mm = mmap.mmap(fp.fileno(), 0, access = mmap.ACCESS_COPY)
+        fp.close()
+        return cls.attach(mm, 0, snapshot_file)
+
+    @classmethod
+    def attach(cls, mm, offset = 0, name = None):
+        """
+        使用 mm (mmap) 中从 offset (按 8 字节对齐) 开始的快照, 不复制数据.
+        name 用于错误信息.
+        """
+        (magic, byteorder, num_chars, num_states, num_words, chars_size,
+                pos_names_size, word_data_size, total_freq, min_log_prob) = \
+                struct.unpack_from(cls.HEADER_FORMAT, mm, offset)
+        if magic != cls.MAGIC or byteorder.strip() != sys.byteorder:
+            raise ValueError('Bad vocabulary snapshot: %s.' % name)
+
+        snapshot = cls()
+        snapshot._mmap = mm
+        snapshot.total_freq = total_freq
+        snapshot.min_log_prob = min_log_prob
+
+        offset = [offset + struct.calcsize(cls.HEADER_FORMAT)]
+        def section(size):
+            begin = offset[0] + (-offset[0] % 8)
+            offset[0] = begin + size
+            return begin
+
+        def ctypes_array(ctype, n):
+            return (ctype * n).from_buffer(mm, section(ctypes.sizeof(ctype) * n))
+
+        begin = section(chars_size)
+        chars = mm[begin : begin + chars_size].decode('utf-8')
+        trie = DoubleArrayTrie()
+        trie.codes = dict((ch, code) for code, ch in enumerate(chars, 1))
+        trie.base = ctypes_array(ctypes.c_int32, num_states)
+        trie.check = ctypes_array(ctypes.c_int32, num_states)
+        trie.value = ctypes_array(ctypes.c_int32, num_states)
+        snapshot.trie = trie
+
+        snapshot.log_prob = ctypes_array(ctypes.c_double, num_words)
+        snapshot.pos_id = ctypes_array(ctypes.c_int16, num_words)
+        begin = section(pos_names_size)
+        snapshot.pos_names = \
+                mm[begin : begin + pos_names_size].decode('utf-8').split(u'\n')
+        snapshot._offsets = ctypes_array(ctypes.c_int32, num_words + 1)
+        snapshot._word_data_offset = section(word_data_size)
+        snapshot._num_words = num_words
+        return snapshot
+
+    def __getitem__(self, word):
+        word_id = self.trie.get(word)
+        if word_id < 0:
+            raise KeyError(word)
+        return (self.log_prob[word_id],
+                self.pos_names[self.pos_id[word_id]])
+
+    def __contains__(self, word):
+        return self.trie.get(word) >= 0
+
+    def __len__(self):
+        return self._num_words
+
+    def __iter__(self):
+        base = self._word_data_offset
+        offsets = self._offsets
+        for word_id in xrange(self._num_words):
+            yield self._mmap[base + offsets[word_id] :
+                    base + offsets[word_id + 1]].decode('utf-8')
+
+if __name__ == '__main__':
+    # 用法: python vocabulary_snapshot.py vocabulary_file
+    #           [custom_words_dir] snapshot_file
+    from vocabulary import Vocabulary
+
+    logging.basicConfig(level = logging.INFO)
+    vocabulary = Vocabulary()
+    vocabulary.load(sys.argv[1], sys.argv[2] if len(sys.argv) > 3 else None)
+    vocabulary.compile(sys.argv[-1])
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import os
+import tempfile
+import unittest
+
+from vocabulary import Vocabulary
+
+class VocabularySnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.vocabulary = Vocabulary()
+        self.vocabulary.load('testdata/vocabulary.dat', 'testdata/custom_words')
+
+        fd, self.snapshot_file = tempfile.mkstemp()
+        os.close(fd)
+        self.vocabulary.compile(self.snapshot_file)
+        self.snapshot = Vocabulary()
+        self.snapshot.load_snapshot(self.snapshot_file)
+
+    def tearDown(self):
+        os.remove(self.snapshot_file)
+
+    def test_words(self):
+        self.assertEqual(len(self.vocabulary.words), len(self.snapshot.words))
+        self.assertEqual(sorted(self.vocabulary.words.keys()),
+                sorted(self.snapshot.words.keys()))
+        for word, word_attr in self.vocabulary.words.iteritems():
+            self.assertEqual(word_attr, self.snapshot.words[word])
+        self.assertEqual(self.vocabulary.total_freq, self.snapshot.total_freq)
+        self.assertEqual(self.vocabulary.min_log_prob,
+                self.snapshot.min_log_prob)
+
+        self.assertEqual('nt', self.snapshot.get_pos(u'黄河水利委员会'))
+        self.assertEqual('UNK', self.snapshot.get_pos(u'十大伪歌手'))
+        self.assertEqual(self.vocabulary.get_log_prob(u'十大伪歌手'),
+                self.snapshot.get_log_prob(u'十大伪歌手'))
+
+    def test_gen_DAG(self):
+        fp = open('testdata/document.dat', 'rb')
+        for text in fp.readlines():
+            text = text.strip().decode('utf-8')
+            self.assertEqual(self.vocabulary.gen_DAG(text),
+                    self.snapshot.gen_DAG(text))
+        fp.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -24,7 +24,12 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import copy
+import os
 import pprint
+import shutil
+import tempfile
+import threading
 import unittest
 
 from vocabulary import Vocabulary
@@ -55,6 +60,116 @@ class VocabularyTest(unittest.TestCase):
         pprint.pprint(self.vocabulary.gen_DAG(
             u'《英雄三国》是由网易历时四年自主研发运营的一款英雄对战竞技网游。'))
 
+    def test_double_array_trie(self):
+        vocabulary = Vocabulary()
+        vocabulary.load('testdata/vocabulary.dat', 'testdata/custom_words',
+                Vocabulary.DOUBLE_ARRAY_TRIE)
+
+        self.assertEqual(sorted(self.vocabulary.words.keys()),
+                sorted(vocabulary.words.keys()))
+        fp = open('testdata/document.dat', 'rb')
+        for text in fp.readlines():
+            text = text.strip().decode('utf-8')
+            self.assertEqual(self.vocabulary.gen_DAG(text),
+                    vocabulary.gen_DAG(text))
+        fp.close()
+
+    def test_gen_edges(self):
+        double_array_vocabulary = Vocabulary()
+        double_array_vocabulary.load('testdata/vocabulary.dat',
+                'testdata/custom_words', Vocabulary.DOUBLE_ARRAY_TRIE)
+
+        text = u'《英雄三国》是由网易历时四年自主研发运营的一款英雄对战竞技网游。'
+        DAG = self.vocabulary.gen_DAG(text)
+        for vocabulary in (self.vocabulary, double_array_vocabulary):
+            offsets, ends, log_probs, pos_list, word_ids = \
+                    vocabulary.gen_edges(text)
+            self.assertEqual(len(text) + 1, len(offsets))
+            for i in xrange(len(text)):
+                self.assertEqual(DAG[i], ends[offsets[i] : offsets[i + 1]])
+                for k in xrange(offsets[i], offsets[i + 1]):
+                    word = text[i : ends[k] + 1]
+                    self.assertEqual(vocabulary.get_log_prob(word),
+                            log_probs[k])
+                    self.assertEqual(vocabulary.get_pos(word), pos_list[k])
+                    self.assertEqual(vocabulary.get_word_id(word),
+                            word_ids[k])
+
+    def test_add_remove_word(self):
+        double_array_vocabulary = Vocabulary()
+        double_array_vocabulary.load('testdata/vocabulary.dat',
+                'testdata/custom_words', Vocabulary.DOUBLE_ARRAY_TRIE)
+
+        trie = self.vocabulary.trie
+        trie_copy = copy.deepcopy(trie)
+        text = u'十大伪歌手和英雄三国'
+        for vocabulary in (self.vocabulary, double_array_vocabulary):
+            version = vocabulary.version
+            old_DAG = vocabulary.gen_DAG(text)
+            word_id = vocabulary.get_word_id(u'英雄三国')
+            vocabulary.add_word(u'十大伪歌手', 10, 'n')
+            vocabulary.remove_word(u'英雄三国')
+            self.assertEqual('n', vocabulary.get_pos(u'十大伪歌手'))
+            self.assertEqual('UNK', vocabulary.get_pos(u'英雄三国'))
+            self.assertEqual(version + 2, vocabulary.version)
+
+            DAG = vocabulary.gen_DAG(text)
+            self.assertIn(4, DAG[0])
+            self.assertNotIn(9, DAG[6])
+            offsets, ends, log_probs, pos_list, word_ids = \
+                    vocabulary.gen_edges(text)
+            for i in xrange(len(text)):
+                self.assertEqual(DAG[i], ends[offsets[i] : offsets[i + 1]])
+            self.assertLessEqual(0, vocabulary.get_word_id(u'十大伪歌手'))
+            self.assertEqual(-1, vocabulary.get_word_id(u'英雄三国'))
+            self.assertIn(u'十大伪歌手', vocabulary.all_words())
+            self.assertNotIn(u'英雄三国', vocabulary.all_words())
+
+            vocabulary.add_word(u'英雄三国', 10, 'n')
+            # 删除后重新添加的词沿用原编号, n-gram 模型中的概率仍然有效
+            self.assertEqual(word_id, vocabulary.get_word_id(u'英雄三国'))
+            vocabulary.remove_word(u'十大伪歌手')
+            self.assertEqual(old_DAG, vocabulary.gen_DAG(text))
+
+        # 写时复制, 旧 trie 不受影响
+        self.assertIsNot(trie, self.vocabulary.trie)
+        self.assertEqual(trie_copy, trie)
+
+    def test_reload_custom_words(self):
+        custom_words_dir = tempfile.mkdtemp()
+        try:
+            shutil.copy('testdata/custom_words/games.dat', custom_words_dir)
+            vocabulary = Vocabulary()
+            vocabulary.load('testdata/vocabulary.dat', custom_words_dir)
+            self.assertIn(u'英雄三国', vocabulary.words)
+
+            fp = open(os.path.join(custom_words_dir, 'games.dat'), 'wb')
+            fp.write(u'英雄联盟\t20\tn\n十大伪歌手\t10\tn\n'.encode('utf-8'))
+            fp.close()
+            vocabulary.reload_custom_words()
+            self.assertNotIn(u'英雄三国', vocabulary.words)
+            self.assertNotIn(u'跑跑卡丁车', vocabulary.words)
+            self.assertIn(u'十大伪歌手', vocabulary.words)
+            self.assertLess(self.vocabulary.get_log_prob(u'英雄联盟'),
+                    vocabulary.get_log_prob(u'英雄联盟'))
+
+            # 并发 reload 互斥, 结果与单次 reload 一致
+            fp = open(os.path.join(custom_words_dir, 'games.dat'), 'wb')
+            fp.write(u'英雄三国\t30\tn\n'.encode('utf-8'))
+            fp.close()
+            threads = [threading.Thread(target = vocabulary.reload_custom_words)
+                       for i in xrange(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual({u'英雄三国': (30.0, 'n')},
+                    vocabulary.custom_words)
+            self.assertIn(u'英雄三国', vocabulary.words)
+            self.assertNotIn(u'十大伪歌手', vocabulary.words)
+        finally:
+            shutil.rmtree(custom_words_dir)
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,400 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from collections import deque
+import Queue
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from core.instrumentation import Instrumentation
+from word_segmenter import WordSegmenter
+from word_segmenter import _init_worker, _pos_tag_chunk, _segment_chunk
+
+class SegmentServer(object):
+    """
+    多个客户端共享一个已加载的 WordSegmenter 的本地分词服务.
+
+    请求先进入长度不超过 max_queue_depth 的队列, 队列满时 submit 抛出
+    Queue.Full (HTTP 返回 503), 由客户端稍后重试, 避免请求无限堆积.
+    workers 个分词线程各自从队列中取请求, 等待不超过 max_batch_delay 秒,
+    凑够 max_batch_size 个文本后合并为一次 segment_batch 调用 (微批处理),
+    未登录词串一起批量解码, 小请求也能充分利用模型.
+
+    workers > 1 时各批次交给 start 时 fork 的 workers 个进程切分 (同
+    WordSegmenter.segment_many), 子进程以写时复制方式共享已加载的模型,
+    不受 GIL 限制, 多核上吞吐量随 workers 增加. start 之后对词典的运行时
+    修改 (add_word 等) 不会同步到子进程. workers 为 1 时在分词线程中直接
+    切分, 没有进程间传输的开销.
+
+    stats 返回请求数、拒绝数、批大小、吞吐量以及最近 LATENCY_WINDOW 个请求
+    延迟 (从提交到完成) 的 p50 / p90 / p99, 百分位数由实际延迟精确计算.
+    """
+    MAX_BATCH_SIZE = 64  # 每批最多文本数
+    MAX_BATCH_DELAY = 0.002  # 凑批最长等待时间 (秒)
+    MAX_QUEUE_DEPTH = 1024  # 队列中最多请求数
+    LATENCY_WINDOW = 10000  # 计算延迟百分位数的最近请求数
+
+    def __init__(self, word_segmenter, max_batch_size = None,
+            max_batch_delay = None, max_queue_depth = None, workers = 1):
+        self.word_segmenter = word_segmenter
+        self.max_batch_size = max_batch_size or self.MAX_BATCH_SIZE
+        if max_batch_delay is None:
+            max_batch_delay = self.MAX_BATCH_DELAY
+        self.max_batch_delay = max_batch_delay
+        self.queue = Queue.Queue(max_queue_depth or self.MAX_QUEUE_DEPTH)
+        self.workers = workers
+        self.pool = None  # workers > 1 时的分词进程池
+        self.threads = []
+        self.running = False
+        self.instrumentation = Instrumentation()
+        self.latencies = deque(maxlen = self.LATENCY_WINDOW)  # 微秒
+        self.lock = threading.Lock()  # 保护 instrumentation 和 latencies
+        self.start_time = None
+
+    def start(self):
+        """
+        启动分词线程.
+        """
+        if self.running:
+            return
+        self.word_segmenter.warmup()
+        if self.workers > 1:
+            # 在启动线程前 fork, 子进程继承已加载的模型
+            self.pool = multiprocessing.Pool(self.workers, _init_worker,
+                    (self.word_segmenter,))
+        self.running = True
+        self.start_time = time.time()
+        for i in xrange(self.workers):
+            thread = threading.Thread(target = self._run,
+                    name = 'segment-worker-%d' % i)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """
+        处理完已提交的请求后停止分词线程.
+        """
+        if not self.running:
+            return
+        self.running = False
+        for thread in self.threads:
+            self.queue.put(None)  # 每个线程一个结束标记
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def submit(self, texts, pos = False):
+        """
+        提交一组文本, 返回 SegmentRequest, 调用其 wait 获取结果. 队列满时
+        抛出 Queue.Full, texts 中有非字符串时抛出 TypeError.
+        """
+        request = SegmentRequest(texts, pos)
+        try:
+            self.queue.put_nowait(request)
+        except Queue.Full:
+            self._count('server.rejected')
+            raise
+        return request
+
+    def segment(self, texts, pos = False, timeout = None):
+        """
+        同步提交并等待结果, 见 submit 和 SegmentRequest.wait.
+        """
+        return self.submit(texts, pos).wait(timeout)
+
+    def stats(self):
+        """
+        返回服务统计信息, 延迟单位为微秒.
+        """
+        with self.lock:
+            counters = dict(self.instrumentation.counters)
+            latencies = list(self.latencies)
+            batch_size = self.instrumentation.histograms.get(
+                    'server.batch_size')
+            stats = {'requests': counters.get('server.requests', 0),
+                     'texts': counters.get('server.texts', 0),
+                     'chars': counters.get('server.chars', 0),
+                     'batches': counters.get('server.batches', 0),
+                     'rejected': counters.get('server.rejected', 0),
+                     'errors': counters.get('server.errors', 0),
+                     'queue_depth': self.queue.qsize()}
+            if batch_size is not None:
+                stats['mean_batch_size'] = batch_size.snapshot()['mean']
+        if latencies:
+            latencies.sort()
+            for q in (50, 90, 99):
+                stats['latency_p%d_us' % q] = _percentile(latencies, q)
+        if self.start_time is not None:
+            elapsed = max(time.time() - self.start_time, 1e-6)
+            stats['texts_per_second'] = stats['texts'] / elapsed
+            stats['chars_per_second'] = stats['chars'] / elapsed
+        return stats
+
+    def _count(self, name, n = 1):
+        with self.lock:
+            self.instrumentation.count(name, n)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if batch:
+                self._process(batch)
+
+    def _next_batch(self):
+        """
+        取下一批请求, 收到结束标记时返回 None (已取到的请求仍会处理).
+        """
+        request = self.queue.get()
+        if request is None:
+            return None
+        batch = [request]
+        size = len(request.texts)
+        deadline = time.time() + self.max_batch_delay
+        while size < self.max_batch_size:
+            timeout = deadline - time.time()
+            try:
+                if timeout > 0:
+                    request = self.queue.get(True, timeout)
+                else:
+                    request = self.queue.get_nowait()
+            except Queue.Empty:
+                break
+            if request is None:
+                self.queue.put(None)  # 处理完本批次后再结束
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _process(self, batch):
+        texts = []
+        for request in batch:
+            texts.extend(request.texts)
+        try:
+            if self.pool is None:
+                results = self.word_segmenter.segment_batch(texts)
+            else:
+                results = self.pool.apply(_segment_chunk, (texts,))
+            i = 0
+            for request in batch:
+                request.result = results[i : i + len(request.texts)]
+                i += len(request.texts)
+            self._pos_tag([request for request in batch if request.pos])
+        except Exception as e:
+            logging.exception('segment batch failed')
+            self._fail(batch, e)
+
+        now = time.time()
+        with self.lock:
+            instrumentation = self.instrumentation
+            instrumentation.count('server.batches')
+            instrumentation.count('server.requests', len(batch))
+            instrumentation.count('server.texts', len(texts))
+            instrumentation.count('server.chars', sum(map(len, texts)))
+            instrumentation.observe('server.batch_size', len(texts))
+            for request in batch:
+                latency = (now - request.submit_time) * 1e6
+                instrumentation.observe('server.latency_us', latency)
+                self.latencies.append(latency)
+        for request in batch:
+            request.done.set()
+
+    def _pos_tag(self, batch):
+        """
+        对 batch 中已切分的请求批量词性标注, 出错时只影响这些请求.
+        """
+        if not batch:
+            return
+        word_lists = [words for request in batch for words in request.result]
+        try:
+            if self.pool is None:
+                results = self.word_segmenter.hmm_pos_tagger.pos_tag_batch(
+                        word_lists)
+            else:
+                results = self.pool.apply(_pos_tag_chunk, (word_lists,))
+        except Exception as e:
+            logging.exception('pos tag batch failed')
+            return self._fail(batch, e)
+        i = 0
+        for request in batch:
+            request.result = results[i : i + len(request.texts)]
+            i += len(request.texts)
+
+    def _fail(self, batch, error):
+        for request in batch:
+            request.result = None
+            request.error = error
+        self._count('server.errors', len(batch))
+
+def _percentile(values, q):
+    """
+    返回已排序的非空列表 values 的第 q (0~100) 百分位数 (nearest-rank).
+    """
+    rank = max(1, int(math.ceil(q / 100.0 * len(values))))
+    return values[rank - 1]
+
+class SegmentRequest(object):
+    """
+    一次提交的文本及其切分结果.
+    """
+
+    def __init__(self, texts, pos = False):
+        for text in texts:
+            if not isinstance(text, basestring):
+                raise TypeError('texts must be strings, got %s'
+                                % type(text).__name__)
+        self.texts = [text if type(text) is unicode else text.decode('utf-8')
+                      for text in texts]
+        self.pos = pos
+        self.submit_time = time.time()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self, timeout = None):
+        """
+        等待并返回与 texts 一一对应的词列表 (pos 为 True 时为 (词, 词性)
+        列表). 超时抛出 RuntimeError, 分词出错时抛出原异常.
+        """
+        if not self.done.wait(timeout):
+            raise RuntimeError('segment request timed out')
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class SegmentHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    SegmentServer 的 HTTP 接口:
+        POST /segment  请求体为 {"texts": [...], "pos": false}, 返回
+                       {"words": [[...], ...]}; 队列满时返回 503.
+        GET  /stats    返回 SegmentServer.stats.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, segment_server, timeout = 30.0):
+        HTTPServer.__init__(self, address, SegmentRequestHandler)
+        self.segment_server = segment_server
+        self.request_timeout = timeout
+
+class SegmentRequestHandler(BaseHTTPRequestHandler):
+    MAX_BODY_SIZE = 16 << 20  # 请求体最大字节数
+
+    def do_GET(self):
+        if self.path != '/stats':
+            return self._send(404, {'error': 'not found'})
+        self._send(200, self.server.segment_server.stats())
+
+    def do_POST(self):
+        if self.path != '/segment':
+            return self._send(404, {'error': 'not found'})
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > self.MAX_BODY_SIZE:
+            return self._send(413, {'error': 'request too large'})
+        try:
+            body = json.loads(self.rfile.read(length))
+            texts = body['texts']
+            if not isinstance(texts, list):
+                raise ValueError('texts must be a list')
+            pos = bool(body.get('pos', False))
+            request = self.server.segment_server.submit(texts, pos)
+        except (ValueError, KeyError, TypeError) as e:
+            return self._send(400, {'error': str(e)})
+        except Queue.Full:
+            return self._send(503, {'error': 'queue full'},
+                    {'Retry-After': '1'})
+        try:
+            result = request.wait(self.server.request_timeout)
+        except Exception as e:
+            return self._send(500, {'error': str(e)})
+        self._send(200, {'words': result})
+
+    def _send(self, code, obj, headers = None):
+        data = json.dumps(obj, ensure_ascii = False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).iteritems():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logging.debug(format, *args)
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+            description = 'Local Chinese word segmentation HTTP server.')
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = 8765)
+    parser.add_argument('-d', '--data_dir',
+            default = os.path.join(os.path.dirname(__file__), 'data'))
+    parser.add_argument('--workers', type = int, default = 1,
+            help = 'segment processes forked after loading the model, '
+                   'default 1 (segment in the server process)')
+    parser.add_argument('--max_batch_size', type = int,
+            default = SegmentServer.MAX_BATCH_SIZE)
+    parser.add_argument('--max_batch_delay', type = float,
+            default = SegmentServer.MAX_BATCH_DELAY)
+    parser.add_argument('--max_queue_depth', type = int,
+            default = SegmentServer.MAX_QUEUE_DEPTH)
+    args = parser.parse_args(argv[1:])
+
+    word_segmenter = WordSegmenter()
+    word_segmenter.load(args.data_dir)
+    segment_server = SegmentServer(word_segmenter, args.max_batch_size,
+            args.max_batch_delay, args.max_queue_depth, args.workers)
+    segment_server.start()
+    http_server = SegmentHTTPServer((args.host, args.port), segment_server)
+    logging.info('serving on %s:%d' % (args.host, args.port))
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http_server.server_close()
+        segment_server.stop()
+
+if __name__ == '__main__':
+    logging.basicConfig(level = logging.INFO)
+    main(sys.argv)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+# Copyright(c) 2013 python-wordsegmenter project.
+# Author: Lifeng Wang (ofandywang@gmail.com)
+# Desc: A Python Implementation of Chinese Word Segmenter, which is mainly
+#       modified from jieba project (https://github.com/fxsjy/jieba).
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import Queue
+import json
+import threading
+import unittest
+import urllib2
+
+from segment_server import SegmentHTTPServer, SegmentServer
+from word_segmenter import WordSegmenter
+
+class SegmentServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.word_segmenter = WordSegmenter()
+        self.word_segmenter.load('data')
+        self.word_segmenter.hmm_pos_tagger.load('core/testdata/hmm_pos_model')
+        fp = open('core/testdata/document.dat', 'rb')
+        self.texts = [text.strip().decode('utf-8') for text in fp.readlines()]
+        fp.close()
+
+    def test_segment(self):
+        segment_server = SegmentServer(self.word_segmenter,
+                max_batch_size = 8, max_batch_delay = 0.01, workers = 2)
+        segment_server.start()
+        self.assertIsNotNone(segment_server.pool)  # 在子进程中切分
+        requests = [segment_server.submit([text]) for text in self.texts]
+        pos_request = segment_server.submit(self.texts[:2], pos = True)
+        for text, request in zip(self.texts, requests):
+            self.assertEqual([list(self.word_segmenter.segment(text))],
+                    request.wait(10))
+        self.assertEqual(
+                self.word_segmenter.segment_with_pos_batch(self.texts[:2]),
+                pos_request.wait(10))
+        segment_server.stop()
+        self.assertIsNone(segment_server.pool)
+
+        stats = segment_server.stats()
+        self.assertEqual(len(self.texts) + 1, stats['requests'])
+        self.assertEqual(len(self.texts) + 2, stats['texts'])
+        self.assertLess(stats['batches'], stats['requests'])
+        self.assertLessEqual(stats['latency_p50_us'],
+                stats['latency_p99_us'])
+
+    def test_latency_percentiles(self):
+        segment_server = SegmentServer(self.word_segmenter)
+        self.assertNotIn('latency_p50_us', segment_server.stats())
+        # 百分位数取实际延迟, 只保留最近 LATENCY_WINDOW 个请求
+        segment_server.latencies.extend([1e9] * 10)
+        segment_server.latencies.extend(
+                xrange(1, SegmentServer.LATENCY_WINDOW + 1))
+        stats = segment_server.stats()
+        self.assertEqual(SegmentServer.LATENCY_WINDOW / 2,
+                stats['latency_p50_us'])
+        self.assertEqual(SegmentServer.LATENCY_WINDOW * 9 / 10,
+                stats['latency_p90_us'])
+        self.assertEqual(SegmentServer.LATENCY_WINDOW * 99 / 100,
+                stats['latency_p99_us'])
+
+    def test_backpressure(self):
+        segment_server = SegmentServer(self.word_segmenter,
+                max_queue_depth = 2)
+        segment_server.submit([u'中国'])
+        segment_server.submit([u'中国'])
+        self.assertRaises(Queue.Full, segment_server.submit, [u'中国'])
+        self.assertEqual(1, segment_server.stats()['rejected'])
+        segment_server.start()
+        segment_server.stop()
+        self.assertEqual(0, segment_server.stats()['queue_depth'])
+
+    def test_http(self):
+        segment_server = SegmentServer(self.word_segmenter)
+        segment_server.start()
+        http_server = SegmentHTTPServer(('127.0.0.1', 0), segment_server)
+        thread = threading.Thread(target = http_server.serve_forever)
+        thread.start()
+        url = 'http://127.0.0.1:%d' % http_server.server_address[1]
+        try:
+            body = json.dumps({'texts': self.texts[:3]})
+            response = json.loads(
+                    urllib2.urlopen(url + '/segment', body).read())
+            self.assertEqual([list(self.word_segmenter.segment(text))
+                              for text in self.texts[:3]], response['words'])
+            stats = json.loads(urllib2.urlopen(url + '/stats').read())
+            self.assertEqual(3, stats['texts'])
+            for body in ('{"texts": "x"}', '{"texts": [1]}',
+                         '{"texts": [null]}', '[]'):
+                try:
+                    urllib2.urlopen(url + '/segment', body)
+                    self.fail('expected HTTP 400')
+                except urllib2.HTTPError as e:
+                    self.assertEqual(400, e.code)
+            # 出错的请求不影响之后的请求
+            response = json.loads(urllib2.urlopen(url + '/segment',
+                    json.dumps({'texts': self.texts[:1]})).read())
+            self.assertEqual([list(self.word_segmenter.segment(
+                    self.texts[0]))], response['words'])
+        finally:
+            http_server.shutdown()
+            http_server.server_close()
+            thread.join()
+            segment_server.stop()
+
+if __name__ == '__main__':
+    unittest.main()
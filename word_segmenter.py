@@ -24,11 +24,21 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+from collections import deque
+from itertools import islice
+import argparse
 import logging
+import multiprocessing
+import os
+import signal
+import sys
 
 from core.hmm_pos_tagger import HMMPOSTagger
 from core.hmm_segmenter import HMMSegmenter
 from core.max_prob_segmenter import MaxProbSegmenter
+from core.model_store import ModelStore
+from core.ngram_model import NGramModel
+from core.text_decoder import TextDecoder
 from core.vocabulary import Vocabulary
 
 class WordSegmenter(object):
@@ -48,35 +58,191 @@ class WordSegmenter(object):
     TODO(fandywang):
         1. 时间、数词、人名、地名、机构名、email、url识别.
         2. 繁简转换.
-        3. 多粒度切分.
-        4. 停用词识别.
+        3. 停用词识别.
     """
     VOCABULARY_FILENAME = 'vocabulary.dat'  # 基本分词词典
+    VOCABULARY_SNAPSHOT_FILENAME = 'vocabulary.snapshot'  # 预编译词典快照
     CUSTOM_WORDS_DIR = "custom_words"  # 用户自定义词典
     HMM_SEGMENT_MODEL_DIR = 'hmm_segment_model'  # HMM 字标注中文分词模型
     HMM_POS_MODEL_DIR = 'hmm_pos_model'  # HMM n-gram 词性标注模型
+    NGRAM_MODEL_FILENAME = 'ngram.arpa'  # 可选的 bigram / trigram 分词语言模型
+    MODEL_STORE_FILENAME = 'model_store.bin'  # 多进程共享的模型文件
 
-    def __init__(self):
+    def __init__(self, cache_size = 0):
         self.vocabulary = Vocabulary()
         self.hmm_segmenter = HMMSegmenter()
         self.max_prob_segmenter = None
-        self.hmm_pos_tagger = HMMPOSTagger()
+        self.hmm_pos_tagger = HMMPOSTagger(self.vocabulary)
+        self.cache_size = cache_size  # 汉字串切分结果缓存大小, 0 表示不缓存
+        self.instrumentation = None
+        self.decoder = TextDecoder(sticky = False)  # 非 unicode 输入的解码
+        self.hmm_segmenter.decoder = self.decoder
+        self.data_dir = None
+        self.model_store = None  # 使用 ModelStore 时为已映射的 ModelStore
 
-    def load(self, data_dir):
+    def load(self, data_dir, lazy = True):
         """
         加载词典和模型文件.
+
+        若 data_dir 下存在不旧于基本词典、用户自定义词典和 HMM 模型的
+        MODEL_STORE_FILENAME (compile_model_store 生成), 则映射该文件并使用
+        其中的词典和 HMM 模型, 见 attach_model_store. 否则若存在不旧于基本词典和用户自定义词典的
+        词典快照 (Vocabulary.compile 生成), 则直接映射快照, 否则解析文本词典.
+        data_dir 下存在 NGRAM_MODEL_FILENAME
+        (ARPA 格式) 时按 n-gram 模型计算最大概率路径, 见 NGramModel.
+
+        lazy 为 True 时 HMM 分词模型在第一次遇到未登录词串时加载, 词性标注
+        模型在第一次调用 segment_with_pos 时加载, 只做词典切词的任务不承担
+        模型加载耗时. 服务启动时可以调用 warmup 立即加载.
         """
-        self.vocabulary.load(data_dir + '/'
-                + self.__class__.VOCABULARY_FILENAME,
-                data_dir + '/'
-                + self.__class__.CUSTOM_WORDS_DIR)
-        self.hmm_segmenter.load(data_dir + '/'
+        self.data_dir = data_dir
+        vocabulary_file = data_dir + '/' + self.__class__.VOCABULARY_FILENAME
+        snapshot_file = (data_dir + '/'
+                + self.__class__.VOCABULARY_SNAPSHOT_FILENAME)
+        hmm_segment_model_dir = (data_dir + '/'
                 + self.__class__.HMM_SEGMENT_MODEL_DIR)
-        self.max_prob_segmenter = MaxProbSegmenter(
-                self.vocabulary, self.hmm_segmenter)
+        hmm_pos_model_dir = data_dir + '/' + self.__class__.HMM_POS_MODEL_DIR
+        store_file = data_dir + '/' + self.__class__.MODEL_STORE_FILENAME
+        custom_words_dir = data_dir + '/' + self.__class__.CUSTOM_WORDS_DIR
+        self.model_store = None
+        if _is_up_to_date(store_file, [vocabulary_file, custom_words_dir,
+                hmm_segment_model_dir, hmm_pos_model_dir]):
+            self.attach_model_store(store_file)
+        elif _is_up_to_date(snapshot_file, [vocabulary_file,
+                custom_words_dir]):
+            self.vocabulary.load_snapshot(snapshot_file)
+        else:
+            self.vocabulary.load(vocabulary_file, custom_words_dir)
+        if self.model_store is None:
+            self.hmm_segmenter.load(hmm_segment_model_dir, lazy)
+        ngram_model = None
+        ngram_model_file = (data_dir + '/'
+                + self.__class__.NGRAM_MODEL_FILENAME)
+        if os.path.exists(ngram_model_file):
+            ngram_model = NGramModel()
+            ngram_model.load(ngram_model_file, self.vocabulary)
+        self.max_prob_segmenter = MaxProbSegmenter(self.vocabulary,
+                self.hmm_segmenter, self.cache_size, ngram_model = ngram_model)
+        self.max_prob_segmenter.instrumentation = self.instrumentation
+        self.max_prob_segmenter.decoder = self.decoder
+
+        if self.model_store is not None \
+                and ModelStore.HMM_POS in self.model_store:
+            return
+        if os.path.isdir(hmm_pos_model_dir):
+            self.hmm_pos_tagger.load(hmm_pos_model_dir, lazy)
+        else:
+            logging.warning('HMM pos model %s not found.' % hmm_pos_model_dir)
+
+    def attach_model_store(self, store_file):
+        """
+        映射 ModelStore 文件 store_file, 词典、HMM 分词模型和 HMM 词性标注
+        模型 (若包含) 直接使用其中的数据, 多个 worker 进程共享同一份物理
+        内存. 词典仍支持 add_word 等运行时更新 (见 Vocabulary.add_word).
+        """
+        self.model_store = ModelStore.open(store_file)
+        self.vocabulary.attach_snapshot(self.model_store.vocabulary_snapshot())
+        self.model_store.attach_hmm(self.hmm_segmenter.hmm,
+                ModelStore.HMM_SEGMENT)
+        if ModelStore.HMM_POS in self.model_store:
+            self.model_store.attach_hmm(self.hmm_pos_tagger.hmm,
+                    ModelStore.HMM_POS)
+
+    def compile_model_store(self, store_file = None):
+        """
+        将已加载的词典 (含运行时更新) 和 HMM 模型写入 ModelStore 文件,
+        默认为 data_dir 下的 MODEL_STORE_FILENAME, 之后 load 自动使用.
+        """
+        if store_file is None:
+            store_file = (self.data_dir + '/'
+                    + self.__class__.MODEL_STORE_FILENAME)
+        self.warmup()
+        hmm_pos = self.hmm_pos_tagger.hmm
+        ModelStore.write(store_file, self.vocabulary, self.hmm_segmenter.hmm,
+                hmm_pos if hmm_pos.states is not None else None)
+
+    def memory_usage(self):
+        """
+        返回 ModelStore 映射区的内存统计 (KB), 见 ModelStore.memory_usage.
+        未使用 ModelStore 或非 Linux 系统时返回 None.
+        """
+        if self.model_store is None:
+            return None
+        return self.model_store.memory_usage()
+
+    def warmup(self):
+        """
+        立即加载所有延迟加载的模型, 避免第一个请求承担加载耗时. 返回
+        load_times().
+        """
+        self.hmm_segmenter.ensure_loaded()
+        self.hmm_pos_tagger.ensure_loaded()
+        return self.load_times()
+
+    def load_times(self):
+        """
+        返回各组件的加载耗时 (秒), 尚未加载的组件为 None.
+        """
+        return {'vocabulary': self.vocabulary.load_time,
+                'hmm_segmenter': self.hmm_segmenter.hmm.load_time,
+                'hmm_pos_tagger': self.hmm_pos_tagger.hmm.load_time}
 
-        self.hmm_pos_tagger.load(data_dir + '/'
-                + self.__class__.HMM_POS_MODEL_DIR);
+    def add_word(self, word, freq, pos = 'UNK'):
+        """
+        运行时添加词或修改词频, 对之后的切词请求立即生效.
+        """
+        self.vocabulary.add_word(word, freq, pos)
+
+    def remove_word(self, word):
+        """
+        运行时删除词.
+        """
+        self.vocabulary.remove_word(word)
+
+    def reload_custom_words(self):
+        """
+        重新加载 data_dir 下的用户自定义词典, 只更新有变化的词.
+        """
+        self.vocabulary.reload_custom_words(
+                self.data_dir + '/' + self.__class__.CUSTOM_WORDS_DIR)
+
+    def set_instrumentation(self, instrumentation):
+        """
+        为各组件设置同一个 Instrumentation (见 core/instrumentation.py),
+        None 表示关闭. 在 load 之前设置时同时记录词典加载耗时.
+        """
+        self.instrumentation = instrumentation
+        self.vocabulary.instrumentation = instrumentation
+        self.hmm_segmenter.instrumentation = instrumentation
+        if self.max_prob_segmenter is not None:
+            self.max_prob_segmenter.instrumentation = instrumentation
+
+    def set_encoding(self, encoding = None, errors = 'ignore'):
+        """
+        设置非 unicode 输入 (str、bytearray、memoryview) 的编码, 各组件在
+        入口处按 encoding 解码一次, 不再先尝试 utf-8. encoding 为 None 时
+        恢复默认的自动识别 (先 utf-8 后 gbk). 见 TextDecoder.
+        """
+        self.decoder = TextDecoder(encoding, errors, sticky = False)
+        self.hmm_segmenter.decoder = self.decoder
+        if self.max_prob_segmenter is not None:
+            self.max_prob_segmenter.decoder = self.decoder
+
+    def set_hmm_decoding(self, beam_width = None, beam_threshold = None,
+            max_decode_length = None):
+        """
+        设置未登录串的 HMM 解码方式: beam_width / beam_threshold 为剪枝
+        Viterbi 的参数 (见 HMM), max_decode_length 为每个汉字串最多解码的
+        字数, 超出部分按单字切分 (见 HMMSegmenter). 均为 None 时恢复精确
+        解码. 已缓存的切分结果会被清空.
+        """
+        hmm = self.hmm_segmenter.hmm
+        hmm.beam_width = beam_width
+        hmm.beam_threshold = beam_threshold
+        self.hmm_segmenter.max_decode_length = max_decode_length
+        if self.max_prob_segmenter is not None \
+                and self.max_prob_segmenter.cache is not None:
+            self.max_prob_segmenter.cache.clear()
 
     def segment(self, text):
         """
@@ -84,6 +250,117 @@ class WordSegmenter(object):
         """
         return self.max_prob_segmenter.segment(text)
 
+    def segment_spans(self, text):
+        """
+        切词, 返回词在 text 中的位置 array('i'), 第 k 个词为
+        text[spans[2 * k] : spans[2 * k + 1]], 见 MaxProbSegmenter.segment_spans.
+        """
+        return self.max_prob_segmenter.segment_spans(text)
+
+    def segment_for_search(self, text):
+        """
+        搜索引擎模式切词, 返回 (word, begin, end) 序列, 长词之前先输出其
+        包含的词典词, 适合建立倒排索引.
+        """
+        return self.max_prob_segmenter.segment_for_search(text)
+
+    def segment_full(self, text):
+        """
+        全模式切词, 返回 text 中所有词典词的 (word, begin, end) 序列.
+        """
+        return self.max_prob_segmenter.segment_full(text)
+
+    def segment_batch(self, texts):
+        """
+        批量切词, 返回与 texts 一一对应的词列表. 所有文本中的未登录词串
+        一起批量识别, 适合未登录词较多的语料.
+        """
+        return self.max_prob_segmenter.segment_batch(texts)
+
+    def segment_many(self, texts, workers = None, chunksize = 64):
+        """
+        多进程批量切词, 按输入顺序返回每个文本的词列表 (生成器).
+
+        worker 进程由 fork 创建, 直接继承已加载的词典和模型, 不需要重新加载
+        或序列化. texts 可以是任意可迭代对象, 按 chunksize 个文本一组分发给
+        worker (每组调用 segment_batch), 任一时刻最多有 2 * workers 组在处理中,
+        因此可以惰性消费超大的输入.
+
+        workers 默认为 CPU 核数, workers == 1 时在当前进程中切词.
+        """
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        texts = iter(texts)
+        chunks = iter(lambda: list(islice(texts, chunksize)), [])
+        if workers <= 1:
+            for chunk in chunks:
+                for words in self.segment_batch(chunk):
+                    yield words
+            return
+
+        self.hmm_segmenter.ensure_loaded()  # 在 fork 前加载, worker 共享模型
+        pool = multiprocessing.Pool(workers, _init_worker, (self,))
+        try:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.apply_async(_segment_chunk, (chunk,)))
+                if len(pending) >= 2 * workers:
+                    for words in pending.popleft().get():
+                        yield words
+            while pending:
+                for words in pending.popleft().get():
+                    yield words
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def segment_stream(self, stream, encoding = 'utf-8',
+            chunk_size = 65536):
+        """
+        流式切词, 依次返回切分出的词, 适合处理无法一次读入内存的大文件.
+
+        stream 为文件对象 (按 chunk_size 分块读取) 或文本片段序列, 片段可以
+        是 unicode、str、bytearray 或 memoryview. 字节串按 encoding 增量解码,
+        encoding 为 None 时根据第一个含非 ASCII 字节的片段识别一次 (见
+        TextDecoder.incremental_decoder), 之后整个流按该编码解码.
+        memoryview 片段会先复制为 str: 增量解码器要把片段与上一片段末尾
+        不完整的字符拼接, 不接受 memoryview (TextDecoder.decode 不复制).
+        只在安全边界处切分, 结果与对整个文本调用 segment 相同, 见
+        MaxProbSegmenter.segment_stream.
+        """
+        if hasattr(stream, 'read'):
+            fp = stream
+            stream = iter(lambda: fp.read(chunk_size), '')
+
+        def decode(stream):
+            text_decoder = TextDecoder(encoding)
+            decoder = None
+            for chunk in stream:
+                if type(chunk) is unicode:
+                    yield chunk
+                    continue
+                if type(chunk) is memoryview:
+                    chunk = chunk.tobytes()
+                if decoder is not None:
+                    yield decoder.decode(chunk)
+                    continue
+                if encoding is None:
+                    # 纯 ASCII 片段不足以识别编码, 推迟到出现非 ASCII 字节
+                    try:
+                        text = chunk.decode('ascii')
+                    except UnicodeDecodeError:
+                        pass
+                    else:
+                        yield text
+                        continue
+                decoder, text = text_decoder.incremental_decoder(chunk)
+                yield text
+            if decoder is not None:
+                yield decoder.decode('', True)
+
+        return self.max_prob_segmenter.segment_stream(decode(stream))
+
     def segment_with_pos(self, text):
         """
         切词 + 词性标注, 返回词和词性组成的元组序列.
@@ -91,3 +368,70 @@ class WordSegmenter(object):
         return self.hmm_pos_tagger.pos_tag(
                 self.max_prob_segmenter.segment(text))
 
+    def segment_with_pos_batch(self, texts):
+        """
+        批量切词 + 词性标注, 返回与 texts 一一对应的 (词, 词性) 列表.
+        """
+        return self.hmm_pos_tagger.pos_tag_batch(
+                self.max_prob_segmenter.segment_batch(texts))
+
+
+def _is_up_to_date(target, sources):
+    """
+    target 存在且不旧于 sources 中存在的各文件. 目录则递归检查其中的文件
+    和各级目录本身 (删除文件会更新目录的修改时间).
+    """
+    if not os.path.exists(target):
+        return False
+    mtime = os.path.getmtime(target)
+    for source in sources:
+        if os.path.isdir(source):
+            paths = []
+            for root, dirs, files in os.walk(source):
+                paths.append(root)
+                paths.extend(os.path.join(root, name) for name in files)
+        else:
+            paths = [source]
+        for path in paths:
+            if os.path.exists(path) and os.path.getmtime(path) > mtime:
+                return False
+    return True
+
+_worker_segmenter = None  # worker 进程中从父进程继承的 WordSegmenter
+
+def _init_worker(word_segmenter):
+    global _worker_segmenter
+    _worker_segmenter = word_segmenter
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # 由父进程处理中断
+
+def _segment_chunk(texts):
+    return _worker_segmenter.segment_batch(texts)
+
+def _pos_tag_chunk(word_lists):
+    return _worker_segmenter.hmm_pos_tagger.pos_tag_batch(word_lists)
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+            description = 'Chinese word segmenter, streaming input to output.')
+    parser.add_argument('input', nargs = '?', help = 'input file, default stdin')
+    parser.add_argument('output', nargs = '?',
+            help = 'output file, default stdout')
+    parser.add_argument('-d', '--data_dir',
+            default = os.path.join(os.path.dirname(__file__), 'data'))
+    parser.add_argument('-e', '--encoding', default = 'utf-8')
+    parser.add_argument('--delimiter', default = '/',
+            help = 'string written after each word')
+    args = parser.parse_args(argv[1:])
+
+    word_segmenter = WordSegmenter()
+    word_segmenter.load(args.data_dir)
+    input_fp = open(args.input, 'rb') if args.input else sys.stdin
+    output_fp = open(args.output, 'wb') if args.output else sys.stdout
+    delimiter = args.delimiter.decode(args.encoding)
+    for word in word_segmenter.segment_stream(input_fp, args.encoding):
+        output_fp.write((word + delimiter).encode(args.encoding))
+    output_fp.flush()
+
+if __name__ == '__main__':
+    logging.basicConfig(level = logging.WARNING)
+    main(sys.argv)
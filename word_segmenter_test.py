@@ -24,6 +24,11 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import io
+import os
+import shutil
+import tempfile
+import time
 import unittest
 
 from word_segmenter import WordSegmenter
@@ -45,17 +50,171 @@ class WordSegmenterTest(unittest.TestCase):
             self.call_segment(text.strip())
         fp.close()
 
+    def test_segment_many(self):
+        fp = open('core/testdata/document.dat', 'rb')
+        texts = [text.strip() for text in fp.readlines()]
+        fp.close()
+        expected = [list(self.word_segmenter.segment(text)) for text in texts]
+        self.assertEqual(expected, list(self.word_segmenter.segment_many(
+            iter(texts), workers = 2, chunksize = 8)))
+        self.assertEqual(expected, list(self.word_segmenter.segment_many(
+            texts, workers = 1)))
+
+    def test_segment_stream(self):
+        fp = open('core/testdata/document.dat', 'rb')
+        text = fp.read()
+        fp.close()
+        expected = list(self.word_segmenter.segment(text))
+        for chunk_size in (1, 5, 4096):
+            self.assertEqual(expected, list(self.word_segmenter.segment_stream(
+                io.BytesIO(text), chunk_size = chunk_size)))
+
+        gbk = text.decode('utf-8').encode('gbk')
+        chunks = [memoryview(gbk)[i : i + 7] for i in xrange(0, len(gbk), 7)]
+        self.assertEqual(expected, list(self.word_segmenter.segment_stream(
+            chunks, encoding = None)))
+
+        text = u'他来到了网易杭研大厦'
+        expected = list(self.word_segmenter.segment(u'<html>' + text))
+        self.assertEqual(expected, list(self.word_segmenter.segment_stream(
+            ['<html>', text.encode('gbk')], encoding = None)))
+        self.assertEqual(expected, list(self.word_segmenter.segment_stream(
+            [bytearray('<html>'), text.encode('gbk')], encoding = None)))
+
+    def test_set_encoding(self):
+        text = u'他来到了网易杭研大厦'
+        expected = list(self.word_segmenter.segment(text))
+        self.assertEqual(expected,
+                list(self.word_segmenter.segment(text.encode('gbk'))))
+        self.word_segmenter.set_encoding('gbk')
+        data = bytearray(text.encode('gbk'))
+        self.assertEqual(expected, list(self.word_segmenter.segment(data)))
+        self.assertEqual([expected],
+                self.word_segmenter.segment_batch([memoryview(data)]))
+
+    def test_set_hmm_decoding(self):
+        text = u'他来到了网易杭研大厦'
+        expected = list(self.word_segmenter.segment(text))
+        self.word_segmenter.set_hmm_decoding(beam_width = 4,
+                                             max_decode_length = 100)
+        self.assertEqual(expected, list(self.word_segmenter.segment(text)))
+        self.word_segmenter.set_hmm_decoding(max_decode_length = 0)
+        self.assertEqual([u'杭', u'研'],
+                list(self.word_segmenter.segment(text))[-3:-1])
+        self.word_segmenter.set_hmm_decoding()
+        self.assertEqual(expected, list(self.word_segmenter.segment(text)))
+
+    def test_lazy_load(self):
+        load_times = self.word_segmenter.load_times()
+        self.assertIsNotNone(load_times['vocabulary'])
+        self.assertIsNone(load_times['hmm_segmenter'])
+        list(self.word_segmenter.segment(u'小明硕士毕业于中国科学院计算所'))
+        self.assertIsNone(self.word_segmenter.load_times()['hmm_segmenter'])
+        list(self.word_segmenter.segment(u'他来到了网易杭研大厦'))
+        self.assertIsNotNone(
+                self.word_segmenter.load_times()['hmm_segmenter'])
+
+        word_segmenter = WordSegmenter()
+        word_segmenter.load('data', lazy = False)
+        self.assertIsNotNone(word_segmenter.load_times()['hmm_segmenter'])
+        self.assertEqual(
+                list(word_segmenter.segment(u'他来到了网易杭研大厦')),
+                list(self.word_segmenter.segment(u'他来到了网易杭研大厦')))
+
+    def test_snapshot_custom_words(self):
+        data_dir = tempfile.mkdtemp()
+        try:
+            for name in ('vocabulary.dat', 'hmm_segment_model'):
+                os.symlink(os.path.abspath('data/' + name),
+                        os.path.join(data_dir, name))
+            custom_words_dir = os.path.join(data_dir, 'custom_words')
+            os.mkdir(custom_words_dir)
+            word_segmenter = WordSegmenter()
+            word_segmenter.load(data_dir)
+            word_segmenter.vocabulary.compile(os.path.join(data_dir,
+                    WordSegmenter.VOCABULARY_SNAPSHOT_FILENAME))
+
+            # 快照生成之后修改用户自定义词典, load 应重新解析文本词典
+            custom_words_file = os.path.join(custom_words_dir, 'words.txt')
+            fp = open(custom_words_file, 'wb')
+            fp.write(u'杭研大厦\t100000\tn\n'.encode('utf-8'))
+            fp.close()
+            mtime = time.time() + 10
+            os.utime(custom_words_file, (mtime, mtime))
+            word_segmenter = WordSegmenter()
+            word_segmenter.load(data_dir)
+            self.assertIn(u'杭研大厦',
+                    list(word_segmenter.segment(u'他来到了网易杭研大厦')))
+        finally:
+            shutil.rmtree(data_dir)
+
+    def test_model_store(self):
+        data_dir = tempfile.mkdtemp()
+        try:
+            for name in ('vocabulary.dat', 'hmm_segment_model'):
+                os.symlink(os.path.abspath('data/' + name),
+                        os.path.join(data_dir, name))
+            word_segmenter = WordSegmenter()
+            word_segmenter.load(data_dir)
+            self.assertIsNone(word_segmenter.memory_usage())
+            word_segmenter.compile_model_store()
+
+            word_segmenter = WordSegmenter()
+            word_segmenter.load(data_dir)
+            self.assertIsNotNone(word_segmenter.model_store)
+            self.assertIsNotNone(word_segmenter.load_times()['hmm_segmenter'])
+            fp = open('core/testdata/document.dat', 'rb')
+            for text in fp.readlines():
+                self.assertEqual(list(self.word_segmenter.segment(text)),
+                        list(word_segmenter.segment(text)))
+            fp.close()
+            usage = word_segmenter.memory_usage()
+            if usage is not None:
+                self.assertGreater(usage['size'], 0)
+
+            # 修改用户自定义词典后 ModelStore 过期, 不再使用
+            custom_words_dir = os.path.join(data_dir, 'custom_words')
+            os.mkdir(custom_words_dir)
+            custom_words_file = os.path.join(custom_words_dir, 'words.txt')
+            fp = open(custom_words_file, 'wb')
+            fp.write(u'杭研大厦\t100000\tn\n'.encode('utf-8'))
+            fp.close()
+            mtime = time.time() + 10
+            os.utime(custom_words_file, (mtime, mtime))
+            word_segmenter = WordSegmenter()
+            word_segmenter.load(data_dir)
+            self.assertIsNone(word_segmenter.model_store)
+            self.assertIn(u'杭研大厦',
+                    list(word_segmenter.segment(u'他来到了网易杭研大厦')))
+        finally:
+            shutil.rmtree(data_dir)
+
+    def test_warmup(self):
+        self.assertIsNotNone(self.word_segmenter.warmup()['hmm_segmenter'])
+
     def call_segment_with_pos(self, text):
-        for word in self.word_segmenter.segment_with_pos(text):
-            print word + '/\t',
+        for word, pos in self.word_segmenter.segment_with_pos(text):
+            print word + '/' + pos + '\t',
         print ''
 
     def test_segment_with_pos(self):
         fp = open('core/testdata/document.dat', 'rb')
         for text in fp.readlines():
-            self.call_segment(text.strip())
+            self.call_segment_with_pos(text.strip())
         fp.close()
 
+        # data 下没有 hmm_pos_model, 词性取自分词词典
+        text = u'他来到了网易杭研大厦'
+        tagged = list(self.word_segmenter.segment_with_pos(text))
+        self.assertEqual(list(self.word_segmenter.segment(text)),
+                         [word for word, pos in tagged])
+        for word, pos in tagged:
+            self.assertEqual(self.word_segmenter.vocabulary.get_pos(word),
+                             pos)
+        self.assertIn((u'来到', 'v'), tagged)
+        self.assertEqual([tagged],
+                self.word_segmenter.segment_with_pos_batch([text]))
+
 if __name__ == '__main__':
     unittest.main()
 